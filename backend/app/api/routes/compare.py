@@ -23,3 +23,39 @@ def download_extra_pdfs_endpoint():
 @compare_bp.route('/downloadZipPdf', methods=['POST'])
 def download_zip_pdfs_endpoint():
     return CompareController.downloadCompareZipPdf()
+
+@compare_bp.route('/downloadLayeredPdf', methods=['POST'])
+def download_layered_pdf_endpoint():
+    return CompareController.downloadLayeredPdf()
+
+@compare_bp.route('/batch', methods=['POST'])
+def batch_compare_endpoint():
+    return CompareController.batchCompare()
+
+@compare_bp.route('/fingerprints', methods=['POST'])
+def page_fingerprints_endpoint():
+    return CompareController.fingerprints()
+
+@compare_bp.route('/results/<comparison_id>', methods=['GET'])
+def comparison_result_endpoint(comparison_id):
+    return CompareController.comparisonResult(comparison_id)
+
+@compare_bp.route('/results/<comparison_id>/<artifact>', methods=['GET'])
+def comparison_artifact_endpoint(comparison_id, artifact):
+    return CompareController.comparisonArtifact(comparison_id, artifact)
+
+@compare_bp.route('/jobs', methods=['POST'])
+def submit_job_endpoint():
+    return CompareController.submitJob()
+
+@compare_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status_endpoint(job_id):
+    return CompareController.jobStatus(job_id)
+
+@compare_bp.route('/jobs/<job_id>/<artifact>', methods=['GET'])
+def job_artifact_endpoint(job_id, artifact):
+    return CompareController.jobArtifact(job_id, artifact)
+
+@compare_bp.before_app_request
+def start_job_workers():
+    CompareController.startJobWorkers()
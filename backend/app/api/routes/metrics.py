@@ -0,0 +1,32 @@
+import ipaddress
+from flask import Blueprint, Response, jsonify, request
+from loguru import logger
+from core.config import Config
+from services.metrics_service import MetricsService
+
+# Served at the root rather than under /api, where Prometheus looks by default
+metrics_bp = Blueprint("metrics", __name__)
+
+# Scrapers allowed to read /metrics; None = anyone ("*")
+METRICS_NETWORKS = None if Config.METRICS_ALLOWED_IPS.strip() == "*" else [
+    ipaddress.ip_network(item.strip(), strict=False) for item in Config.METRICS_ALLOWED_IPS.split(",") if item.strip()
+]
+
+
+def is_allowed_scraper(address):
+    if METRICS_NETWORKS is None:
+        return True
+    try:
+        ip = ipaddress.ip_address(address or "")
+    except ValueError:
+        return False
+    return any(ip in network for network in METRICS_NETWORKS)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """Stage histograms and cache counters of this process in the Prometheus text format."""
+    if not is_allowed_scraper(request.remote_addr):
+        logger.warning(f"Metrics scrape refused from {request.remote_addr}")
+        return jsonify({"error": "Forbidden", "message": "Metrics are only served to allowed scrapers."}), 403
+    return Response(MetricsService.render(), mimetype="text/plain; version=0.0.4")
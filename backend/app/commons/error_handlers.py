@@ -1,5 +1,6 @@
-from flask import jsonify
+from flask import jsonify, request
 from loguru import logger
+from middleware.upload_limit_middleware import too_large_body, upload_limit
 
 def register_error_handlers(app):
     @app.errorhandler(404)
@@ -12,6 +13,11 @@ def register_error_handlers(app):
         logger.warning(f"405 Method Not Allowed: {error}")
         return jsonify({"error": "Method not allowed on this endpoint."}), 405
 
+    @app.errorhandler(413)
+    def payload_too_large_error(error):
+        logger.warning(f"413 Payload too large: body over the limit on {request.path}")
+        return jsonify(too_large_body(upload_limit(request.path))), 413
+
     @app.errorhandler(500)
     def internal_server_error(error):
         logger.error(f"500 Internal Server Error: {error}")
@@ -1,7 +1,12 @@
-import io
+import shutil
 import fitz  # PyMuPDF
-from flask import jsonify, request
+from flask import jsonify, request, send_file, url_for
+from core.config import Config
 from services import PDFService
+from services.compareResult_service import ComparisonResult, comparison_cache
+from services.compareJob_service import compare_job_runner, compare_job_store
+from services.batchCompare_service import BatchCompareService, BatchError
+from services.upload_service import UploadService, UploadTooLargeError
 from utils.security import is_allowed_file, secure_filename
 
 
@@ -12,24 +17,24 @@ class CompareController:
     def compare():
         """API to compare two PDF files and return the modified file."""
         try:
-            # Validate uploaded files
-            validation_error = CompareController.validate_pdf_files(request)
+            # Validate and read the uploaded files once
+            uploads, validation_error = CompareController.read_pdf_uploads(request)
             if validation_error:
                 return validation_error
+            upload1, upload2 = uploads
 
-            file1 = request.files['file1']
-            file2 = request.files['file2']
+            stream_format = CompareController.report_stream_format(request)
+            if stream_format:
+                return PDFService.report_stream(upload1, upload2, stream_format)
 
-            # Convert files to in-memory BytesIO streams
-            file1_stream = io.BytesIO(file1.read())
-            file2_stream = io.BytesIO(file2.read())
-
-            result, status = PDFService.compare_pdfs(file1_stream, file2_stream)
+            result, status = PDFService.cached_comparison(upload1, upload2)
 
             if status != 200:
                 return result, status
             return jsonify({
-                "summary_data": result["summary_data"]
+                "summary_data": result.summary_data,
+                "pages": result.pages,
+                "comparison_id": result.comparison_id
                 }), 200
 
         except FileNotFoundError as e:
@@ -44,6 +49,41 @@ class CompareController:
         except Exception as e:
             return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500
 
+    @staticmethod
+    def report_stream_format(req):
+        """Streaming format asked for with ?stream=ndjson|sse or the Accept header, else None."""
+        stream_format = req.args.get('stream')
+        if stream_format in PDFService.STREAM_FORMATS:
+            return stream_format
+        best = req.accept_mimetypes.best_match(["application/json"] + list(PDFService.STREAM_FORMATS.values()))
+        for name, mimetype in PDFService.STREAM_FORMATS.items():
+            if best == mimetype:
+                return name
+        return None
+
+    @staticmethod
+    def fingerprints():
+        """API to return per-page fingerprints of two PDF files without comparing them."""
+        try:
+            # Validate and read the uploaded files once
+            uploads, validation_error = CompareController.read_pdf_uploads(request)
+            if validation_error:
+                return validation_error
+            upload1, upload2 = uploads
+
+            mode = request.args.get('mode', 'words')
+            result, status = PDFService.page_fingerprints(upload1, upload2, mode)
+
+            if status != 200:
+                return result, status
+            return jsonify(result), 200
+
+        except fitz.FileDataError as e:
+            return jsonify({"error": "Invalid PDF file", "details": str(e)}), 400
+
+        except Exception as e:
+            return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500
+
     @staticmethod
     def validate_pdf_files(req):
         """Validate the uploaded PDF files before processing."""
@@ -63,35 +103,42 @@ class CompareController:
         if not is_allowed_file(file1.filename) or not is_allowed_file(file2.filename):
             return jsonify({"error": "Only PDF files are allowed"}), 400
 
-        # Restrict file size (e.g., 10MB max)
-        max_size = 10 * 1024 * 1024  # 10MB
-        if len(file1.read()) > max_size or len(file2.read()) > max_size:
-            return jsonify({"error": "File size exceeds the 10MB limit"}), 400
+        return None  # No validation errors
 
-        file1.seek(0)  # Reset the file pointer after reading
-        file2.seek(0)
+    @staticmethod
+    def read_pdf_uploads(req):
+        """Validate both uploads and read each one exactly once.
 
-        return None  # No validation errors
+        Returns ``((upload1, upload2), None)`` or ``(None, error_response)``.
+        """
+        validation_error = CompareController.validate_pdf_files(req)
+        if validation_error:
+            return None, validation_error
+
+        # Restrict file size (e.g., 10MB max), checked while reading
+        max_size = Config.MAX_UPLOAD_MB * 1024 * 1024
+        try:
+            uploads = tuple(UploadService.read(req.files[name], max_size) for name in ('file1', 'file2'))
+        except UploadTooLargeError:
+            return None, (jsonify({"error": f"File size exceeds the {Config.MAX_UPLOAD_MB}MB limit"}), 400)
+
+        return uploads, None
     
     @staticmethod
     def downloadMissingPdf():
         """API to compare two PDF files and return the modified file."""
         try:
-            # Validate uploaded files
-            validation_error = CompareController.validate_pdf_files(request)
+            # Validate and read the uploaded files once
+            uploads, validation_error = CompareController.read_pdf_uploads(request)
             if validation_error:
                 return validation_error
+            upload1, upload2 = uploads
 
-            file1 = request.files['file1']
-            file2 = request.files['file2']
-
-            # Convert files to in-memory BytesIO streams
-            file1_stream = io.BytesIO(file1.read())
-            file2_stream = io.BytesIO(file2.read())
+            result, status = PDFService.cached_comparison(upload1, upload2)
 
-            response = PDFService.compare_pdfs_missing_download(file1_stream, file2_stream)
-
-            return response
+            if status != 200:
+                return result, status
+            return PDFService.artifact_response(result, "missing")
 
           
 
@@ -111,21 +158,17 @@ class CompareController:
     def downloadExtraPdf():
         """API to compare two PDF files and return the modified file."""
         try:
-            # Validate uploaded files
-            validation_error = CompareController.validate_pdf_files(request)
+            # Validate and read the uploaded files once
+            uploads, validation_error = CompareController.read_pdf_uploads(request)
             if validation_error:
                 return validation_error
+            upload1, upload2 = uploads
 
-            file1 = request.files['file1']
-            file2 = request.files['file2']
+            result, status = PDFService.cached_comparison(upload1, upload2)
 
-            # Convert files to in-memory BytesIO streams
-            file1_stream = io.BytesIO(file1.read())
-            file2_stream = io.BytesIO(file2.read())
-
-            response = PDFService.compare_pdfs_extra_downlaod(file1_stream, file2_stream)
-
-            return response
+            if status != 200:
+                return result, status
+            return PDFService.artifact_response(result, "extra")
 
           
 
@@ -145,23 +188,46 @@ class CompareController:
     def downloadCompareZipPdf():
         """API to compare two PDF files and return the modified file."""
         try:
-            # Validate uploaded files
-            validation_error = CompareController.validate_pdf_files(request)
+            # Validate and read the uploaded files once
+            uploads, validation_error = CompareController.read_pdf_uploads(request)
             if validation_error:
                 return validation_error
+            upload1, upload2 = uploads
 
-            file1 = request.files['file1']
-            file2 = request.files['file2']
+            result, status = PDFService.cached_comparison(upload1, upload2)
 
-            # Convert files to in-memory BytesIO streams
-            file1_stream = io.BytesIO(file1.read())
-            file2_stream = io.BytesIO(file2.read())
+            if status != 200:
+                return result, status
+            return PDFService.artifact_response(result, "combined")
 
-            response = PDFService.compare_zip_download(file1_stream, file2_stream)
+          
 
-            return response
+        except FileNotFoundError as e:
+            return jsonify({"error": "File not found", "details": str(e)}), 400
 
-          
+        except fitz.FileDataError as e:
+            return jsonify({"error": "Invalid PDF file", "details": str(e)}), 400
+
+        except KeyError as e:
+            return jsonify({"error": "Unexpected data structure", "details": str(e)}), 500
+
+        except Exception as e:
+            return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500
+
+    @staticmethod
+    def downloadLayeredPdf():
+        """API to compare two PDF files and return one PDF with the differences on toggleable layers."""
+        try:
+            uploads, validation_error = CompareController.read_pdf_uploads(request)
+            if validation_error:
+                return validation_error
+            upload1, upload2 = uploads
+
+            result, status = PDFService.cached_comparison(upload1, upload2)
+
+            if status != 200:
+                return result, status
+            return PDFService.artifact_response(result, "layers")
 
         except FileNotFoundError as e:
             return jsonify({"error": "File not found", "details": str(e)}), 400
@@ -173,4 +239,146 @@ class CompareController:
             return jsonify({"error": "Unexpected data structure", "details": str(e)}), 500
 
         except Exception as e:
-            return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500      
+            return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500
+
+    @staticmethod
+    def batchCompare():
+        """API to compare many PDF pairs in one request and stream the results back as a zip archive.
+
+        Pairs come from ``archive1``/``archive2`` (zip files matched by PDF file
+        name) or from a ``manifest`` (form field or JSON file) that lists
+        ``file1``/``file2`` as archive members or as file fields of the request.
+        """
+        artifacts = [artifact for artifact in request.args.get("artifacts", Config.BATCH_ARTIFACTS).split(",") if artifact]
+        unknown = [artifact for artifact in artifacts if artifact not in ComparisonResult.ARTIFACTS]
+        if unknown or not artifacts:
+            return jsonify({"error": f"Unknown artifacts {unknown}", "artifacts": sorted(ComparisonResult.ARTIFACTS)}), 400
+
+        directory = BatchCompareService.work_directory()
+        try:
+            archives = None
+            if 'archive1' in request.files and 'archive2' in request.files:
+                max_size = Config.MAX_BATCH_UPLOAD_MB * 1024 * 1024
+                archives = tuple(UploadService.read(request.files[name], max_size) for name in ('archive1', 'archive2'))
+
+            manifest = request.form.get('manifest')
+            if manifest is None and 'manifest' in request.files:
+                manifest = request.files['manifest'].read().decode("utf-8")
+
+            unmatched = None
+            if manifest:
+                pairs = BatchCompareService.pairs_from_manifest(manifest, request.files, directory, *(archives or ()))
+            elif archives:
+                pairs, unmatched = BatchCompareService.pairs_from_archives(*archives, directory)
+            else:
+                shutil.rmtree(directory, ignore_errors=True)
+                return jsonify({"error": "Send archive1 and archive2, or a manifest of file pairs"}), 400
+
+            return BatchCompareService.response(pairs, directory, artifacts, unmatched=unmatched)
+
+        except UploadTooLargeError as e:
+            shutil.rmtree(directory, ignore_errors=True)
+            return jsonify({"error": "File size exceeds the limit", "details": str(e)}), 400
+
+        except (BatchError, UnicodeDecodeError) as e:
+            shutil.rmtree(directory, ignore_errors=True)
+            return jsonify({"error": "Invalid batch request", "details": str(e)}), 400
+
+        except Exception as e:
+            shutil.rmtree(directory, ignore_errors=True)
+            return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500
+
+    @staticmethod
+    def comparison_not_found():
+        """404 for a comparison id this process does not hold.
+
+        The result cache lives in each worker process, so an id returned by another
+        uWSGI process (or one that was evicted) is unknown here; jobs are shared.
+        """
+        return jsonify({
+            "error": "Comparison not found or expired",
+            "details": "Comparison results are cached per server process; this id may have been "
+                       "served by another process or evicted. Use POST /api/compare/jobs for "
+                       "artifacts that can be fetched from any process."
+        }), 404
+
+    @staticmethod
+    def comparisonResult(comparison_id):
+        """API to return the summary of a cached comparison by its id."""
+        result = comparison_cache.get(comparison_id)
+        if result is None:
+            return CompareController.comparison_not_found()
+        return jsonify(result.to_json()), 200
+
+    @staticmethod
+    def comparisonArtifact(comparison_id, artifact):
+        """API to download one artifact of a cached comparison by its id."""
+        if artifact not in ComparisonResult.ARTIFACTS:
+            return jsonify({"error": f"Unknown artifact '{artifact}'", "artifacts": sorted(ComparisonResult.ARTIFACTS)}), 404
+
+        result = comparison_cache.get(comparison_id)
+        if result is None:
+            return CompareController.comparison_not_found()
+        return PDFService.artifact_response(result, artifact)
+
+    @staticmethod
+    def startJobWorkers():
+        """Start this process's comparison job workers (no-op once running)."""
+        compare_job_runner.start()
+
+    @staticmethod
+    def submitJob():
+        """API to queue a comparison of two PDF files and return its job id."""
+        try:
+            # Validate and read the uploaded files once
+            uploads, validation_error = CompareController.read_pdf_uploads(request)
+            if validation_error:
+                return validation_error
+            upload1, upload2 = uploads
+
+            job_id = compare_job_store.submit(upload1, upload2)
+            compare_job_runner.notify()
+            return jsonify(CompareController.job_json(compare_job_store.get(job_id))), 202
+
+        except Exception as e:
+            return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500
+
+    @staticmethod
+    def jobStatus(job_id):
+        """API to return the status, progress and (once done) summary of a comparison job."""
+        job = compare_job_store.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(CompareController.job_json(job)), 200
+
+    @staticmethod
+    def jobArtifact(job_id, artifact):
+        """API to download one artifact of a finished comparison job."""
+        if artifact not in ComparisonResult.ARTIFACTS:
+            return jsonify({"error": f"Unknown artifact '{artifact}'", "artifacts": sorted(ComparisonResult.ARTIFACTS)}), 404
+
+        job = compare_job_store.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        if job["status"] != compare_job_store.DONE:
+            return jsonify({"error": f"Job is {job['status']}", "status": job["status"]}), 409
+
+        response = send_file(
+            compare_job_store.artifact_path(job, artifact),
+            as_attachment=True,
+            download_name=ComparisonResult.ARTIFACTS[artifact],
+            mimetype="application/pdf"
+        )
+        response.headers["X-Comparison-Id"] = job["comparison_id"]
+        return response
+
+    @staticmethod
+    def job_json(job):
+        data = compare_job_store.to_json(job)
+        data["status_url"] = url_for("api.compare.job_status_endpoint", job_id=job["id"])
+        if "artifacts" in data:
+            data["artifacts"] = {
+                artifact: url_for("api.compare.job_artifact_endpoint", job_id=job["id"], artifact=artifact)
+                for artifact in data["artifacts"]
+            }
+        return data
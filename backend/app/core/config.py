@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 import dotenv
 
@@ -25,12 +26,74 @@ class Config:
     # Security settings
     SECRET_KEY = os.getenv("SECRET_KEY", "my_secret_key")  # Change for production
     TOKEN_EXPIRY = int(os.getenv("TOKEN_EXPIRY", 3600))  # Default: 1 hour expiry
+    # Longest query, form or JSON value (or text body) block_suspicious_input scans; longer ones get 413
+    INPUT_INSPECT_MAX_CHARS = int(os.getenv("INPUT_INSPECT_MAX_CHARS", 65536))
 
     # Swagger settings
     SWAGGER_TITLE = "CT PDF Comparator API"
     SWAGGER_VERSION = "1.0.0"
     SWAGGER_DESCRIPTION = "CT PDF Comparator API to compare two PDF files and highlight differences."
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
+
+    # Uploads
+    MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", 10))  # per PDF
+    MAX_BATCH_UPLOAD_MB = int(os.getenv("MAX_BATCH_UPLOAD_MB", 512))  # per zip archive of a batch
+
+    # Comparison engine
+    COMPARE_WORKERS = int(os.getenv("COMPARE_WORKERS", 0))  # 0 = derive from CPUs and uwsgi processes/threads
+    COMPARE_PARALLEL_MIN_PAGES = int(os.getenv("COMPARE_PARALLEL_MIN_PAGES", 4))
+    COMPARE_MP_CONTEXT = os.getenv("COMPARE_MP_CONTEXT", "spawn")
+    COMPARE_HIGHLIGHT_MODE = os.getenv("COMPARE_HIGHLIGHT_MODE", "word")  # word | line | flatten (opt-in)
+    COMPARE_SAVE_PROFILE = os.getenv("COMPARE_SAVE_PROFILE", "fast")  # fast | compact | web-linearized
+    # Append annotation-only outputs to the original file instead of rewriting it (fast profile only)
+    COMPARE_SAVE_INCREMENTAL = os.getenv("COMPARE_SAVE_INCREMENTAL", "true").lower() == "true"
+    # Pair sheets by content so reordered, inserted or deleted sheets are not diffed against the wrong page
+    COMPARE_ALIGN_PAGES = os.getenv("COMPARE_ALIGN_PAGES", "true").lower() == "true"
+
+    # Batch comparisons
+    BATCH_MAX_PAIRS = int(os.getenv("BATCH_MAX_PAIRS", 200))
+    BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 0))  # batch pool, separate from COMPARE_WORKERS; 0 = same size
+    BATCH_ARTIFACTS = os.getenv("BATCH_ARTIFACTS", "layers")  # comma separated, per pair
+
+    # Request body limits, counted while the body is read; 1MB on top of the files covers the form fields
+    MAX_REQUEST_MB = float(os.getenv("MAX_REQUEST_MB", 2))  # routes not listed below
+    UPLOAD_LIMIT_ROUTES = os.getenv(
+        "UPLOAD_LIMIT_ROUTES",
+        f"/api/compare/batch={2 * MAX_BATCH_UPLOAD_MB + 1},/api/compare/={2 * MAX_UPLOAD_MB + 1}",
+    )  # <path prefix>=<MB>, comma separated
+
+    # Comparison result cache (per process)
+    COMPARE_CACHE_MAX_ENTRIES = int(os.getenv("COMPARE_CACHE_MAX_ENTRIES", 32))
+    COMPARE_CACHE_TTL = int(os.getenv("COMPARE_CACHE_TTL", 600))  # seconds
+    COMPARE_CACHE_MAX_MB = int(os.getenv("COMPARE_CACHE_MAX_MB", 256))
+
+    # Persistent extraction cache (shared by all processes on the host)
+    EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+    EXTRACTION_CACHE_DIR = os.getenv(
+        "EXTRACTION_CACHE_DIR", os.path.join(tempfile.gettempdir(), "cadstera-extraction-cache")
+    )
+    EXTRACTION_CACHE_MAX_MB = int(os.getenv("EXTRACTION_CACHE_MAX_MB", 512))
+
+    # Background comparison jobs (SQLite queue shared by all processes on the host)
+    COMPARE_JOBS_DIR = os.getenv("COMPARE_JOBS_DIR", os.path.join(tempfile.gettempdir(), "cadstera-jobs"))
+    COMPARE_JOB_WORKERS = int(os.getenv("COMPARE_JOB_WORKERS", 1))  # threads per process
+    COMPARE_JOB_LEASE = int(os.getenv("COMPARE_JOB_LEASE", 900))  # seconds without progress before a job is retried
+    COMPARE_JOB_MAX_ATTEMPTS = int(os.getenv("COMPARE_JOB_MAX_ATTEMPTS", 3))
+    COMPARE_JOB_RETENTION = int(os.getenv("COMPARE_JOB_RETENTION", 86400))  # seconds finished jobs are kept
+
+    # Server-Timing headers and Prometheus metrics at /metrics (per process)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Addresses or networks allowed to scrape /metrics, comma-separated; "*" = anyone
+    METRICS_ALLOWED_IPS = os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1")
+
+    # Logging
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if os.getenv("FLASK_ENV") == "development" else "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+    # Hand records to a background writer thread instead of writing the file on the request thread
+    LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+    LOG_ACCESS_SAMPLE = float(os.getenv("LOG_ACCESS_SAMPLE", 1.0))  # share of successful requests logged
+    # Per-route overrides, "<route rule>=<share>,...": e.g. polled job status or scrapes
+    LOG_ACCESS_SAMPLE_ROUTES = os.getenv("LOG_ACCESS_SAMPLE_ROUTES", "/metrics=0,/api/compare/jobs/<job_id>=0.1")
     
 
     # @staticmethod
@@ -4,6 +4,7 @@ from flask import Blueprint, Flask, jsonify, request, send_from_directory
 from loguru import logger
 from app.commons.error_handlers import register_error_handlers
 from core import generate_swagger
+from core.config import Config
 from middleware import (
     sanitize_input,
     log_request_responses,
@@ -11,9 +12,14 @@ from middleware import (
     validate_request_size,
     block_bad_user_agents,
     block_suspicious_input,
-    request_sanitizer
+    request_sanitizer,
+    start_stage_timings,
+    add_server_timing,
+    UploadLimitMiddleware,
 )
 from api.routes import all_routes
+from api.routes.metrics import metrics_bp
+from services.upload_service import UploadRequest
 from flask_cors import CORS
  
 class API:
@@ -23,6 +29,10 @@ class API:
         template_path = os.path.join(BASE_DIR, "templates")
  
         self.app = Flask(__name__, template_folder=template_path)
+        # Stream uploaded files once, hashing and size-checking them on the way in
+        self.app.request_class = UploadRequest
+        # Count request body bytes against the route's limit as they are read
+        self.app.wsgi_app = UploadLimitMiddleware(self.app.wsgi_app)
  
         print("📦 Base Directory:", BASE_DIR)
         register_error_handlers(self.app)
@@ -43,6 +53,7 @@ class API:
                         "Access-Control-Allow-Headers",
                         "Access-Control-Allow-Origin",
                     ],
+                    "expose_headers": ["X-Comparison-Id", "Server-Timing"],
                 },
                 r"/docs/*": {
                     "origins": "*",
@@ -59,10 +70,15 @@ class API:
         )
  
         # Middleware
+        if Config.METRICS_ENABLED:
+            # First in, so the timings also cover requests the other hooks reject
+            self.app.before_request(start_stage_timings)
+            self.app.after_request(add_server_timing)
         self.app.after_request(log_request_responses)
         self.app.after_request(set_security_headers)
-        self.app.before_request(request_sanitizer)
+        # Size check before any hook parses the body
         self.app.before_request(validate_request_size)
+        self.app.before_request(request_sanitizer)
         self.app.before_request(block_bad_user_agents)
         self.app.before_request(block_suspicious_input)
  
@@ -72,6 +88,8 @@ class API:
             api_bp.register_blueprint(route)
             print(f" - {route.endpoint}: {route}")
         self.app.register_blueprint(api_bp)
+        if Config.METRICS_ENABLED:
+            self.app.register_blueprint(metrics_bp)
         print("✅ Live Registered Routes:")
         for rule in self.app.url_map.iter_rules():
             print(f"[API ROUTE] {rule}")
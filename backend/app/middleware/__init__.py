@@ -7,4 +7,6 @@ from .secure_middleware import (
     block_suspicious_input,
     log_request_responses,
     set_security_headers,
-)
\ No newline at end of file
+)
+from .metrics_middleware import start_stage_timings, add_server_timing
+from .upload_limit_middleware import UploadLimitMiddleware
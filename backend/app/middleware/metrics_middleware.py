@@ -0,0 +1,32 @@
+import time
+from flask import g, request
+from services.metrics_service import MetricsService
+
+
+# Collect per-stage timings of this request (see MetricsService)
+def start_stage_timings():
+    g.request_start = time.perf_counter()
+    g.stage_timings = MetricsService.begin()
+
+
+# Report the stages as a Server-Timing header and add the request to the histograms
+def add_server_timing(response):
+    timings = g.get("stage_timings")
+    if timings is None:
+        return response
+    start = g.request_start
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    # A streamed report compares while it is sent, so its header only covers the work before the first record
+    response.headers["Server-Timing"] = timings.server_timing(time.perf_counter() - start)
+
+    def observe():
+        MetricsService.REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+        MetricsService.observe(timings)
+        MetricsService.end()
+
+    # Werkzeug never closes direct passthrough bodies (send_file); those are rendered by now anyway
+    if response.is_streamed and not response.direct_passthrough:
+        response.call_on_close(observe)
+    else:
+        observe()
+    return response
@@ -1,4 +1,5 @@
 from flask import request, jsonify
+import json
 import re
 import logging
 
@@ -10,6 +11,10 @@ DANGEROUS_PATTERNS = [
     (r"['\";]", "Invalid characters detected"),           # General
 ]
 
+# Form fields that carry a JSON document (the batch manifest): the strings inside it
+# are sanitized, not its quotes
+JSON_FORM_FIELDS = {"manifest"}
+
 def sanitize_input(data):
     """Sanitize strings, dicts, and lists recursively."""
     if isinstance(data, str):
@@ -52,6 +57,11 @@ def request_sanitizer():
 
         elif request.form:
             form_data = request.form.to_dict()
+            for field in JSON_FORM_FIELDS & form_data.keys():
+                try:
+                    form_data[field] = json.loads(form_data[field])
+                except ValueError:
+                    pass  # Not JSON: checked as plain text
             clean, err = sanitize_input(form_data)
             if err:
                 return jsonify({"error": err}), 400
@@ -0,0 +1,128 @@
+import json
+from loguru import logger
+from werkzeug.exceptions import RequestEntityTooLarge
+from core.config import Config
+
+MB = 1024 * 1024
+
+# Path prefix -> request body limit in bytes, longest prefix first; other paths get MAX_REQUEST_MB
+UPLOAD_LIMITS = sorted(
+    (
+        (prefix.strip(), int(float(mb) * MB))
+        for prefix, _, mb in (item.rpartition("=") for item in Config.UPLOAD_LIMIT_ROUTES.split(","))
+        if prefix.strip()
+    ),
+    key=lambda item: len(item[0]),
+    reverse=True,
+)
+
+
+def upload_limit(path):
+    """Request body limit in bytes for ``path``."""
+    for prefix, limit in UPLOAD_LIMITS:
+        if path.startswith(prefix):
+            return limit
+    return int(Config.MAX_REQUEST_MB * MB)
+
+
+def too_large_body(limit):
+    return {"error": "Payload too large", "limit": f"{limit / MB:g}MB"}
+
+
+class LimitedInput:
+    """``wsgi.input`` wrapper that counts the bytes read and raises RequestEntityTooLarge past ``limit``.
+
+    No read asks the server for more than one byte past the limit, so a body
+    without Content-Length (chunked) is cut off there instead of being read in full.
+    """
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.bytes_read = 0
+        self.exceeded = False
+
+    def bounded(self, size):
+        if self.exceeded:
+            raise RequestEntityTooLarge()
+        remaining = self.limit + 1 - self.bytes_read
+        return remaining if size is None or size < 0 or size > remaining else size
+
+    def count(self, data):
+        self.bytes_read += len(data)
+        if self.bytes_read > self.limit:
+            self.exceeded = True
+            raise RequestEntityTooLarge()
+        return data
+
+    def read(self, size=-1):
+        return self.count(self.stream.read(self.bounded(size)))
+
+    def readline(self, size=-1):
+        return self.count(self.stream.readline(self.bounded(size)))
+
+    def readlines(self, hint=-1):
+        return list(iter(self.readline, b""))
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def close(self):
+        close = getattr(self.stream, "close", None)
+        if close is not None:
+            close()
+
+
+class UploadLimitMiddleware:
+    """Enforce the per-route body limit while the request body is read.
+
+    validate_request_size answers a declared Content-Length over the limit
+    before anything is read. Bodies that pass it, or that have no length
+    (chunked uploads), are counted as they are parsed: the first read past
+    the limit raises RequestEntityTooLarge, which the app answers with 413.
+    Should a handler swallow that error, its response is replaced here by a
+    bare 413, so the limit holds whatever the route does, unless the app
+    already sent its response through the write callable.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        limit = upload_limit(environ.get("PATH_INFO", ""))
+        stream = environ["wsgi.input"] = LimitedInput(environ["wsgi.input"], limit)
+        started = []
+        writers = []
+
+        def write(data):
+            # The app writes its body itself (PEP 3333 write callable): the response is sent from here on
+            if not writers:
+                writers.append(start_response(*started))
+            writers[0](data)
+
+        def capture(status, headers, exc_info=None):
+            if writers:
+                # Already sent: the server re-raises exc_info, as PEP 3333 asks
+                return start_response(status, headers, exc_info)
+            started[:] = [status, headers, exc_info]
+            return write
+
+        app_iter = self.app(environ, capture)
+        status = started[0]
+        if writers:
+            return app_iter
+        if not stream.exceeded or status.startswith("413"):
+            start_response(*started)
+            return app_iter
+
+        if hasattr(app_iter, "close"):
+            app_iter.close()
+        logger.warning(
+            f"Payload too large: over {limit} bytes on {environ.get('PATH_INFO', '')}, answered {status} by the route"
+        )
+        body = json.dumps(too_large_body(limit)).encode("utf-8")
+        start_response("413 Request Entity Too Large", [
+            ("Content-Type", "application/json"),
+            ("Content-Length", str(len(body))),
+        ])
+        return [body]
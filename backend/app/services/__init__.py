@@ -1,3 +1,6 @@
+from .wordTable_service import PageWordTable, TextVocabulary
 from .extractTextCoordinate_service import ExtractTextAndCoordinatesService
 from .findMissingOrExtraValues_service import FindMissingOrExraValuesService
-from .pdf_service import PDFService
\ No newline at end of file
+from .pageFingerprint_service import PageFingerprintService
+from .compareSession_service import CompareSession
+from .pdf_service import PDFService
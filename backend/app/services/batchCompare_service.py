@@ -0,0 +1,382 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import CancelledError, Future, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from flask import Response, stream_with_context
+from loguru import logger
+from core.config import Config
+from utils.security import secure_filename
+from .compareSession_service import CompareSession
+from .compareResult_service import ComparisonResult
+from .parallelCompare_service import ParallelCompareService, ProcessPoolService
+from .upload_service import PDFUpload, UploadService, UploadTooLargeError
+from .pdf_service import PDFService
+from .metrics_service import MetricsService, StageTimings
+
+
+def compare_pair(name, path1, path2, tolerance, artifacts, output_dir):
+    """Process-pool worker: compare one pair of PDFs and write the requested artifacts to ``output_dir``.
+
+    Returns the summary, the paths of the written artifacts and the pair's stage
+    timings. Pairs are the unit of work of a batch, so the pair's pages are
+    diffed in this process instead of being fanned out to a pool again.
+    """
+    start = time.perf_counter()
+    upload1 = PDFUpload(os.path.basename(path1), path=path1)
+    upload2 = PDFUpload(os.path.basename(path2), path=path2)
+    comparison_id = PDFService.comparison_id(upload1, upload2, tolerance)
+
+    with MetricsService.collect() as timings:
+        with CompareSession(upload1, upload2, tolerance=tolerance, workers=1) as session:
+            result = PDFService.build_result(session, comparison_id)
+
+        files = {}
+        os.makedirs(output_dir, exist_ok=True)
+        for artifact in artifacts:
+            path = os.path.join(output_dir, ComparisonResult.ARTIFACTS[artifact])
+            with open(path, "wb") as handle:
+                handle.write(result.artifact(artifact))
+            files[artifact] = path
+
+    return {
+        "name": name,
+        "comparison_id": comparison_id,
+        "summary_data": result.summary_data,
+        "pages": result.pages,
+        "files": files,
+        "seconds": round(time.perf_counter() - start, 3),
+        "timings": timings.to_json(),
+    }
+
+
+class BatchPair:
+    """One drawing pair of a batch, with both PDFs extracted to the batch directory."""
+
+    __slots__ = ("name", "path1", "path2", "source1", "source2")
+
+    def __init__(self, name, path1, path2, source1, source2):
+        self.name = name
+        self.path1 = path1
+        self.path2 = path2
+        # File names as the client sent them, reported back in the index
+        self.source1 = source1
+        self.source2 = source2
+
+
+class BatchError(ValueError):
+    """Raised for a batch request that cannot be run (bad manifest, no pairs, too many pairs)."""
+
+
+class ZipStreamSink:
+    """Write-only file for zipfile that hands out what was written since the last drain."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class BatchCompareService(ProcessPoolService):
+    """Compares many drawing pairs in one request and streams the results back as one zip.
+
+    Pairs come from two archives matched by file name or from a manifest, and
+    run as independent tasks on a process pool of their own, so a large batch
+    queues behind itself rather than in front of single comparisons. Each
+    finished pair is added to the response as soon as it is done;
+    ``index.json`` with the per-pair summaries closes the archive. If a pool
+    worker dies, the pool is replaced and the pairs it held are compared inline.
+    """
+
+    COPY_CHUNK_SIZE = 1024 * 1024
+
+    _executor_lock = threading.Lock()
+
+    @staticmethod
+    def worker_count():
+        if Config.BATCH_WORKERS > 0:
+            return Config.BATCH_WORKERS
+        return ParallelCompareService.worker_count()
+
+    @staticmethod
+    def submit(executor, args):
+        """Submit one pair; a pool that is broken or shut down gives a failed future instead of raising."""
+        try:
+            return executor.submit(compare_pair, *args)
+        except RuntimeError as e:
+            # BrokenProcessPool, or "cannot schedule new futures after shutdown" once another request reset it
+            failed = Future()
+            failed.set_exception(e if isinstance(e, BrokenProcessPool) else BrokenProcessPool(str(e)))
+            return failed
+
+    @classmethod
+    def pair_result(cls, executor, future, args):
+        """The pair's result; when the pool broke (or was replaced) under it, the pair is compared inline."""
+        try:
+            return future.result()
+        except (BrokenProcessPool, CancelledError) as e:
+            logger.bind(event="pool_broken", stage="batch").error(
+                "Batch pool broke ({}); comparing pair {} inline", e, args[0]
+            )
+            cls.reset_executor(executor)
+            return compare_pair(*args)
+
+    @staticmethod
+    def safe_filename(filename, default):
+        """secure_filename(), or ``default`` when no usable name is left (``../``, ``..``, an empty name)."""
+        name = secure_filename(filename or "")
+        return default if name in ("", ".", "..") else name
+
+    @staticmethod
+    def pair_name(filename):
+        return os.path.splitext(BatchCompareService.safe_filename(filename, "pair"))[0] or "pair"
+
+    @staticmethod
+    def extract_member(archive, info, directory):
+        """Copy one archive member to ``directory``, enforcing the per-PDF size limit on the inflated bytes."""
+        max_size = Config.MAX_UPLOAD_MB * 1024 * 1024
+        if info.file_size > max_size:
+            raise UploadTooLargeError(info.filename, max_size)
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, BatchCompareService.safe_filename(info.filename, "input.pdf"))
+        total = 0
+        with archive.open(info) as source, open(path, "wb") as target:
+            for chunk in iter(lambda: source.read(BatchCompareService.COPY_CHUNK_SIZE), b""):
+                total += len(chunk)
+                if total > max_size:
+                    raise UploadTooLargeError(info.filename, max_size)
+                target.write(chunk)
+        return path
+
+    @staticmethod
+    def archive_pdfs(archive):
+        """PDF members of an archive keyed by lower-cased base name (directories and macOS metadata skipped)."""
+        members = {}
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or info.filename.startswith("__MACOSX/") or name.startswith("."):
+                continue
+            if name.lower().endswith(".pdf"):
+                members.setdefault(name.lower(), info)
+        return members
+
+    @staticmethod
+    def open_archive(upload):
+        try:
+            return zipfile.ZipFile(upload.path if upload.path is not None else io.BytesIO(upload.data))
+        except zipfile.BadZipFile as e:
+            raise BatchError(f"{upload.filename} is not a zip archive: {e}")
+
+    @staticmethod
+    def pairs_from_archives(archive1, archive2, directory):
+        """Pairs of PDFs with the same file name in both archives, plus the names found in only one."""
+        with BatchCompareService.open_archive(archive1) as zip1, BatchCompareService.open_archive(archive2) as zip2:
+            members1 = BatchCompareService.archive_pdfs(zip1)
+            members2 = BatchCompareService.archive_pdfs(zip2)
+            matched = sorted(set(members1) & set(members2))
+            BatchCompareService.check_pair_count(len(matched))
+
+            pairs = []
+            for index, key in enumerate(matched):
+                pair_dir = os.path.join(directory, "inputs", str(index))
+                pairs.append(BatchPair(
+                    BatchCompareService.pair_name(members1[key].filename),
+                    BatchCompareService.extract_member(zip1, members1[key], os.path.join(pair_dir, "1")),
+                    BatchCompareService.extract_member(zip2, members2[key], os.path.join(pair_dir, "2")),
+                    members1[key].filename,
+                    members2[key].filename,
+                ))
+
+        unmatched = {
+            "archive1": sorted(members1[key].filename for key in set(members1) - set(members2)),
+            "archive2": sorted(members2[key].filename for key in set(members2) - set(members1)),
+        }
+        return pairs, unmatched
+
+    @staticmethod
+    def pairs_from_manifest(manifest, files, directory, archive1=None, archive2=None):
+        """Pairs listed in a manifest: ``[{"file1": ..., "file2": ..., "name": ...}, ...]``.
+
+        ``file1``/``file2`` name members of ``archive1``/``archive2`` when the
+        archives were sent, otherwise file fields of the request (``files``).
+        """
+        try:
+            entries = json.loads(manifest) if isinstance(manifest, str) else manifest
+        except ValueError as e:
+            raise BatchError(f"manifest is not valid JSON: {e}")
+        if isinstance(entries, dict):
+            entries = entries.get("pairs")
+        if not isinstance(entries, list) or not all(
+            isinstance(entry, dict) and entry.get("file1") and entry.get("file2") for entry in entries
+        ):
+            raise BatchError('manifest must be a list of {"file1": ..., "file2": ...} entries')
+        BatchCompareService.check_pair_count(len(entries))
+
+        zips = []
+        try:
+            if archive1 is not None and archive2 is not None:
+                zips = [BatchCompareService.open_archive(archive1), BatchCompareService.open_archive(archive2)]
+
+            pairs = []
+            for index, entry in enumerate(entries):
+                pair_dir = os.path.join(directory, "inputs", str(index))
+                paths = [
+                    BatchCompareService.manifest_input(entry[key], zips[side] if zips else None, files,
+                                                       os.path.join(pair_dir, str(side + 1)))
+                    for side, key in enumerate(("file1", "file2"))
+                ]
+                name = entry.get("name") or BatchCompareService.pair_name(entry["file1"])
+                pairs.append(BatchPair(BatchCompareService.pair_name(name), paths[0], paths[1], entry["file1"], entry["file2"]))
+            return pairs
+        finally:
+            for archive in zips:
+                archive.close()
+
+    @staticmethod
+    def manifest_input(reference, archive, files, directory):
+        if archive is not None:
+            try:
+                info = archive.getinfo(reference)
+            except KeyError:
+                raise BatchError(f"'{reference}' is not in the archive")
+            return BatchCompareService.extract_member(archive, info, directory)
+
+        if reference not in files:
+            raise BatchError(f"'{reference}' is not a file field of the request")
+        upload = UploadService.read(files[reference], Config.MAX_UPLOAD_MB * 1024 * 1024)
+        os.makedirs(directory, exist_ok=True)
+        filename = BatchCompareService.safe_filename(files[reference].filename or reference, "input.pdf")
+        path = os.path.join(directory, filename)
+        if upload.path is not None:
+            shutil.copyfile(upload.path, path)
+        else:
+            with open(path, "wb") as handle:
+                handle.write(upload.data)
+        return path
+
+    @staticmethod
+    def check_pair_count(count):
+        if count == 0:
+            raise BatchError("No drawing pairs to compare")
+        if count > Config.BATCH_MAX_PAIRS:
+            raise BatchError(f"A batch can compare at most {Config.BATCH_MAX_PAIRS} pairs, got {count}")
+
+    @staticmethod
+    def unique_names(pairs):
+        seen = {}
+        for pair in pairs:
+            count = seen.get(pair.name, 0)
+            seen[pair.name] = count + 1
+            if count:
+                pair.name = f"{pair.name}-{count + 1}"
+
+    @staticmethod
+    def response(pairs, directory, artifacts, tolerance=5, unmatched=None):
+        """Streaming zip response; ``directory`` (inputs and outputs) is removed once it is sent.
+
+        The stream removes it when it ends; the close callback covers responses
+        that are closed before the stream started.
+        """
+        BatchCompareService.unique_names(pairs)
+        response = Response(
+            stream_with_context(BatchCompareService.stream(pairs, directory, artifacts, tolerance, unmatched)),
+            mimetype="application/zip",
+        )
+        response.headers["Content-Disposition"] = "attachment; filename=batch-comparison.zip"
+        response.call_on_close(lambda: shutil.rmtree(directory, ignore_errors=True))
+        return response
+
+    @staticmethod
+    def stream(pairs, directory, artifacts, tolerance=5, unmatched=None):
+        """Yield the zip archive in pieces: each pair's artifacts as it finishes, then index.json."""
+        start = time.perf_counter()
+        sink = ZipStreamSink()
+        archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED)
+        executor = BatchCompareService.executor()
+        futures = {}
+        for index, pair in enumerate(pairs):
+            args = (pair.name, pair.path1, pair.path2, tolerance, artifacts, os.path.join(directory, "outputs", str(index)))
+            futures[BatchCompareService.submit(executor, args)] = (pair, args)
+        logger.info(f"Batch comparison of {len(pairs)} pair(s) on {BatchCompareService.worker_count()} worker(s)")
+
+        index = []
+        try:
+            for future in as_completed(futures):
+                pair, args = futures[future]
+                entry = {"name": pair.name, "file1": pair.source1, "file2": pair.source2}
+                try:
+                    result = BatchCompareService.pair_result(executor, future, args)
+                except Exception as e:
+                    logger.error(f"Batch pair {pair.name} failed: {e}")
+                    entry.update({"status": "failed", "error": str(e).replace(directory + os.sep, "")})
+                    index.append(entry)
+                    continue
+
+                # Each pair is one comparison in the stage histograms
+                MetricsService.observe(StageTimings.from_json(result["timings"]))
+                entry.update({
+                    "status": "done",
+                    "comparison_id": result["comparison_id"],
+                    "changed_pages": sum(1 for page in result["summary_data"].values() if not page.get("unchanged")),
+                    "summary_data": result["summary_data"],
+                    "pages": result["pages"],
+                    "seconds": result["seconds"],
+                    "artifacts": {},
+                })
+                for artifact, path in result["files"].items():
+                    arcname = f"{pair.name}/{os.path.basename(path)}"
+                    yield from BatchCompareService.add_file(archive, sink, path, arcname)
+                    entry["artifacts"][artifact] = arcname
+                    os.unlink(path)
+                index.append(entry)
+
+            index.sort(key=lambda entry: entry["name"])
+            summary = {
+                "pairs": index,
+                "done": sum(1 for entry in index if entry["status"] == "done"),
+                "failed": sum(1 for entry in index if entry["status"] == "failed"),
+                "unmatched": unmatched or {},
+                "artifacts": list(artifacts),
+                "seconds": round(time.perf_counter() - start, 3),
+            }
+            archive.writestr("index.json", json.dumps(summary, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+            archive.close()
+            yield sink.drain()
+        finally:
+            # Client went away: do not leave the rest of the batch running
+            for future in futures:
+                future.cancel()
+            shutil.rmtree(directory, ignore_errors=True)
+
+    @staticmethod
+    def add_file(archive, sink, path, arcname):
+        with open(path, "rb") as source, archive.open(arcname, "w", force_zip64=True) as target:
+            for chunk in iter(lambda: source.read(BatchCompareService.COPY_CHUNK_SIZE), b""):
+                target.write(chunk)
+                yield sink.drain()
+        yield sink.drain()
+
+    @staticmethod
+    def work_directory():
+        return tempfile.mkdtemp(prefix="cadstera-batch-")
@@ -0,0 +1,371 @@
+import contextlib
+import json
+import os
+import socket
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from loguru import logger
+from core.config import Config
+from .compareResult_service import ComparisonResult
+from .upload_service import PDFUpload
+from .pdf_service import PDFService
+from .metrics_service import MetricsService
+
+
+class CompareJobStore:
+    """SQLite-backed queue of comparison jobs plus their input and artifact files.
+
+    The database and one directory per job live under ``directory``, so queued
+    and finished jobs survive restarts and every process on the host shares the
+    queue. A running job is queued again, up to ``max_attempts``, once its worker
+    process is gone or its progress has not moved for ``lease_seconds``. Each
+    claim is a new attempt: progress, completion and failure are only recorded
+    for the attempt that holds the job, and every attempt writes its artifacts
+    to its own directory, so a runner that lost its lease cannot overwrite the
+    result of the one that took over.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS compare_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            stage TEXT,
+            progress REAL NOT NULL DEFAULT 0,
+            tolerance REAL NOT NULL,
+            filename1 TEXT,
+            filename2 TEXT,
+            comparison_id TEXT,
+            summary TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            finished_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS compare_jobs_status ON compare_jobs (status, created_at);
+    """
+
+    def __init__(self, directory, lease_seconds=900, max_attempts=3, retention_seconds=86400):
+        self.directory = directory
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self.db_path = os.path.join(directory, "jobs.sqlite3")
+        os.makedirs(directory, exist_ok=True)
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(self.SCHEMA)
+
+    @contextlib.contextmanager
+    def connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def worker_name():
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @staticmethod
+    def is_dead_local_worker(worker):
+        """True for a worker of this host whose process no longer exists."""
+        host, _, pid = (worker or "").rpartition(":")
+        if host != socket.gethostname() or not pid.isdigit():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            return False
+        return False
+
+    def job_dir(self, job_id):
+        return os.path.join(self.directory, job_id)
+
+    def input_path(self, job_id, index):
+        return os.path.join(self.job_dir(job_id), f"input{index}.pdf")
+
+    def attempt_dir(self, job_id, attempt):
+        return os.path.join(self.job_dir(job_id), f"attempt{attempt}")
+
+    def artifact_path(self, job, artifact):
+        """Artifact written by the attempt that finished ``job``."""
+        return os.path.join(self.attempt_dir(job["id"], job["attempts"]), f"{artifact}.pdf")
+
+    @staticmethod
+    def write_input(upload, path):
+        if upload.path is not None:
+            shutil.copyfile(upload.path, path)
+        else:
+            with open(path, "wb") as handle:
+                handle.write(upload.data)
+
+    def submit(self, upload1, upload2, tolerance=5):
+        """Persist both inputs and queue the job; returns its id."""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id))
+        try:
+            CompareJobStore.write_input(upload1, self.input_path(job_id, 1))
+            CompareJobStore.write_input(upload2, self.input_path(job_id, 2))
+        except OSError:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+            raise
+
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute(
+                "INSERT INTO compare_jobs (id, status, stage, tolerance, filename1, filename2, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, self.QUEUED, self.QUEUED, tolerance, upload1.filename, upload2.filename, now, now),
+            )
+        return job_id
+
+    def get(self, job_id):
+        with self.connect() as connection:
+            row = connection.execute("SELECT * FROM compare_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def claim(self):
+        """Atomically move the oldest queued job to running; returns it (as claimed) or None."""
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT * FROM compare_jobs WHERE status = ? ORDER BY created_at LIMIT 1", (self.QUEUED,)
+                ).fetchone()
+                if row is None:
+                    connection.execute("COMMIT")
+                    return None
+                now = time.time()
+                job = dict(row)
+                job.update(status=self.RUNNING, stage="starting", progress=0, attempts=row["attempts"] + 1,
+                           worker=CompareJobStore.worker_name(), updated_at=now)
+                connection.execute(
+                    "UPDATE compare_jobs SET status = ?, stage = ?, progress = 0, attempts = ?,"
+                    " worker = ?, updated_at = ? WHERE id = ?",
+                    (self.RUNNING, job["stage"], job["attempts"], job["worker"], now, job["id"]),
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return job
+
+    def update_progress(self, job, stage, progress):
+        """Record progress of a claimed ``job``; doubles as the heartbeat that keeps the lease."""
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE compare_jobs SET stage = ?, progress = ?, updated_at = ?"
+                " WHERE id = ? AND status = ? AND attempts = ?",
+                (stage, round(progress, 4), time.time(), job["id"], self.RUNNING, job["attempts"]),
+            )
+
+    def complete(self, job, result):
+        """Store the artifacts and summary of a claimed ``job``; False if the attempt no longer holds it."""
+        attempt_dir = self.attempt_dir(job["id"], job["attempts"])
+        os.makedirs(attempt_dir, exist_ok=True)
+        for artifact in ComparisonResult.ARTIFACTS:
+            with open(self.artifact_path(job, artifact), "wb") as handle:
+                handle.write(result.artifact(artifact))
+
+        now = time.time()
+        with self.connect() as connection:
+            updated = connection.execute(
+                "UPDATE compare_jobs SET status = ?, stage = ?, progress = 1, comparison_id = ?, summary = ?,"
+                " error = NULL, updated_at = ?, finished_at = ? WHERE id = ? AND status = ? AND attempts = ?",
+                (self.DONE, self.DONE, result.comparison_id, json.dumps(result.summary_data), now, now,
+                 job["id"], self.RUNNING, job["attempts"]),
+            ).rowcount
+        if not updated:
+            shutil.rmtree(attempt_dir, ignore_errors=True)
+        return bool(updated)
+
+    def fail(self, job, error):
+        """Mark a claimed ``job`` failed; False if the attempt no longer holds it."""
+        now = time.time()
+        with self.connect() as connection:
+            updated = connection.execute(
+                "UPDATE compare_jobs SET status = ?, stage = ?, error = ?, updated_at = ?, finished_at = ?"
+                " WHERE id = ? AND status = ? AND attempts = ?",
+                (self.FAILED, self.FAILED, error, now, now, job["id"], self.RUNNING, job["attempts"]),
+            ).rowcount
+        return bool(updated)
+
+    def requeue_stale(self):
+        """Queue running jobs whose worker died again, or fail them after max_attempts."""
+        cutoff = time.time() - self.lease_seconds
+        with self.connect() as connection:
+            running = connection.execute(
+                "SELECT id, worker, attempts, updated_at FROM compare_jobs WHERE status = ?", (self.RUNNING,)
+            ).fetchall()
+            stale = [
+                job for job in running
+                if job["updated_at"] < cutoff or CompareJobStore.is_dead_local_worker(job["worker"])
+            ]
+            for job in stale:
+                if job["attempts"] >= self.max_attempts:
+                    connection.execute(
+                        "UPDATE compare_jobs SET status = ?, stage = ?, error = ?, finished_at = ?"
+                        " WHERE id = ? AND status = ?",
+                        (self.FAILED, self.FAILED, "Worker stopped responding", time.time(), job["id"], self.RUNNING),
+                    )
+                else:
+                    connection.execute(
+                        "UPDATE compare_jobs SET status = ?, stage = ?, progress = 0, worker = NULL"
+                        " WHERE id = ? AND status = ?",
+                        (self.QUEUED, self.QUEUED, job["id"], self.RUNNING),
+                    )
+        if stale:
+            logger.warning(f"Recovered {len(stale)} comparison job(s) whose worker stopped responding")
+
+    def release(self, worker):
+        """Queue the running jobs of ``worker`` again; used when a process with a reused pid starts."""
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE compare_jobs SET status = ?, stage = ?, progress = 0, worker = NULL"
+                " WHERE status = ? AND worker = ?",
+                (self.QUEUED, self.QUEUED, self.RUNNING, worker),
+            )
+
+    def purge(self):
+        """Delete finished jobs older than the retention period, with their files."""
+        cutoff = time.time() - self.retention_seconds
+        with self.connect() as connection:
+            job_ids = [
+                row["id"] for row in connection.execute(
+                    "SELECT id FROM compare_jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,)
+                )
+            ]
+            connection.executemany("DELETE FROM compare_jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
+        for job_id in job_ids:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def to_json(self, job):
+        data = {
+            "job_id": job["id"],
+            "status": job["status"],
+            "stage": job["stage"],
+            "progress": job["progress"],
+            "attempts": job["attempts"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+            "finished_at": job["finished_at"],
+        }
+        if job["status"] == self.DONE:
+            data["comparison_id"] = job["comparison_id"]
+            data["summary_data"] = json.loads(job["summary"])
+            data["artifacts"] = sorted(ComparisonResult.ARTIFACTS)
+        if job["status"] == self.FAILED:
+            data["error"] = job["error"]
+        return data
+
+
+class CompareJobRunner:
+    """Worker threads of this process that take jobs off the store and run them.
+
+    Started lazily from the first request a process serves, so pre-forking
+    servers start the threads in each worker rather than in the master.
+    """
+
+    POLL_SECONDS = 2.0
+    MAINTENANCE_SECONDS = 60.0
+
+    def __init__(self, store, workers=1):
+        self.store = store
+        self.workers = workers
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.pid = None
+        self.last_maintenance = 0.0
+
+    def start(self):
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            # Nothing can be running under this pid yet; a restarted container may reuse it
+            self.store.release(CompareJobStore.worker_name())
+            for index in range(self.workers):
+                threading.Thread(target=self.work, name=f"compare-job-{index}", daemon=True).start()
+
+    def notify(self):
+        self.wakeup.set()
+
+    def work(self):
+        while True:
+            try:
+                self.maintain()
+                job = self.store.claim()
+            except Exception as e:
+                logger.error(f"Comparison job queue unavailable: {e}")
+                job = None
+
+            if job is None:
+                self.wakeup.wait(self.POLL_SECONDS)
+                self.wakeup.clear()
+                continue
+            try:
+                self.run(job)
+            except Exception as e:
+                # Outcome not recorded; the lease expiry queues the job again
+                logger.opt(exception=True).error("Comparison job {} could not be recorded: {}", job["id"], e)
+
+    def maintain(self):
+        if time.time() - self.last_maintenance < self.MAINTENANCE_SECONDS:
+            return
+        self.last_maintenance = time.time()
+        self.store.requeue_stale()
+        self.store.purge()
+
+    def run(self, job):
+        job_id = job["id"]
+        logger.info(f"Running comparison job {job_id} (attempt {job['attempts']})")
+        reported = {"progress": -1.0}
+
+        def progress(stage, fraction):
+            # Per-page reports on long documents would otherwise write on every page
+            if fraction - reported["progress"] >= 0.01 or fraction == 0:
+                reported["progress"] = fraction
+                self.store.update_progress(job, stage, fraction)
+
+        with MetricsService.collect() as timings:
+            try:
+                result = PDFService.run_comparison(
+                    PDFUpload(job["filename1"], path=self.store.input_path(job_id, 1)),
+                    PDFUpload(job["filename2"], path=self.store.input_path(job_id, 2)),
+                    tolerance=job["tolerance"],
+                    progress=progress,
+                    artifacts=tuple(ComparisonResult.ARTIFACTS),
+                )
+                if self.store.complete(job, result):
+                    logger.info(f"Comparison job {job_id} finished")
+                else:
+                    logger.warning(f"Comparison job {job_id} attempt {job['attempts']} lost its lease; result dropped")
+            except Exception as e:
+                self.store.fail(job, str(e))
+                logger.opt(exception=True).error("Comparison job {} failed: {}", job_id, e)
+        MetricsService.observe(timings)
+
+
+compare_job_store = CompareJobStore(
+    Config.COMPARE_JOBS_DIR,
+    lease_seconds=Config.COMPARE_JOB_LEASE,
+    max_attempts=Config.COMPARE_JOB_MAX_ATTEMPTS,
+    retention_seconds=Config.COMPARE_JOB_RETENTION,
+)
+compare_job_runner = CompareJobRunner(compare_job_store, workers=Config.COMPARE_JOB_WORKERS)
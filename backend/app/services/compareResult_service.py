@@ -0,0 +1,124 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from core.config import Config
+
+
+class ComparisonResult:
+    """Summary of one comparison plus its downloadable artifacts, rendered on first request.
+
+    ``renderer(artifact)`` returns the PDF bytes of an artifact; each artifact is
+    rendered at most once and kept, so report-only callers never pay for PDFs.
+    """
+
+    # artifact name -> download file name
+    ARTIFACTS = {
+        "missing": "missing-pdf.pdf",
+        "extra": "extra-pdf.pdf",
+        "combined": "compain-missing-extra.pdf",
+        "report": "compared_output.pdf",
+        "layers": "compared-layers.pdf",
+    }
+
+    def __init__(self, comparison_id, summary_data, renderer=None, artifacts=None, retained_bytes=0, pages=None):
+        self.comparison_id = comparison_id
+        self.summary_data = summary_data
+        # Sheet alignment: PDF1 pages removed, PDF2 pages added and pages compared out of order
+        self.pages = pages or {"removed": [], "added": [], "moved": []}
+        self.renderer = renderer
+        self.artifacts = artifacts or {}
+        # Memory the renderer holds on to (inputs and differences), counted by the cache
+        self.retained_bytes = retained_bytes
+        self.lock = threading.Lock()
+        self.created_at = time.time()
+
+    @property
+    def size(self):
+        return self.retained_bytes + sum(len(data) for data in self.artifacts.values())
+
+    def artifact(self, artifact):
+        """Bytes of one artifact, rendering it now if nobody asked for it before."""
+        with self.lock:
+            if artifact not in self.artifacts:
+                if self.renderer is None:
+                    raise KeyError(artifact)
+                self.artifacts[artifact] = self.renderer(artifact)
+            return self.artifacts[artifact]
+
+    def to_json(self):
+        return {
+            "comparison_id": self.comparison_id,
+            "summary_data": self.summary_data,
+            "pages": self.pages,
+            "artifacts": sorted(self.ARTIFACTS),
+            "rendered": sorted(self.artifacts),
+        }
+
+
+class ComparisonResultCache:
+    """In-process LRU + TTL cache of ComparisonResults keyed by input content.
+
+    The key (and comparison id) is a SHA-256 over both input digests and the
+    comparison parameters, so the same file pair maps to the same entry no matter
+    which endpoint asked first.
+    """
+
+    def __init__(self, max_entries=32, ttl_seconds=600, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def comparison_key(digest1, digest2, params):
+        """Comparison id from the hex SHA-256 digests of both inputs and the parameters."""
+        digest = hashlib.sha256()
+        digest.update(digest1.encode("ascii"))
+        digest.update(digest2.encode("ascii"))
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, comparison_id):
+        with self.lock:
+            result = self.entries.get(comparison_id)
+            if result is None or self.is_expired(result):
+                self.entries.pop(comparison_id, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(comparison_id)
+            self.hits += 1
+            return result
+
+    def put(self, result):
+        with self.lock:
+            self.entries[result.comparison_id] = result
+            self.entries.move_to_end(result.comparison_id)
+            self.evict()
+
+    def is_expired(self, result):
+        return self.ttl_seconds > 0 and time.time() - result.created_at > self.ttl_seconds
+
+    def evict(self):
+        for comparison_id in [key for key, result in self.entries.items() if self.is_expired(result)]:
+            del self.entries[comparison_id]
+
+        total_bytes = sum(result.size for result in self.entries.values())
+        while self.entries and (len(self.entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, evicted = self.entries.popitem(last=False)
+            total_bytes -= evicted.size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+comparison_cache = ComparisonResultCache(
+    max_entries=Config.COMPARE_CACHE_MAX_ENTRIES,
+    ttl_seconds=Config.COMPARE_CACHE_TTL,
+    max_bytes=Config.COMPARE_CACHE_MAX_MB * 1024 * 1024,
+)
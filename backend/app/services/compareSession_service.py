@@ -0,0 +1,367 @@
+from loguru import logger
+from core.config import Config
+from .wordTable_service import TextVocabulary
+from .extractTextCoordinate_service import ExtractTextAndCoordinatesService
+from .findMissingOrExtraValues_service import FindMissingOrExraValuesService
+from .pageFingerprint_service import PageFingerprintService
+from .parallelCompare_service import ParallelCompareService
+from .extractionCache_service import extraction_cache
+from .pageAlignment_service import PageAlignment, PageAlignmentService
+from .metrics_service import MetricsService
+from .upload_service import PDFUpload
+
+
+class CompareSession:
+    """Owns the opened documents and extracted words of one comparison request.
+
+    Each PDF is parsed once: the same fitz documents are used for text extraction,
+    page sizes and the annotated output, and the per-page diff is computed once.
+    """
+
+    # Fraction of the progress range taken by extraction and diffing; rendering gets the rest
+    DIFF_SHARE = 0.7
+
+    def __init__(self, pdf_file1, pdf_file2, tolerance=5, progress=None, differences=None, alignment=None,
+                 workers=None):
+        # Uploads on disk are opened by path, in-memory ones from their bytes without a copy
+        self.upload1 = PDFUpload.coerce(pdf_file1)
+        self.upload2 = PDFUpload.coerce(pdf_file2)
+        self.tolerance = tolerance
+        self.progress = progress
+        # Pool workers to diff with; None = the configured pool, 1 = inline (e.g. inside a pool worker)
+        self.workers = workers
+        self.vocabulary = TextVocabulary()
+
+        self.doc1 = self.upload1.open()  # PDF1 will be modified
+        try:
+            self.doc2 = self.upload2.open()  # PDF2 remains unchanged
+        except Exception:
+            self.doc1.close()
+            raise
+
+        self._content = None
+        # Differences from an earlier session over the same inputs skip extraction and diffing
+        self._differences = differences
+        self._alignment = alignment
+        # Annotation passes already applied to the open documents (see PDFService.render_*)
+        self.applied = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if not self.doc1.is_closed:
+            self.doc1.close()
+        if not self.doc2.is_closed:
+            self.doc2.close()
+
+    def report_progress(self, stage, fraction):
+        """Forward progress (0..1 of the whole comparison) to whoever owns the session."""
+        if self.progress is not None:
+            self.progress(stage, fraction)
+
+    @property
+    def num_pages(self):
+        return min(len(self.doc1), len(self.doc2))
+
+    @property
+    def page_size(self):
+        """Width and height of the first page of PDF1, used for the summary page."""
+        rect = self.doc1[0].rect
+        return rect.width, rect.height
+
+    @property
+    def digests(self):
+        """SHA-256 of both inputs; keys the extraction and result caches."""
+        return self.upload1.sha256, self.upload2.sha256
+
+    def content(self):
+        """Word tables of both documents, from the extraction cache or the already opened docs."""
+        if self._content is None:
+            self._content = (
+                self.extract_document(self.doc1, self.digests[0]),
+                self.extract_document(self.doc2, self.digests[1]),
+            )
+        return self._content
+
+    def extract_document(self, doc, digest):
+        if extraction_cache is not None:
+            pages_content = extraction_cache.load(digest, self.vocabulary)
+            if pages_content is not None:
+                return pages_content
+
+        pages_content = ExtractTextAndCoordinatesService.extract_word_tables_from_doc(doc, self.vocabulary)
+        if extraction_cache is not None:
+            extraction_cache.store(digest, pages_content)
+        return pages_content
+
+    def is_extraction_cached(self):
+        return extraction_cache is not None and all(extraction_cache.contains(digest) for digest in self.digests)
+
+    def differences(self):
+        """Filtered (missing, extra) word tables per PDF1 page; None marks an unchanged page.
+
+        Each PDF1 page is diffed against its sheet in PDF2 (see alignment()).
+        Documents with enough pages are diffed in the process pool, smaller ones inline.
+        """
+        if self._differences is None:
+            # Cached word tables make extraction free, and that is what the pool parallelizes
+            if ParallelCompareService.should_parallelize(self.num_pages, self.workers) and not self.is_extraction_cached():
+                self.report_progress("extracting", 0.0)
+                self._differences = self.diff_parallel()
+            else:
+                for _ in self.iter_differences():
+                    pass
+        return self._differences
+
+    def alignment(self):
+        """PageAlignment pairing the sheets of PDF1 with those of PDF2, found while diffing."""
+        if self._alignment is None:
+            self.differences()
+        if self._alignment is None:
+            # Differences handed in by the caller without an alignment are positional
+            self._alignment = PageAlignment.positional(len(self.doc1), len(self.doc2))
+        return self._alignment
+
+    def diff_page(self, table1, table2):
+        MetricsService.count("words", len(table1) + len(table2))
+        with MetricsService.stage("diff"):
+            if PageFingerprintService.is_unchanged(table1, table2):
+                return None
+            missing_values, extra_values = FindMissingOrExraValuesService.find_missing_or_extra_values(
+                table1, table2, tolerance=self.tolerance
+            )
+        with MetricsService.stage("filter"):
+            return FindMissingOrExraValuesService.compare_and_ignore_matching_text(missing_values, extra_values)
+
+    def diff_parallel(self):
+        """Diff page i against page i in the pool, then re-diff inline whatever the alignment pairs differently.
+
+        Word tables come back from the pool in page order and are handled like
+        iter_page_pairs handles extracted pages: they go to the extraction cache as
+        they pass, and only pages from the first one that does not look like the
+        same sheet are held for the alignment.
+        """
+        MetricsService.count("pages", len(self.doc1) + len(self.doc2))
+        collector = PoolPageCollector(self)
+        differences = ParallelCompareService.diff_pages(
+            self.upload1, self.upload2, range(self.num_pages), self.tolerance, self.vocabulary,
+            on_page_words=collector.add if collector.wanted else None,
+            on_pages_done=lambda done, total: self.report_progress("diffing", self.DIFF_SHARE * done / total),
+        )
+        if not collector.finish():
+            self._alignment = PageAlignment.positional(len(self.doc1), len(self.doc2))
+            return differences
+
+        tables1, tables2 = collector.held
+        self._alignment = self.align_pages(tables1, tables2, start=collector.start)
+        aligned = {}
+        for page1, page2 in self._alignment.pairs.items():
+            if page1 == page2:
+                if page1 in differences:
+                    aligned[page1] = differences[page1]
+                continue
+            try:
+                aligned[page1] = self.diff_page(tables1[page1], tables2[page2])
+            except Exception as e:
+                logger.bind(event="page_error", stage="diff", page=page1 + 1).warning(
+                    "Error finding missing or extra values on page {}: {}", page1 + 1, e
+                )
+        return aligned
+
+    def align_pages(self, tables1, tables2, start=None):
+        """PageAlignment of two fully extracted documents.
+
+        Leading pages that look like the same sheet stay paired by position (all
+        of ``range(start)`` when given); the rest goes through PageAlignmentService.
+        """
+        if not Config.COMPARE_ALIGN_PAGES:
+            return PageAlignment.positional(len(tables1), len(tables2))
+        if start is None:
+            start = 0
+            while start < self.num_pages and len(tables1) == len(tables2) and PageAlignmentService.is_same_sheet(
+                tables1[start], tables2[start]
+            ):
+                start += 1
+
+        rest = PageAlignmentService.align(tables1, tables2, range(start, len(tables1)), range(start, len(tables2)))
+        pairs = {page: page for page in range(start)}
+        pairs.update(rest.pairs)
+        return PageAlignment(pairs, rest.removed, rest.added)
+
+    def iter_differences(self):
+        """Yield ``(page_num, difference)`` per compared PDF1 page; see iter_aligned_differences()."""
+        for page1, _, page_difference in self.iter_aligned_differences():
+            yield page1, page_difference
+
+    def iter_aligned_differences(self):
+        """Yield ``(page1, page2, difference)`` as soon as each sheet pair is diffed, in PDF1 page order.
+
+        Yields the same pages and values as differences(), and fills it in once the
+        last page is done.
+        """
+        if self._differences is not None:
+            pairs = self.alignment().pairs
+            for page_num, page_difference in self._differences.items():
+                yield page_num, pairs.get(page_num, page_num), page_difference
+            return
+
+        self.report_progress("extracting", 0.0)
+        MetricsService.count("pages", len(self.doc1) + len(self.doc2))
+        differences = {}
+        for page1, page2, table1, table2 in self.iter_page_pairs():
+            self.report_progress("diffing", self.DIFF_SHARE * page1 / len(self.doc1))
+            try:
+                differences[page1] = self.diff_page(table1, table2)
+            except Exception as e:
+                logger.bind(event="page_error", stage="diff", page=page1 + 1).warning(
+                    "Error finding missing or extra values on page {}: {}", page1 + 1, e
+                )
+                continue
+            yield page1, page2, differences[page1]
+
+        self._differences = differences
+
+    def iter_page_pairs(self):
+        """Yield ``(page1, page2, table1, table2)`` for the aligned sheets and set the alignment.
+
+        Both documents are read one page at a time (see iter_tables). While page i
+        of both looks like the same sheet the pair is yielded and dropped, so the
+        first page costs one page's work and memory stays at one page pair. From
+        the first page that does not, or from the start when the page counts
+        differ, the remaining pages are collected and aligned as a whole.
+        """
+        tables1, tables2 = self.iter_tables(0), self.iter_tables(1)
+        try:
+            start = 0
+            mismatch = None
+            positional = not Config.COMPARE_ALIGN_PAGES or len(self.doc1) == len(self.doc2)
+            while positional and start < self.num_pages:
+                table1, table2 = next(tables1), next(tables2)
+                if Config.COMPARE_ALIGN_PAGES and not PageAlignmentService.is_same_sheet(table1, table2):
+                    mismatch = (table1, table2)
+                    break
+                yield start, start, table1, table2
+                start += 1
+
+            if positional and mismatch is None:
+                # Pages past the shorter document are only read to complete the extraction cache
+                if extraction_cache is not None:
+                    for _ in tables1:
+                        pass
+                    for _ in tables2:
+                        pass
+                self._alignment = PageAlignment.positional(len(self.doc1), len(self.doc2))
+                return
+
+            # Pages before ``start`` are settled; only the rest is held for the alignment
+            rest1 = [None] * start + ([mismatch[0]] if mismatch else []) + list(tables1)
+            rest2 = [None] * start + ([mismatch[1]] if mismatch else []) + list(tables2)
+        finally:
+            tables1.close()
+            tables2.close()
+
+        self._alignment = self.align_pages(rest1, rest2, start=start)
+        for page1, page2 in self._alignment.pairs.items():
+            if page1 >= start:
+                yield page1, page2, rest1[page1], rest2[page2]
+
+    def iter_tables(self, side):
+        """Word tables of one document in page order, from memory, the extraction cache or the PDF itself.
+
+        Pages extracted from the PDF are fed to the extraction cache as they pass,
+        so no list of the whole document's tables is built; the entry is written
+        once the last page went through.
+        """
+        doc, digest = (self.doc1, self.doc2)[side], self.digests[side]
+        if self._content is None and extraction_cache is not None:
+            pages_content = extraction_cache.load(digest, self.vocabulary)
+        else:
+            pages_content = self._content[side] if self._content is not None else None
+        if pages_content is not None:
+            for page in pages_content:
+                yield page['text_and_coordinates']
+            return
+
+        writer = extraction_cache.writer(digest) if extraction_cache is not None else None
+        try:
+            for page in ExtractTextAndCoordinatesService.iter_word_tables(doc, self.vocabulary):
+                if writer is not None:
+                    writer.add(page['text_and_coordinates'])
+                yield page['text_and_coordinates']
+            if writer is not None:
+                writer.commit()
+        finally:
+            # No-op after commit; drops the spooled pages of a document that was not read to the end
+            if writer is not None:
+                writer.discard()
+
+
+class PoolPageCollector:
+    """Takes the page word tables of a pooled diff in page order, for the extraction cache and the alignment.
+
+    Tables go to the cache writers as they arrive. While page i of both
+    documents looks like the same sheet (and the page counts match) it stays
+    paired by position and is dropped; from the first page that does not, the
+    tables are held, as the alignment needs all of them.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.align = Config.COMPARE_ALIGN_PAGES
+        self.writers = None
+        if extraction_cache is not None and session._content is None:
+            self.writers = [extraction_cache.writer(digest) for digest in session.digests]
+        self.wanted = self.align or self.writers is not None
+        self.next_page = 0
+        self.start = 0
+        self.holding = len(session.doc1) != len(session.doc2)
+        self.held = ([], [])
+
+    def add(self, page_num, table1, table2):
+        if page_num != self.next_page:
+            return  # a page failed in the pool; finish() gives up on the alignment and the cache entry
+        self.next_page += 1
+        if self.writers is not None:
+            self.writers[0].add(table1)
+            self.writers[1].add(table2)
+        if not self.align:
+            return
+        if not self.holding and PageAlignmentService.is_same_sheet(table1, table2):
+            self.start += 1
+            return
+        self.holding = True
+        self.held[0].append(table1)
+        self.held[1].append(table2)
+
+    def finish(self):
+        """Extract the pages past the shorter document and commit the cache; False if a page is missing."""
+        session = self.session
+        if not self.wanted or self.next_page != session.num_pages:
+            if self.writers is not None:
+                for writer in self.writers:
+                    writer.discard()
+            return False
+
+        # Workers only see the compared page range; pages past the shorter document are extracted here
+        for side, doc in enumerate((session.doc1, session.doc2)):
+            for page in ExtractTextAndCoordinatesService.iter_word_tables(
+                doc, session.vocabulary, range(session.num_pages, len(doc))
+            ):
+                table = page['text_and_coordinates']
+                if self.writers is not None:
+                    self.writers[side].add(table)
+                if self.align:
+                    self.held[side].append(table)
+        if self.writers is not None:
+            for writer in self.writers:
+                writer.commit()
+        if not self.align:
+            return False
+
+        # Pages before ``start`` are settled; align_pages only reads the rest
+        self.held = tuple([None] * self.start + held for held in self.held)
+        return True
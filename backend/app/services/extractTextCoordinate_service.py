@@ -1,32 +1,80 @@
 from datetime import datetime
 import fitz  # PyMuPDF
+from .wordTable_service import PageWordTable, TextVocabulary
+from .metrics_service import MetricsService
 
 class ExtractTextAndCoordinatesService:
     @staticmethod
     def extract_text_and_coordinates(pdf_file):
-        doc = fitz.open("pdf", pdf_file)
-        pages_content = []
+        return list(ExtractTextAndCoordinatesService.iter_text_and_coordinates(pdf_file))
 
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            words = page.get_text("words")
+    @staticmethod
+    def iter_text_and_coordinates(pdf_file):
+        """Yield extract_text_and_coordinates pages one at a time; the document is closed when the generator ends."""
+        doc = fitz.open("pdf", pdf_file)
+        try:
+            for page_num, words in ExtractTextAndCoordinatesService.iter_page_words(doc):
+                page_data = []
+                for word in words:
+                    text = word[4].strip()
+                    bbox = fitz.Rect(word[0], word[1], word[2], word[3])
+                    font_size = bbox.y1 - bbox.y0  # Estimate font size
+                    page_data.append({'text': text, 'bbox': bbox, 'font_size': font_size})
+
+                yield {'page': page_num, 'text_and_coordinates': page_data}
+        finally:
+            doc.close()
 
-            page_data = []
-            for word in words:
-                text = word[4].strip()
-                bbox = fitz.Rect(word[0], word[1], word[2], word[3])
-                font_size = bbox.y1 - bbox.y0  # Estimate font size
-                page_data.append({'text': text, 'bbox': bbox, 'font_size': font_size})
+    @staticmethod
+    def iter_page_words(doc, page_numbers=None):
+        """Yield ``(page_num, page.get_text("words"))`` for an open document, one page at a time.
+
+        Each page object is dropped before the next one is loaded, so extracting
+        a long document holds one page's objects rather than the whole document's.
+        MuPDF's resource store is shared by every thread of the process and left
+        to its own size limit.
+        """
+        page_numbers = range(len(doc)) if page_numbers is None else page_numbers
+        for page_num in page_numbers:
+            with MetricsService.stage("extract"):
+                page = doc.load_page(page_num)
+                words = page.get_text("words")
+                del page
+            yield page_num, words
 
-            pages_content.append({'page': page_num, 'text_and_coordinates': page_data})
+    @staticmethod
+    def extract_word_tables(pdf_file, vocabulary=None):
+        """Columnar variant of extract_text_and_coordinates: one PageWordTable per page.
 
+        Pass the same vocabulary for both documents so their text ids are comparable.
+        """
+        doc = fitz.open("pdf", pdf_file)
+        pages_content = ExtractTextAndCoordinatesService.extract_word_tables_from_doc(doc, vocabulary)
+        doc.close()
         return pages_content
 
     @staticmethod
-    def generate_summary_page(missing_by_page, extra_by_page, reference_pdf_path):
-        reference_doc = fitz.open('pdf', reference_pdf_path)
-        width, height = reference_doc[0].rect.width, reference_doc[0].rect.height
-        reference_doc.close()
+    def extract_word_tables_from_doc(doc, vocabulary=None):
+        """Same as extract_word_tables, for a document that is already open."""
+        return list(ExtractTextAndCoordinatesService.iter_word_tables(doc, vocabulary))
+
+    @staticmethod
+    def iter_word_tables(doc, vocabulary=None, page_numbers=None):
+        """Yield ``{'page', 'text_and_coordinates'}`` word tables of an open document one page at a time."""
+        vocabulary = vocabulary if vocabulary is not None else TextVocabulary()
+        for page_num, words in ExtractTextAndCoordinatesService.iter_page_words(doc, page_numbers):
+            with MetricsService.stage("extract"):
+                table = PageWordTable.from_words(page_num, words, vocabulary)
+            yield {'page': page_num, 'text_and_coordinates': table}
+
+    @staticmethod
+    @MetricsService.stage("summary")
+    def generate_summary_page(missing_by_page, extra_by_page, reference_pdf_path=None, page_size=None):
+        if page_size is None:
+            reference_doc = fitz.open('pdf', reference_pdf_path)
+            page_size = reference_doc[0].rect.width, reference_doc[0].rect.height
+            reference_doc.close()
+        width, height = page_size
 
         summary_doc = fitz.open()
         summary_page = summary_doc.new_page(width=width, height=height)
@@ -0,0 +1,267 @@
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import numpy as np
+from loguru import logger
+from core.config import Config
+from .wordTable_service import PageWordTable
+
+# Bump whenever extraction output changes (word splitting, stripping, bbox source)
+EXTRACTOR_VERSION = 1
+
+
+class ExtractionCache:
+    """Persistent per-document word tables keyed by document hash and extractor version.
+
+    Each entry is one binary file laid out so it can be memory-mapped and sliced
+    with ``np.frombuffer`` -- loading costs one pass over the unique words, never
+    one per word::
+
+        header   magic, format, page count, word count, vocabulary size, blob size
+        int64    page offsets          (pages + 1)
+        int32    text ids              (words)
+        float32  bboxes                (words x 4)
+        int32    vocabulary lengths    (vocabulary)
+        bytes    vocabulary utf-8 blob
+
+    Every section starts on an 8 byte boundary. Files are written to a temp name
+    and renamed, so concurrent workers never see a partial entry; temp files
+    left behind by a killed writer are removed by the eviction sweep.
+    """
+
+    MAGIC = b"CTWT"
+    FORMAT = 1
+    HEADER = struct.Struct("<4sIIQIQ")
+    SUFFIX = ".words"
+    TEMP_SUFFIX = ".tmp"
+    # A temp file this long untouched belongs to a writer that no longer exists
+    STALE_TEMP_SECONDS = 3600
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.directory, f"{digest}-v{EXTRACTOR_VERSION}{self.SUFFIX}")
+
+    def contains(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+    @staticmethod
+    def align(offset):
+        return (offset + 7) & ~7
+
+    def load(self, digest, vocabulary):
+        """Return the cached ``[{'page', 'text_and_coordinates'}]`` list, or None on a miss."""
+        path = self.path(digest)
+        try:
+            with open(path, "rb") as handle:
+                buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            pages = self.read(buffer, vocabulary)
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Discarding unreadable extraction cache entry {path}: {e}")
+                self.remove(path)
+            with self.lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path)  # mtime doubles as the LRU clock for eviction
+        except OSError:
+            pass  # Evicted by another process since it was mapped; the mapping stays valid
+        with self.lock:
+            self.hits += 1
+        return pages
+
+    def read(self, buffer, vocabulary):
+        magic, file_format, page_count, word_count, vocab_count, blob_size = self.HEADER.unpack_from(buffer, 0)
+        if magic != self.MAGIC or file_format != self.FORMAT:
+            raise ValueError("unknown extraction cache format")
+
+        offset = self.align(self.HEADER.size)
+        page_offsets = np.frombuffer(buffer, dtype=np.int64, count=page_count + 1, offset=offset)
+        offset = self.align(offset + page_offsets.nbytes)
+        text_ids = np.frombuffer(buffer, dtype=np.int32, count=word_count, offset=offset)
+        offset = self.align(offset + text_ids.nbytes)
+        bboxes = np.frombuffer(buffer, dtype=np.float32, count=word_count * 4, offset=offset).reshape(-1, 4)
+        offset = self.align(offset + bboxes.nbytes)
+        lengths = np.frombuffer(buffer, dtype=np.int32, count=vocab_count, offset=offset)
+        offset = self.align(offset + lengths.nbytes)
+        blob = bytes(buffer[offset:offset + blob_size]).decode("utf-8")
+
+        ends = np.cumsum(lengths).tolist()
+        texts = [blob[end - length:end] for end, length in zip(ends, lengths.tolist())]
+        remap = vocabulary.intern_many(texts)
+        if not np.array_equal(remap, np.arange(len(texts))):
+            # Only a fresh vocabulary matches the file's ids; otherwise translate them
+            text_ids = remap[text_ids]
+
+        pages_content = []
+        for page_num in range(page_count):
+            start, end = int(page_offsets[page_num]), int(page_offsets[page_num + 1])
+            table = PageWordTable(page_num, text_ids[start:end], bboxes[start:end], vocabulary)
+            pages_content.append({'page': page_num, 'text_and_coordinates': table})
+        return pages_content
+
+    def store(self, digest, pages_content):
+        """Write the word tables of one document and evict old entries past the size cap."""
+        writer = self.writer(digest)
+        for page in pages_content:
+            writer.add(page['text_and_coordinates'])
+        writer.commit()
+
+    def writer(self, digest):
+        """ExtractionCacheWriter that stores one document's word tables as they are extracted."""
+        return ExtractionCacheWriter(self, digest)
+
+    def stored(self):
+        with self.lock:
+            self.stores += 1
+        self.evict()
+
+    def remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """Delete stale temp files, then least recently used entries until the directory fits in max_bytes.
+
+        Temp files still being written count against max_bytes but are left alone.
+        """
+        entries = []
+        writing = 0
+        stale_before = time.time() - self.STALE_TEMP_SECONDS
+        for entry in os.scandir(self.directory):
+            is_temp = entry.name.endswith(self.TEMP_SUFFIX)
+            if not is_temp and not entry.name.endswith(self.SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if not is_temp:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+            elif stat.st_mtime < stale_before:
+                self.remove(entry.path)
+            else:
+                writing += stat.st_size
+
+        total = writing + sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+            with self.lock:
+                self.evictions += 1
+
+
+class ExtractionCacheWriter:
+    """Builds one cache entry page by page, so the caller never holds a whole document's tables.
+
+    Text ids (translated to the entry's own vocabulary) and bboxes are spooled to
+    temp files as pages are added; commit() writes the header, offsets and
+    vocabulary and copies the spooled sections into the final file.
+    """
+
+    COPY_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, cache, digest):
+        self.cache = cache
+        self.digest = digest
+        self.page_offsets = [0]
+        self.local_ids = {}  # session text id -> id in this entry
+        self.texts = []
+        self.spools = [
+            tempfile.TemporaryFile(dir=cache.directory, suffix=cache.TEMP_SUFFIX),  # text ids
+            tempfile.TemporaryFile(dir=cache.directory, suffix=cache.TEMP_SUFFIX),  # bboxes
+        ]
+
+    def add(self, table):
+        """Append the next page's PageWordTable."""
+        unique_ids, inverse = np.unique(table.text_ids, return_inverse=True)
+        local = np.empty(len(unique_ids), dtype=np.int32)
+        for index, text_id in enumerate(unique_ids.tolist()):
+            local_id = self.local_ids.get(text_id)
+            if local_id is None:
+                local_id = self.local_ids[text_id] = len(self.texts)
+                self.texts.append(table.vocabulary.text(text_id))
+            local[index] = local_id
+        self.spools[0].write(local[inverse.reshape(-1)].tobytes())
+        self.spools[1].write(np.ascontiguousarray(table.bboxes, dtype=np.float32).tobytes())
+        self.page_offsets.append(self.page_offsets[-1] + len(table))
+
+    def commit(self):
+        """Write the entry under its final name and evict old entries past the size cap."""
+        cache = self.cache
+        lengths = np.array([len(text) for text in self.texts], dtype=np.int32)
+        blob_bytes = "".join(self.texts).encode("utf-8")
+        page_offsets = np.array(self.page_offsets, dtype=np.int64)
+        header = cache.HEADER.pack(
+            cache.MAGIC, cache.FORMAT, len(page_offsets) - 1, int(page_offsets[-1]), len(self.texts), len(blob_bytes)
+        )
+
+        path = cache.path(self.digest)
+        handle = tempfile.NamedTemporaryFile(dir=cache.directory, suffix=cache.TEMP_SUFFIX, delete=False)
+        try:
+            with handle:
+                handle.write(header)
+                for section in (page_offsets, *self.spools, lengths):
+                    handle.write(b"\0" * (cache.align(handle.tell()) - handle.tell()))
+                    if isinstance(section, np.ndarray):
+                        handle.write(section.tobytes())
+                        continue
+                    section.seek(0)
+                    for chunk in iter(lambda: section.read(self.COPY_CHUNK_SIZE), b""):
+                        handle.write(chunk)
+                handle.write(b"\0" * (cache.align(handle.tell()) - handle.tell()))
+                handle.write(blob_bytes)
+            os.replace(handle.name, path)
+        except OSError as e:
+            logger.warning(f"Failed to write extraction cache entry {path}: {e}")
+            cache.remove(handle.name)
+            return
+        finally:
+            self.discard()
+
+        cache.stored()
+
+    def discard(self):
+        """Drop the spooled pages without writing an entry."""
+        for spool in self.spools:
+            spool.close()
+
+
+def create_extraction_cache():
+    if not Config.EXTRACTION_CACHE_ENABLED:
+        return None
+    try:
+        return ExtractionCache(Config.EXTRACTION_CACHE_DIR, Config.EXTRACTION_CACHE_MAX_MB * 1024 * 1024)
+    except OSError as e:
+        logger.warning(f"Extraction cache disabled, cannot use {Config.EXTRACTION_CACHE_DIR}: {e}")
+        return None
+
+
+extraction_cache = create_extraction_cache()
@@ -1,5 +1,7 @@
 import fitz
 import io
+import math
+from collections import defaultdict
 from tabulate import tabulate
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
@@ -7,110 +9,100 @@ from reportlab.lib.enums import TA_CENTER
 from reportlab.lib.colors import yellow, white, black
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, ListFlowable, ListItem
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from PyPDF2 import PdfReader, PdfWriter
+import numpy as np
+from loguru import logger
+from .wordTable_service import PageWordTable, WordTableMatcher
+from .metrics_service import MetricsService
 
 class FindMissingOrExraValuesService:
     @classmethod
+    @MetricsService.stage("summary")
     def append_summary_table(cls, doc1, summary_data):
-        try:
-            if not summary_data:
-                print("No summary data available. Returning original PDF.")
-                return doc1
-
-            try:
-                existing_pdf_buffer = io.BytesIO()
-                doc1.save(existing_pdf_buffer)
-                existing_pdf_buffer.seek(0)
-                pdf_reader = PdfReader(existing_pdf_buffer)
-            except Exception as e:
-                print(f"Error while reading existing PDF: {e}")
-                return doc1
+        """Insert the summary table pages in front of doc1, in place, and return doc1.
 
-            writer = PdfWriter()
-            custom_page_size = (landscape(A4)[0], landscape(A4)[1] + 200)
-
-            try:
-                summary_pdf_buffer = io.BytesIO()
-                doc = SimpleDocTemplate(summary_pdf_buffer, pagesize=custom_page_size)
-                elements = []
-                styles = getSampleStyleSheet()
-
-                custom_style = ParagraphStyle("CustomStyle", parent=styles["Normal"], fontSize=18, leading=22)
-
-                elements.append(Paragraph("<b>Summary Report: PDF to PDF Comparison</b>", styles["Title"]))
-                elements.append(Spacer(1, 12))
-
-                table_data = [["Page", "Missing Item from PDF1", "Extra Item in PDF2"]]
-                for page_num, counts in summary_data.items():
-                    table_data.append([
-                        page_num + 1,
-                        counts.get("missing", 0),
-                        counts.get("extra", 0)
-                    ])
-
-                table = Table(table_data, colWidths=[100, 200, 200])
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lightgrey, colors.white]),
-                ]))
-                elements.append(table)
-                elements.append(Spacer(1, 20))
-
-                list_items = [
-                    ListItem(Paragraph("<b>Exact Comparison:</b> Spot Discrepancies: Detects missing (White) or extra (Yellow) items, highlighting differences based on customizable tolerance levels to prevent false alarms.", custom_style)),
-                    ListItem(Paragraph("<b>Advantages:</b> Minimize False Positives: Filters out minor positional shifts to ensure only significant changes are flagged.", custom_style)),
-                    ListItem(Paragraph("<b>Summary:</b> <span color='black' backcolor='white'>Missing Items</span> & <span color='black' backcolor='yellow'>Extra Items</span> are displayed with highlights.", custom_style)),
-                    ListItem(Paragraph("<b>Save:</b> Downloadable Updated PDF: Saves the modified PDF with clear visual markers of differences for easy distribution.", custom_style)),
-                ]
-
-                elements.append(Paragraph("<b><u>Functionalities of PDF-to-PDF Engineering Drawing Comparison Tool:</u></b>", custom_style))
-                elements.append(Spacer(1, 10))
-                elements.append(ListFlowable(list_items, bulletType='bullet'))
-                elements.append(Spacer(1, 20))
-
-                centered_style = ParagraphStyle("CenteredStyle", parent=styles["Italic"], alignment=TA_CENTER)
-                elements.append(Spacer(1, 40))
-                elements.append(Paragraph("<i>End of Summary Page</i>", centered_style))
-
-                doc.build(elements)
-                summary_pdf_buffer.seek(0)
-
-            except Exception as e:
-                print(f"Error while creating summary PDF: {e}")
-                return doc1
-
-            try:
-                new_pdf_reader = PdfReader(summary_pdf_buffer)
-                for page in new_pdf_reader.pages:
-                    writer.add_page(page)
+        The reportlab summary is opened as its own small document and copied in
+        with insert_pdf, so the (possibly huge) drawing is never re-serialized.
+        """
+        if not summary_data:
+            logger.debug("No summary data available. Returning original PDF.")
+            return doc1
 
-                for page in pdf_reader.pages:
-                    writer.add_page(page)
-            except Exception as e:
-                print(f"Error while merging PDFs: {e}")
-                return doc1
+        try:
+            summary_pdf = cls.build_summary_table_pdf(summary_data)
+        except Exception as e:
+            logger.bind(event="summary_error").error("Error while creating summary PDF: {}", e)
+            return doc1
 
+        try:
+            summary_doc = fitz.open("pdf", summary_pdf)
             try:
-                updated_pdf_buffer = io.BytesIO()
-                writer.write(updated_pdf_buffer)
-                updated_pdf_buffer.seek(0)
-                updated_doc = fitz.open(stream=updated_pdf_buffer.read(), filetype="pdf")
-                print("Summary table successfully added to the existing PDF in memory!")
-                return updated_doc
-
-            except Exception as e:
-                print(f"Error while saving updated PDF: {e}")
-                return doc1
-
+                doc1.insert_pdf(summary_doc, start_at=0)
+                summary_pages = len(summary_doc)
+            finally:
+                summary_doc.close()
+            logger.bind(event="summary").debug(
+                "Summary table of {} row(s) added to the PDF as {} page(s)", len(summary_data), summary_pages
+            )
+            return doc1
         except Exception as e:
-            print(f"Unexpected error in append_summary_table: {e}")
+            logger.bind(event="summary_error").error("Error while merging PDFs: {}", e)
             return doc1
 
+    @staticmethod
+    def build_summary_table_pdf(summary_data):
+        """Summary report pages (per-page counts table and tool description) as PDF bytes."""
+        custom_page_size = (landscape(A4)[0], landscape(A4)[1] + 200)
+
+        summary_pdf_buffer = io.BytesIO()
+        doc = SimpleDocTemplate(summary_pdf_buffer, pagesize=custom_page_size)
+        elements = []
+        styles = getSampleStyleSheet()
+
+        custom_style = ParagraphStyle("CustomStyle", parent=styles["Normal"], fontSize=18, leading=22)
+
+        elements.append(Paragraph("<b>Summary Report: PDF to PDF Comparison</b>", styles["Title"]))
+        elements.append(Spacer(1, 12))
+
+        table_data = [["Page", "Missing Item from PDF1", "Extra Item in PDF2"]]
+        for page_num, counts in summary_data.items():
+            table_data.append([
+                page_num + 1,
+                counts.get("missing", 0),
+                counts.get("extra", 0)
+            ])
+
+        table = Table(table_data, colWidths=[100, 200, 200])
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lightgrey, colors.white]),
+        ]))
+        elements.append(table)
+        elements.append(Spacer(1, 20))
+
+        list_items = [
+            ListItem(Paragraph("<b>Exact Comparison:</b> Spot Discrepancies: Detects missing (White) or extra (Yellow) items, highlighting differences based on customizable tolerance levels to prevent false alarms.", custom_style)),
+            ListItem(Paragraph("<b>Advantages:</b> Minimize False Positives: Filters out minor positional shifts to ensure only significant changes are flagged.", custom_style)),
+            ListItem(Paragraph("<b>Summary:</b> <span color='black' backcolor='white'>Missing Items</span> & <span color='black' backcolor='yellow'>Extra Items</span> are displayed with highlights.", custom_style)),
+            ListItem(Paragraph("<b>Save:</b> Downloadable Updated PDF: Saves the modified PDF with clear visual markers of differences for easy distribution.", custom_style)),
+        ]
+
+        elements.append(Paragraph("<b><u>Functionalities of PDF-to-PDF Engineering Drawing Comparison Tool:</u></b>", custom_style))
+        elements.append(Spacer(1, 10))
+        elements.append(ListFlowable(list_items, bulletType='bullet'))
+        elements.append(Spacer(1, 20))
+
+        centered_style = ParagraphStyle("CenteredStyle", parent=styles["Italic"], alignment=TA_CENTER)
+        elements.append(Spacer(1, 40))
+        elements.append(Paragraph("<i>End of Summary Page</i>", centered_style))
+
+        doc.build(elements)
+        return summary_pdf_buffer.getvalue()
+
     def is_same_location(rect1, rect2, tolerance=5):
         return (abs(rect1.x0 - rect2.x0) < tolerance and
                 abs(rect1.y0 - rect2.y0) < tolerance and
@@ -119,36 +111,41 @@ class FindMissingOrExraValuesService:
 
     @staticmethod
     def find_missing_or_extra_values(page1_data, page2_data, tolerance=5):
-        missing_in_pdf1 = []
-        extra_in_pdf2 = []
-
-        for item1 in page1_data:
-            found_match = False
-            for item2 in page2_data:
-                if item1['text'] == item2['text'] and FindMissingOrExraValuesService.is_same_location(item1['bbox'], item2['bbox'], tolerance):
-                    found_match = True
-                    break
-            if not found_match:
-                missing_in_pdf1.append(item1)
-
-        for item2 in page2_data:
-            found_match = False
-            for item1 in page1_data:
-                if item2['text'] == item1['text'] and FindMissingOrExraValuesService.is_same_location(item2['bbox'], item1['bbox'], tolerance):
-                    found_match = True
-                    break
-            if not found_match:
-                extra_in_pdf2.append(item2)
+        """Index-backed matcher: same result as the nested-loop scan, but each word only
+        checks candidates with the same text in the neighbouring grid cells."""
+        if isinstance(page1_data, PageWordTable):
+            return FindMissingOrExraValuesService.find_missing_or_extra_words(page1_data, page2_data, tolerance)
+
+        if tolerance <= 0:
+            # is_same_location can never succeed, so every word is unmatched
+            return list(page1_data), list(page2_data)
 
+        page1_index = WordLocationIndex(page1_data, tolerance)
+        page2_index = WordLocationIndex(page2_data, tolerance)
+
+        missing_in_pdf1 = [item1 for item1 in page1_data if not page2_index.has_match(item1)]
+        extra_in_pdf2 = [item2 for item2 in page2_data if not page1_index.has_match(item2)]
+
+        return missing_in_pdf1, extra_in_pdf2
+
+    @staticmethod
+    def find_missing_or_extra_words(page1_table, page2_table, tolerance=5):
+        """Columnar variant of find_missing_or_extra_values; returns PageWordTable subsets."""
+        missing_in_pdf1 = page1_table.take(~WordTableMatcher.match_mask(page1_table, page2_table, tolerance))
+        extra_in_pdf2 = page2_table.take(~WordTableMatcher.match_mask(page2_table, page1_table, tolerance))
         return missing_in_pdf1, extra_in_pdf2
 
     @staticmethod
-    def highlight_missing_values(page, missing_values, color=(1, 0, 0)):
-        for item in missing_values:
-            FindMissingOrExraValuesService.highlight_existing_value(page, item['bbox'], color)
+    def highlight_missing_values(page, missing_values, color=(1, 0, 0), mode="word", oc=0):
+        FindMissingOrExraValuesService.highlight_values(page, missing_values, color, mode, oc)
 
     @staticmethod
     def compare_and_ignore_matching_text(missing_values, extra_values):
+        if isinstance(missing_values, PageWordTable):
+            missing_filtered = missing_values.take(~np.isin(missing_values.text_ids, extra_values.text_ids))
+            extra_filtered = extra_values.take(~np.isin(extra_values.text_ids, missing_values.text_ids))
+            return missing_filtered, extra_filtered
+
         missing_texts = set(item['text'] for item in missing_values)
         extra_texts = set(item['text'] for item in extra_values)
 
@@ -158,22 +155,117 @@ class FindMissingOrExraValuesService:
         return missing_filtered, extra_filtered
 
     @staticmethod
-    def highlight_existing_value(page, rect, color=(0, 0, 1)):
+    def highlight_existing_value(page, rect, color=(0, 0, 1), oc=0):
+        """Highlight one rect, or a list of rects as the quads of a single annotation.
+
+        ``oc`` is the xref of an optional content group (layer) to put it on.
+        """
         highlight = page.add_highlight_annot(rect)
         highlight.set_colors(stroke=color, fill=color)
+        if oc:
+            highlight.set_oc(oc)
         highlight.update()
 
     @staticmethod
-    def highlight_extra_values(page, extra_values, color):
-        for item in extra_values:
-            FindMissingOrExraValuesService.highlight_existing_value(page, item['bbox'], color=color)
+    def highlight_extra_values(page, extra_values, color, mode="word", oc=0):
+        FindMissingOrExraValuesService.highlight_values(page, extra_values, color, mode, oc)
+
+    # word: one highlight annotation per word
+    # line: one multi-quad highlight annotation per text line
+    # flatten: no annotations, translucent rects drawn into one content stream
+    HIGHLIGHT_MODES = ("word", "line", "flatten")
+    FLATTEN_OPACITY = 0.4
+
+    @staticmethod
+    @MetricsService.stage("annotate")
+    def highlight_values(page, values, color, mode="word", oc=0):
+        if mode not in FindMissingOrExraValuesService.HIGHLIGHT_MODES:
+            raise ValueError(f"Unknown highlight mode '{mode}', expected one of {FindMissingOrExraValuesService.HIGHLIGHT_MODES}")
+
+        if mode == "word":
+            for item in values:
+                FindMissingOrExraValuesService.highlight_existing_value(page, item['bbox'], color, oc)
+            return
+
+        rects = FindMissingOrExraValuesService.item_rects(values)
+        if mode == "line":
+            for line in FindMissingOrExraValuesService.group_lines(rects):
+                FindMissingOrExraValuesService.highlight_existing_value(page, line, color, oc)
+            return
+
+        shape = page.new_shape()
+        for rect in rects:
+            shape.draw_rect(rect)
+        shape.finish(color=None, fill=color, fill_opacity=FindMissingOrExraValuesService.FLATTEN_OPACITY, width=0, oc=oc)
+        shape.commit(overlay=True)
+
+    @staticmethod
+    def item_rects(values):
+        if isinstance(values, PageWordTable):
+            return [fitz.Rect(bbox) for bbox in values.bboxes.tolist()]
+        return [fitz.Rect(item['bbox']) for item in values]
+
+    @staticmethod
+    def group_lines(rects):
+        """Group word rects into text lines, each ordered left to right.
+
+        A rect joins the current line when its vertical centre is within half a
+        word height of the line's first rect.
+        """
+        lines = []
+        for rect in sorted(rects, key=lambda rect: ((rect.y0 + rect.y1) / 2, rect.x0)):
+            if lines:
+                anchor = lines[-1][0]
+                centre_gap = abs((rect.y0 + rect.y1) - (anchor.y0 + anchor.y1)) / 2
+                if centre_gap <= max(anchor.height, rect.height) / 2:
+                    lines[-1].append(rect)
+                    continue
+            lines.append([rect])
+        for line in lines:
+            line.sort(key=lambda rect: rect.x0)
+        return lines
 
     @staticmethod
-    def insert_extra(page, items, color=(0, 0, 1)):
+    @MetricsService.stage("annotate")
+    def insert_extra(page, items, color=(0, 0, 1), oc=0):
+        """Write the extra words onto the page in one content-stream update.
+
+        ``page.insert_text`` re-reads and rewrites the page contents on every
+        call; a Shape collects all words under one font resource and commits once.
+        """
+        shape = page.new_shape()
         for item in items:
-            rect = item['bbox']
-            height = rect.height
-            fontsize = max(int(height * 0.7), 4)
-            page.insert_text(rect.tl, item['text'], fontsize=fontsize, fontname="Helvetica-Bold", color=color)
+            rect = fitz.Rect(item['bbox'])
+            fontsize = max(int(rect.height * 0.7), 4)
+            shape.insert_text(rect.tl, item['text'], fontsize=fontsize, fontname="Helvetica-Bold", color=color, oc=oc)
+        shape.commit()
 
 
+class WordLocationIndex:
+    """Spatial hash of page words keyed by (text, grid cell of the top-left corner).
+
+    Cells are ``tolerance`` wide, so any bbox that passes ``is_same_location``
+    lies in the same or an adjacent cell of the probe word.
+    """
+
+    NEIGHBOUR_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+    def __init__(self, items, tolerance=5):
+        self.tolerance = tolerance
+        self.buckets = defaultdict(list)
+        for item in items:
+            text, cell_x, cell_y = self.cell_key(item)
+            self.buckets[(text, cell_x, cell_y)].append(item['bbox'])
+
+    def cell_key(self, item):
+        rect = item['bbox']
+        return item['text'], math.floor(rect.x0 / self.tolerance), math.floor(rect.y0 / self.tolerance)
+
+    def has_match(self, item):
+        text, cell_x, cell_y = self.cell_key(item)
+        rect = item['bbox']
+        for dx, dy in self.NEIGHBOUR_OFFSETS:
+            for candidate in self.buckets.get((text, cell_x + dx, cell_y + dy), ()):
+                if FindMissingOrExraValuesService.is_same_location(rect, candidate, self.tolerance):
+                    return True
+        return False
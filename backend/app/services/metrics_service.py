@@ -0,0 +1,238 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from core.config import Config
+from .compareResult_service import comparison_cache
+from .extractionCache_service import extraction_cache
+
+
+class Histogram:
+    """Prometheus histogram with fixed upper bounds, one series per tuple of label values."""
+
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @staticmethod
+    def label_text(labels, bound):
+        le = bound if isinstance(bound, str) else f"{bound:g}"
+        return ",".join(labels + [f'le="{le}"'])
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series_items = sorted((key, dict(series, buckets=list(series["buckets"]))) for key, series in self.series.items())
+        for label_values, series in series_items:
+            labels = [f'{label}="{value}"' for label, value in zip(self.labels, label_values)]
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["buckets"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{{{Histogram.label_text(labels, bound)}}} {cumulative}")
+            lines.append(f"{self.name}_bucket{{{Histogram.label_text(labels, '+Inf')}}} {series['count']}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {series['sum']:.6f}")
+            lines.append(f"{self.name}_count{suffix} {series['count']}")
+        return lines
+
+
+class StageTimings:
+    """Seconds per comparison stage plus page and word counts of one request or job."""
+
+    def __init__(self):
+        self.seconds = {}
+        self.counts = {}
+
+    def add(self, stage, seconds):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def count(self, name, value):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def merge(self, data):
+        """Add timings sent back by a pool worker (see to_json)."""
+        for stage, seconds in data.get("seconds", {}).items():
+            self.add(stage, seconds)
+        for name, value in data.get("counts", {}).items():
+            self.count(name, value)
+
+    def to_json(self):
+        return {"seconds": dict(self.seconds), "counts": dict(self.counts)}
+
+    @classmethod
+    def from_json(cls, data):
+        timings = cls()
+        timings.merge(data)
+        return timings
+
+    def server_timing(self, total=None):
+        """``Server-Timing`` header value, durations in milliseconds; comparison stages first."""
+        stages = [stage for stage in MetricsService.STAGES if stage in self.seconds]
+        stages += [stage for stage in self.seconds if stage not in MetricsService.STAGES]
+        entries = [f"{stage};dur={self.seconds[stage] * 1000:.1f}" for stage in stages]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current_timings = contextvars.ContextVar("stage_timings", default=None)
+
+
+class MetricsService:
+    """Per-stage timing of the comparison pipeline, exposed as Server-Timing and in Prometheus text format.
+
+    A request (or job, or pool task) collects into its own StageTimings; code on
+    the hot path only wraps a stage in ``with MetricsService.stage(name):``.
+    Once the request is done its totals go into the histograms, so each
+    observation is one comparison. Histograms live in the process that serves
+    ``/metrics``, so with several uwsgi processes every scrape sees one of them.
+    """
+
+    STAGES = ("extract", "diff", "filter", "annotate", "summary", "watermark", "save")
+
+    SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+    STAGE_SECONDS = Histogram(
+        "cadstera_compare_stage_seconds", "Seconds one comparison request or job spent in each stage",
+        SECONDS_BUCKETS, labels=("stage",),
+    )
+    PAGES = Histogram(
+        "cadstera_compare_pages", "Pages of both documents per comparison request or job",
+        (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000),
+    )
+    WORDS = Histogram(
+        "cadstera_compare_words", "Words compared per comparison request or job",
+        (100, 1000, 5000, 10000, 50000, 100000, 500000, 1000000, 5000000),
+    )
+    REQUEST_SECONDS = Histogram(
+        "cadstera_http_request_seconds", "Request duration including streamed bodies",
+        SECONDS_BUCKETS, labels=("endpoint",),
+    )
+    INSPECT_SECONDS = Histogram(
+        "cadstera_input_inspection_seconds", "Seconds block_suspicious_input spent scanning one request",
+        (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+    )
+    INSPECT_CHARS = Histogram(
+        "cadstera_input_inspection_chars", "Characters block_suspicious_input scanned per request",
+        (10, 100, 1000, 10000, 100000, 1000000),
+    )
+
+    @staticmethod
+    def begin():
+        """Start collecting for the current request; later stages in this context add to it."""
+        timings = StageTimings()
+        _current_timings.set(timings)
+        return timings
+
+    @staticmethod
+    @contextmanager
+    def collect():
+        """Collect the stages run inside the block (jobs, pool tasks) into a fresh StageTimings."""
+        timings = StageTimings()
+        token = _current_timings.set(timings)
+        try:
+            yield timings
+        finally:
+            _current_timings.reset(token)
+
+    @staticmethod
+    def current():
+        return _current_timings.get()
+
+    @staticmethod
+    def end():
+        """Stop collecting in this context (the thread outlives the request)."""
+        _current_timings.set(None)
+
+    @staticmethod
+    @contextmanager
+    def stage(name):
+        timings = _current_timings.get()
+        if timings is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings.add(name, time.perf_counter() - start)
+
+    @staticmethod
+    def count(name, value):
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.count(name, value)
+
+    @staticmethod
+    def merge(data):
+        timings = _current_timings.get()
+        if timings is not None and data:
+            timings.merge(data)
+
+    @staticmethod
+    def record_inspection(seconds, chars):
+        """Scan cost of the request's input inspection: a Server-Timing entry and two histograms."""
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add("inspect", seconds)
+        if Config.METRICS_ENABLED:
+            MetricsService.INSPECT_SECONDS.observe(seconds)
+            MetricsService.INSPECT_CHARS.observe(chars)
+
+    @staticmethod
+    def observe(timings):
+        """Put one finished comparison's totals into the histograms; requests that compared nothing are skipped."""
+        stages = [stage for stage in MetricsService.STAGES if stage in timings.seconds]
+        if not Config.METRICS_ENABLED or not stages:
+            return
+        for stage in stages:
+            MetricsService.STAGE_SECONDS.observe(timings.seconds[stage], stage)
+        if "pages" in timings.counts:
+            MetricsService.PAGES.observe(timings.counts["pages"])
+        if "words" in timings.counts:
+            MetricsService.WORDS.observe(timings.counts["words"])
+
+    @staticmethod
+    def render():
+        lines = []
+        for histogram in (
+            MetricsService.STAGE_SECONDS, MetricsService.PAGES, MetricsService.WORDS, MetricsService.REQUEST_SECONDS,
+            MetricsService.INSPECT_SECONDS, MetricsService.INSPECT_CHARS,
+        ):
+            lines.extend(histogram.render())
+
+        counters = [
+            ("cadstera_comparison_cache_hits_total", "Comparison result cache hits", comparison_cache.hits),
+            ("cadstera_comparison_cache_misses_total", "Comparison result cache misses", comparison_cache.misses),
+        ]
+        if extraction_cache is not None:
+            stats = extraction_cache.stats()
+            counters += [
+                ("cadstera_extraction_cache_hits_total", "Extraction cache hits", stats["hits"]),
+                ("cadstera_extraction_cache_misses_total", "Extraction cache misses", stats["misses"]),
+                ("cadstera_extraction_cache_stores_total", "Extraction cache entries written", stats["stores"]),
+                ("cadstera_extraction_cache_evictions_total", "Extraction cache entries evicted", stats["evictions"]),
+            ]
+        for name, help_text, value in counters:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {value}"]
+        lines += [
+            "# HELP cadstera_comparison_cache_entries Comparison results held in this process",
+            "# TYPE cadstera_comparison_cache_entries gauge",
+            f"cadstera_comparison_cache_entries {len(comparison_cache.entries)}",
+        ]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,188 @@
+import numpy as np
+from .pageFingerprint_service import PageFingerprintService
+
+
+class PageAlignment:
+    """Which sheet of PDF2 each sheet of PDF1 is compared with.
+
+    ``pairs`` maps a PDF1 page to its PDF2 page; ``removed`` are PDF1 pages and
+    ``added`` PDF2 pages without a counterpart.
+    """
+
+    __slots__ = ("pairs", "removed", "added")
+
+    def __init__(self, pairs, removed=(), added=()):
+        self.pairs = dict(sorted(pairs.items()))
+        self.removed = sorted(removed)
+        self.added = sorted(added)
+
+    @classmethod
+    def positional(cls, page_count1, page_count2):
+        """Page i with page i; pages past the shorter document are removed or added."""
+        common = min(page_count1, page_count2)
+        return cls({page: page for page in range(common)}, range(common, page_count1), range(common, page_count2))
+
+    @property
+    def moved(self):
+        return [(page1, page2) for page1, page2 in self.pairs.items() if page1 != page2]
+
+    def to_json(self):
+        return {
+            "removed": self.removed,
+            "added": self.added,
+            "moved": [{"pdf1": page1, "pdf2": page2} for page1, page2 in self.moved],
+        }
+
+
+class PageAlignmentService:
+    """Pairs the sheets of two drawing sets by cheap similarity signatures instead of by position.
+
+    Each page is reduced to its set of distinct word ids (both documents of a
+    session share one vocabulary) and a MinHash signature of that set. Locality
+    sensitive hashing over signature bands proposes candidate pairs, so pages are
+    never compared all against all; candidates are scored by the exact Jaccard
+    similarity of their word sets, plus a bonus when the title blocks read the
+    same, and matched greedily from the best score down.
+    """
+
+    NUM_HASHES = 60
+    BANDS = 20  # 3 rows per band: pages with 50% of their words in common collide in ~93% of cases
+    PRIME = (1 << 31) - 1
+    HASH_PARAMS = np.random.RandomState(20240601).randint(1, PRIME, size=(2, NUM_HASHES)).astype(np.uint64)
+
+    # Page i of both documents is taken as the same sheet from this similarity on
+    POSITIONAL_MIN = 0.5
+    # Weakest similarity at which two sheets are still paired by their words
+    MATCH_MIN = 0.3
+    TITLE_BLOCK_BONUS = 0.2
+    # Title block: words in the lower right of the text extent (x and y fractions)
+    TITLE_BLOCK_REGION = (0.6, 0.75)
+
+    @staticmethod
+    def word_set(table):
+        return np.unique(table.text_ids)
+
+    @staticmethod
+    def similarity(words1, words2):
+        """Jaccard similarity of two sorted arrays of distinct word ids; two empty pages count as equal."""
+        if not len(words1) and not len(words2):
+            return 1.0
+        common = len(np.intersect1d(words1, words2, assume_unique=True))
+        return common / (len(words1) + len(words2) - common)
+
+    @staticmethod
+    def is_same_sheet(table1, table2):
+        """Cheap check that page i of both documents shows the same sheet, used before any alignment."""
+        if PageFingerprintService.is_unchanged(table1, table2):
+            return True
+        similarity = PageAlignmentService.similarity(
+            PageAlignmentService.word_set(table1), PageAlignmentService.word_set(table2)
+        )
+        return similarity >= PageAlignmentService.POSITIONAL_MIN
+
+    @staticmethod
+    def signature(words):
+        a, b = PageAlignmentService.HASH_PARAMS
+        values = (np.outer(a, words.astype(np.uint64)) + b[:, None]) % PageAlignmentService.PRIME
+        return values.min(axis=1)
+
+    @staticmethod
+    def title_block(table):
+        """Distinct word ids of the title block, as a hashable key (None when the page has no text)."""
+        if not len(table):
+            return None
+        bboxes = table.bboxes
+        x_min, y_min = bboxes[:, 0].min(), bboxes[:, 1].min()
+        x_max, y_max = bboxes[:, 2].max(), bboxes[:, 3].max()
+        x_fraction, y_fraction = PageAlignmentService.TITLE_BLOCK_REGION
+        inside = (bboxes[:, 0] >= x_min + (x_max - x_min) * x_fraction) & (
+            bboxes[:, 1] >= y_min + (y_max - y_min) * y_fraction
+        )
+        words = np.unique(table.text_ids[inside])
+        return words.tobytes() if len(words) else None
+
+    @staticmethod
+    def candidates(pages1, pages2, words1, words2):
+        """Page pairs whose signatures share at least one band, plus pairs with the same title block."""
+        rows = PageAlignmentService.NUM_HASHES // PageAlignmentService.BANDS
+        buckets = {}
+        for side, pages, words in ((0, pages1, words1), (1, pages2, words2)):
+            for page in pages:
+                if not len(words[page]):
+                    continue
+                signature = PageAlignmentService.signature(words[page])
+                for band in range(PageAlignmentService.BANDS):
+                    key = (band, signature[band * rows:(band + 1) * rows].tobytes())
+                    buckets.setdefault(key, ([], []))[side].append(page)
+
+        found = set()
+        for bucket1, bucket2 in buckets.values():
+            found.update((page1, page2) for page1 in bucket1 for page2 in bucket2)
+        return found
+
+    @staticmethod
+    def align(tables1, tables2, pages1=None, pages2=None):
+        """PageAlignment of the given pages (default: all) of two lists of PageWordTables."""
+        pages1 = list(range(len(tables1))) if pages1 is None else list(pages1)
+        pages2 = list(range(len(tables2))) if pages2 is None else list(pages2)
+        words1 = {page: PageAlignmentService.word_set(tables1[page]) for page in pages1}
+        words2 = {page: PageAlignmentService.word_set(tables2[page]) for page in pages2}
+        titles1 = {page: PageAlignmentService.title_block(tables1[page]) for page in pages1}
+        titles2 = {page: PageAlignmentService.title_block(tables2[page]) for page in pages2}
+
+        candidates = PageAlignmentService.candidates(pages1, pages2, words1, words2)
+        pages_by_title = {}
+        for page in pages2:
+            if titles2[page] is not None:
+                pages_by_title.setdefault(titles2[page], []).append(page)
+        for page1 in pages1:
+            candidates.update((page1, page2) for page2 in pages_by_title.get(titles1[page1], ()))
+
+        scored = []
+        for page1, page2 in candidates:
+            score = PageAlignmentService.similarity(words1[page1], words2[page2])
+            if titles1[page1] is not None and titles1[page1] == titles2[page2]:
+                score += PageAlignmentService.TITLE_BLOCK_BONUS
+            if score >= PageAlignmentService.MATCH_MIN:
+                scored.append((-score, abs(page1 - page2), page1, page2))
+        scored.sort()
+
+        pairs = {}
+        taken = set()
+        for _, _, page1, page2 in scored:
+            if page1 not in pairs and page2 not in taken:
+                pairs[page1] = page2
+                taken.add(page2)
+
+        PageAlignmentService.pair_gaps(pairs, [page for page in pages1 if page not in pairs],
+                                       [page for page in pages2 if page not in taken])
+        matched2 = set(pairs.values())
+        return PageAlignment(
+            pairs,
+            removed=[page for page in pages1 if page not in pairs],
+            added=[page for page in pages2 if page not in matched2],
+        )
+
+    @staticmethod
+    def pair_gaps(pairs, left1, left2):
+        """Pair unmatched sheets in order where both documents have the same number of them between two matches.
+
+        That is a sheet revised beyond recognition (or blank sheets) in the same
+        slot; gaps with different counts stay unmatched, as added or removed sheets.
+        """
+        anchors1 = sorted(pairs)
+        anchors2 = sorted(pairs.values())
+
+        def gap_key(page, anchors, partner):
+            before = [anchor for anchor in anchors if anchor < page]
+            return partner(before[-1]) if before else -1
+
+        gaps = {}
+        for page in left1:
+            gaps.setdefault(gap_key(page, anchors1, pairs.get), ([], []))[0].append(page)
+        for page in left2:
+            gaps.setdefault(gap_key(page, anchors2, lambda anchor: anchor), ([], []))[1].append(page)
+
+        for gap1, gap2 in gaps.values():
+            if len(gap1) == len(gap2):
+                pairs.update(zip(gap1, gap2))
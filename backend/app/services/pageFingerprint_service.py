@@ -0,0 +1,87 @@
+import hashlib
+import numpy as np
+from .wordTable_service import TextVocabulary, PageWordTable
+from .upload_service import PDFUpload
+
+
+class PageFingerprintService:
+    """Cheap per-page hashes used to skip diffing sheets that did not change."""
+
+    MODES = ("words", "content")
+
+    @staticmethod
+    def word_fingerprint(table):
+        """Hash of the page's sorted (text, bbox) tuples.
+
+        Two pages with the same word fingerprint always diff to zero missing/extra
+        items, so the comparison can safely skip them.
+        """
+        digest = hashlib.sha1()
+        if len(table):
+            texts = np.array(table.vocabulary.texts, dtype=object)[table.text_ids]
+            bboxes = table.bboxes
+            order = np.lexsort((bboxes[:, 3], bboxes[:, 2], bboxes[:, 1], bboxes[:, 0], texts.astype(str)))
+            digest.update("\x00".join(texts[order]).encode("utf-8"))
+            digest.update(np.ascontiguousarray(bboxes[order]).tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def content_fingerprint(doc, page):
+        """Hash of the page size, content stream and XObject streams; needs no text extraction.
+
+        Cheaper than the word fingerprint, but any re-serialization of the drawing
+        (even a visually identical one) reports the page as changed.
+        """
+        digest = hashlib.sha1()
+        digest.update(repr(tuple(page.rect)).encode("ascii"))
+        digest.update(page.read_contents())
+        for xobject in page.get_xobjects():
+            digest.update(doc.xref_stream_raw(xobject[0]) or b"")
+        return digest.hexdigest()
+
+    @staticmethod
+    def is_unchanged(table1, table2):
+        if len(table1) != len(table2):
+            return False
+        return PageFingerprintService.word_fingerprint(table1) == PageFingerprintService.word_fingerprint(table2)
+
+    @staticmethod
+    def document_fingerprints(pdf_file, mode="words"):
+        if mode not in PageFingerprintService.MODES:
+            raise ValueError(f"Unknown fingerprint mode '{mode}', expected one of {PageFingerprintService.MODES}")
+
+        doc = PDFUpload.coerce(pdf_file).open()
+        vocabulary = TextVocabulary()
+        fingerprints = []
+        for page_num in range(len(doc)):
+            page = doc.load_page(page_num)
+            if mode == "content":
+                fingerprints.append(PageFingerprintService.content_fingerprint(doc, page))
+            else:
+                table = PageWordTable.from_words(page_num, page.get_text("words"), vocabulary)
+                fingerprints.append(PageFingerprintService.word_fingerprint(table))
+        doc.close()
+        return fingerprints
+
+    @staticmethod
+    def fingerprint_map(pdf_file1, pdf_file2, mode="words"):
+        """Per-page fingerprints of both documents and which sheets changed."""
+        fingerprints1 = PageFingerprintService.document_fingerprints(pdf_file1, mode)
+        fingerprints2 = PageFingerprintService.document_fingerprints(pdf_file2, mode)
+
+        pages = {}
+        for page_num in range(max(len(fingerprints1), len(fingerprints2))):
+            fingerprint1 = fingerprints1[page_num] if page_num < len(fingerprints1) else None
+            fingerprint2 = fingerprints2[page_num] if page_num < len(fingerprints2) else None
+            pages[page_num] = {
+                'pdf1': fingerprint1,
+                'pdf2': fingerprint2,
+                'unchanged': fingerprint1 is not None and fingerprint1 == fingerprint2,
+            }
+
+        return {
+            'mode': mode,
+            'page_count': {'pdf1': len(fingerprints1), 'pdf2': len(fingerprints2)},
+            'changed_pages': [page_num for page_num, entry in pages.items() if not entry['unchanged']],
+            'pages': pages,
+        }
@@ -0,0 +1,260 @@
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import fitz
+import numpy as np
+from loguru import logger
+from core.config import Config
+from .wordTable_service import PageWordTable, TextVocabulary
+from .findMissingOrExtraValues_service import FindMissingOrExraValuesService
+from .pageFingerprint_service import PageFingerprintService
+from .upload_service import PDFUpload
+from .metrics_service import MetricsService
+
+
+def diff_page_range(pdf_path1, pdf_path2, page_numbers, tolerance, collect_words=False):
+    """Process-pool worker: open both PDFs, diff the given pages and return plain rows.
+
+    ``differences`` maps each page to None when unchanged, otherwise to
+    ``(missing_rows, extra_rows)`` where rows are ``(texts, N x 4 float32 bboxes)``.
+    Pages that fail are left out. With ``collect_words`` the full word tables come
+    back as well (ids into ``texts``), so the caller can fill the extraction cache.
+    ``timings`` are the chunk's stage seconds, for the caller's MetricsService totals.
+    """
+    doc1 = fitz.open(pdf_path1)
+    doc2 = fitz.open(pdf_path2)
+    vocabulary = TextVocabulary()
+    results = {}
+    words = {}
+
+    with MetricsService.collect() as timings:
+        try:
+            for page_num in page_numbers:
+                try:
+                    with MetricsService.stage("extract"):
+                        table1 = PageWordTable.from_words(page_num, doc1.load_page(page_num).get_text("words"), vocabulary)
+                        table2 = PageWordTable.from_words(page_num, doc2.load_page(page_num).get_text("words"), vocabulary)
+                    if collect_words:
+                        words[page_num] = (table1.text_ids, table1.bboxes, table2.text_ids, table2.bboxes)
+                    MetricsService.count("words", len(table1) + len(table2))
+                    with MetricsService.stage("diff"):
+                        unchanged = PageFingerprintService.is_unchanged(table1, table2)
+                        if not unchanged:
+                            missing, extra = FindMissingOrExraValuesService.find_missing_or_extra_values(
+                                table1, table2, tolerance
+                            )
+                    if unchanged:
+                        results[page_num] = None
+                        continue
+
+                    with MetricsService.stage("filter"):
+                        missing, extra = FindMissingOrExraValuesService.compare_and_ignore_matching_text(missing, extra)
+                    results[page_num] = (ParallelCompareService.to_rows(missing), ParallelCompareService.to_rows(extra))
+                except Exception as e:
+                    logger.bind(event="page_error", stage="diff", page=page_num + 1).warning(
+                        "Error finding missing or extra values on page {}: {}", page_num + 1, e
+                    )
+        finally:
+            doc1.close()
+            doc2.close()
+
+    return {
+        "differences": results,
+        "words": words,
+        "texts": vocabulary.texts if collect_words else [],
+        "timings": timings.to_json(),
+    }
+
+
+class ProcessPoolService:
+    """A lazily started process pool per subclass, dropped when one of its workers dies.
+
+    Subclasses set their own ``_executor_lock`` and ``worker_count()``.
+    """
+
+    _executor = None
+
+    @classmethod
+    def executor(cls):
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=cls.worker_count(),
+                    mp_context=multiprocessing.get_context(Config.COMPARE_MP_CONTEXT),
+                )
+            return cls._executor
+
+    @classmethod
+    def reset_executor(cls, executor):
+        """Drop a pool whose worker died (segfault, OOM kill) so the next request starts a fresh one."""
+        with cls._executor_lock:
+            if cls._executor is executor:
+                cls._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ParallelCompareService(ProcessPoolService):
+    """Splits the per-page diff of two PDFs across a bounded process pool."""
+
+    _executor_lock = threading.Lock()
+
+    @staticmethod
+    def uwsgi_concurrency():
+        """Number of requests uwsgi may run at once on this host (processes x threads)."""
+        try:
+            import uwsgi
+            options = uwsgi.opt
+        except ImportError:
+            options = {
+                "processes": os.getenv("UWSGI_PROCESSES", 1),
+                "threads": os.getenv("UWSGI_THREADS", 1),
+            }
+
+        def option(name):
+            value = options.get(name, 1)
+            if isinstance(value, (list, tuple)):
+                value = value[-1]
+            try:
+                return max(1, int(value))
+            except (TypeError, ValueError):
+                return 1
+
+        return option("processes") * option("threads")
+
+    @staticmethod
+    def worker_count():
+        if Config.COMPARE_WORKERS > 0:
+            return Config.COMPARE_WORKERS
+        # Share the cores between every request uwsgi can serve concurrently
+        return max(1, (os.cpu_count() or 1) // ParallelCompareService.uwsgi_concurrency())
+
+    @staticmethod
+    def should_parallelize(num_pages, workers=None):
+        """Whether to diff in the pool; ``workers`` overrides the configured pool size (1 = always inline)."""
+        if workers is None:
+            workers = ParallelCompareService.worker_count()
+        return workers > 1 and num_pages >= Config.COMPARE_PARALLEL_MIN_PAGES
+
+    @classmethod
+    def iter_chunk_results(cls, executor, futures, chunks, diff_inline):
+        """Yield ``(result, pages)`` per chunk in order; once the pool breaks, the pages left are diffed inline."""
+        for position, (future, pages) in enumerate(zip(futures, chunks)):
+            try:
+                result = future.result()
+                # Let the chunk's words go once the caller is done with them
+                futures[position] = None
+            except BrokenProcessPool as e:
+                remaining = [page for pages in chunks[position:] for page in pages]
+                logger.bind(event="pool_broken", stage="diff").error(
+                    "Comparison pool broke ({}); diffing the remaining {} page(s) inline", e, len(remaining)
+                )
+                cls.reset_executor(executor)
+                yield diff_inline(remaining), remaining
+                return
+            yield result, pages
+
+    @staticmethod
+    def to_rows(table):
+        return [table.text(index) for index in range(len(table))], table.bboxes
+
+    @staticmethod
+    def from_rows(page_num, rows, vocabulary):
+        texts, bboxes = rows
+        return PageWordTable(page_num, vocabulary.intern_many(texts), np.asarray(bboxes, dtype=np.float32), vocabulary)
+
+    @staticmethod
+    def worker_path(pdf_file):
+        """Path workers can open the PDF from, and whether it is a temp copy to delete.
+
+        Uploads spooled to disk are shared as they are; in-memory PDFs are written
+        to a temp file once.
+        """
+        upload = PDFUpload.coerce(pdf_file)
+        if upload.path is not None:
+            return upload.path, False
+        handle = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+        with handle:
+            handle.write(upload.data)
+        return handle.name, True
+
+    @staticmethod
+    def chunk_pages(page_numbers, workers):
+        """Contiguous page ranges, two per worker so a slow sheet does not stall the rest."""
+        page_numbers = list(page_numbers)
+        if not page_numbers:
+            return []
+        size = max(1, math.ceil(len(page_numbers) / (workers * 2)))
+        return [page_numbers[start:start + size] for start in range(0, len(page_numbers), size)]
+
+    @staticmethod
+    def diff_pages(pdf_file1, pdf_file2, page_numbers, tolerance=5, vocabulary=None, on_page_words=None,
+                   on_pages_done=None):
+        """Diff the given pages in the process pool.
+
+        Returns ``{page_num: None | (missing_table, extra_table)}`` like
+        ``CompareSession.differences``, rebuilt on ``vocabulary``. With
+        ``on_page_words(page_num, table1, table2)`` the workers send the page word
+        tables back too, and they are handed over in page order as chunks arrive
+        instead of being collected (pages that failed are skipped).
+        ``on_pages_done(done, total)`` is called as chunks finish. If a pool worker
+        dies, the pool is replaced and the pages not done yet are diffed in this process.
+        """
+        vocabulary = vocabulary if vocabulary is not None else TextVocabulary()
+        collect_words = on_page_words is not None
+        page_numbers = list(page_numbers)
+        path1, spilled1 = ParallelCompareService.worker_path(pdf_file1)
+        path2, spilled2 = ParallelCompareService.worker_path(pdf_file2)
+
+        try:
+            executor = ParallelCompareService.executor()
+            chunks = ParallelCompareService.chunk_pages(page_numbers, ParallelCompareService.worker_count())
+            futures = []
+            try:
+                for chunk in chunks:
+                    futures.append(executor.submit(diff_page_range, path1, path2, chunk, tolerance, collect_words))
+            except BrokenProcessPool as e:
+                # Broke before this request got to it; iter_chunk_results diffs the chunks left inline
+                failed = Future()
+                failed.set_exception(e)
+                futures.append(failed)
+            results = ParallelCompareService.iter_chunk_results(
+                executor, futures, chunks,
+                lambda pages: diff_page_range(path1, path2, pages, tolerance, collect_words),
+            )
+
+            differences = {}
+            pages_done = 0
+            for chunk, pages in results:
+                MetricsService.merge(chunk["timings"])
+                pages_done += len(pages)
+                if on_pages_done is not None:
+                    on_pages_done(pages_done, len(page_numbers))
+                for page_num, rows in chunk["differences"].items():
+                    if rows is None:
+                        differences[page_num] = None
+                        continue
+                    missing_rows, extra_rows = rows
+                    differences[page_num] = (
+                        ParallelCompareService.from_rows(page_num, missing_rows, vocabulary),
+                        ParallelCompareService.from_rows(page_num, extra_rows, vocabulary),
+                    )
+
+                if collect_words:
+                    # Chunk-local text ids -> ids of the shared vocabulary
+                    remap = vocabulary.intern_many(chunk["texts"])
+                    for page_num in sorted(chunk["words"]):
+                        ids1, bboxes1, ids2, bboxes2 = chunk["words"][page_num]
+                        on_page_words(
+                            page_num,
+                            PageWordTable(page_num, remap[ids1], bboxes1, vocabulary),
+                            PageWordTable(page_num, remap[ids2], bboxes2, vocabulary),
+                        )
+            return dict(sorted(differences.items()))
+        finally:
+            for path, spilled in ((path1, spilled1), (path2, spilled2)):
+                if spilled:
+                    os.unlink(path)
@@ -1,452 +1,529 @@
-from datetime import datetime
+import functools
 import io
-import zipfile
 import json
+import shutil
+import tempfile
+import weakref
 import fitz
-from flask import jsonify, send_file
+from flask import Response, jsonify, send_file, stream_with_context
 from loguru import logger
-from services import FindMissingOrExraValuesService, ExtractTextAndCoordinatesService
-import base64
-import os
+from core.config import Config
+from services import FindMissingOrExraValuesService, ExtractTextAndCoordinatesService, PageFingerprintService, CompareSession
+from services.compareResult_service import ComparisonResult, ComparisonResultCache, comparison_cache
+from services.metrics_service import MetricsService
+from services.upload_service import PDFUpload
 
 class PDFService:
+    # Bump when a change alters comparison output, so cached results are not reused
+    RESULT_VERSION = 3
+
     @staticmethod
-    def compare_pdfs(pdf_file1, pdf_file2):
-        """Compare two PDF files and return the modified file along with summary data in a ZIP."""
+    def page_fingerprints(pdf_file1, pdf_file2, mode="words"):
+        """Return per-page fingerprints of both PDFs without running a comparison."""
+        try:
+            return PageFingerprintService.fingerprint_map(pdf_file1, pdf_file2, mode), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": f"Failed to fingerprint PDF pages: {str(e)}"}), 500
 
+    @staticmethod
+    def cached_comparison(pdf_file1, pdf_file2, tolerance=5):
+        """run_comparison for request handlers: ``(result, 200)``, or a JSON error and 500 on failure."""
         try:
-            content1 = ExtractTextAndCoordinatesService.extract_text_and_coordinates(pdf_file1)
-            content2 = ExtractTextAndCoordinatesService.extract_text_and_coordinates(pdf_file2)
+            return PDFService.run_comparison(pdf_file1, pdf_file2, tolerance=tolerance), 200
         except Exception as e:
-            return jsonify({"error": f"Failed to extract text and coordinates: {str(e)}"}), 500
+            logger.opt(exception=True).error("Comparison failed: {}", e)
+            return jsonify({"error": f"Failed to compare PDF files: {str(e)}"}), 500
+
+    @staticmethod
+    def comparison_id(upload1, upload2, tolerance):
+        return ComparisonResultCache.comparison_key(upload1.sha256, upload2.sha256, {
+            # Jobs read the tolerance back from SQLite as a float; 5 and 5.0 are the same comparison
+            "tolerance": float(tolerance),
+            "highlight_mode": Config.COMPARE_HIGHLIGHT_MODE,
+            "align_pages": Config.COMPARE_ALIGN_PAGES,
+            "version": PDFService.RESULT_VERSION,
+        })
+
+    @staticmethod
+    def run_comparison(pdf_file1, pdf_file2, tolerance=5, progress=None, artifacts=()):
+        """Run the one-pass comparison of a file pair, or reuse it from the result cache; raises on failure.
+
+        ``progress(stage, fraction)`` receives the session's progress reports.
+        ``artifacts`` are rendered before returning (background jobs hand out
+        every artifact); the rest stay lazy.
+        """
+        upload1 = PDFUpload.coerce(pdf_file1)
+        upload2 = PDFUpload.coerce(pdf_file2)
+        comparison_id = PDFService.comparison_id(upload1, upload2, tolerance)
+
+        result = comparison_cache.get(comparison_id)
+        if result is None:
+            with CompareSession(upload1, upload2, tolerance=tolerance, progress=progress) as session:
+                result = PDFService.build_result(session, comparison_id)
+
+        share = CompareSession.DIFF_SHARE
+        for index, artifact in enumerate(artifacts):
+            if progress is not None:
+                progress("rendering", share + (1 - share) * index / len(artifacts))
+            result.artifact(artifact)
+        comparison_cache.put(result)
+        return result
+
+    @staticmethod
+    def build_result(session, comparison_id):
+        """Summary of a diffed session, with artifacts rendered lazily from its inputs.
+
+        The result keeps the inputs and the per-page differences rather than the
+        open documents: each artifact is rendered on fresh copies of the documents,
+        so artifacts never see each other's annotations. Uploads spooled to disk
+        stay there, linked into a directory of the result's own that is removed
+        once the result is no longer referenced.
+        """
+        differences = session.differences()
+        alignment = session.alignment()
+        inputs = (session.upload1, session.upload2)
+        directory = None
+        if any(upload.data is None for upload in inputs):
+            directory = tempfile.mkdtemp(prefix="cadstera-result-")
+            inputs = tuple(upload.detached(directory, f"input{index}.pdf") for index, upload in enumerate(inputs, 1))
+        tolerance = session.tolerance
+
+        def renderer(artifact):
+            return PDFService.render_artifact(inputs, differences, alignment, tolerance, artifact)
+
+        retained_bytes = sum(upload.size for upload in inputs if upload.data is not None) + sum(
+            table.nbytes() for page_difference in differences.values() if page_difference for table in page_difference
+        )
+        result = ComparisonResult(
+            comparison_id, PDFService.summarize(session), renderer, retained_bytes=retained_bytes,
+            pages=alignment.to_json(),
+        )
+        if directory is not None:
+            weakref.finalize(result, shutil.rmtree, directory, True)
+        return result
+
+    @staticmethod
+    def render_artifact(inputs, differences, alignment, tolerance, artifact):
+        renderers = {
+            "missing": PDFService.render_missing,
+            "extra": PDFService.render_extra,
+            "combined": PDFService.render_combined,
+            "report": PDFService.render_report,
+            "layers": PDFService.render_layers,
+        }
+        with CompareSession(*inputs, tolerance=tolerance, differences=differences, alignment=alignment) as session:
+            return renderers[artifact](session)
+
+    @staticmethod
+    def artifact_response(result, artifact):
+        data = result.artifact(artifact)
+        comparison_cache.put(result)  # account for the newly rendered bytes
+        response = send_file(
+            io.BytesIO(data),
+            as_attachment=True,
+            download_name=ComparisonResult.ARTIFACTS[artifact],
+            mimetype="application/pdf"
+        )
+        response.headers["X-Comparison-Id"] = result.comparison_id
+        return response
+
+    # ?stream= value -> response mimetype of the streaming report
+    STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
 
+    @staticmethod
+    def report_stream(pdf_file1, pdf_file2, stream_format="ndjson", tolerance=5):
+        """Stream the report as one record per page as soon as it is diffed, then a summary record.
+
+        The documents are opened before the response starts so unreadable files
+        still get a normal error response.
+        """
         try:
-            doc1 = fitz.open("pdf", pdf_file1)  # PDF1 will be modified
-            doc2 = fitz.open("pdf", pdf_file2)  # PDF2 remains unchanged
+            session = CompareSession(pdf_file1, pdf_file2, tolerance=tolerance)
         except Exception as e:
             return jsonify({"error": f"Failed to open PDF files: {str(e)}"}), 500
 
-        IGNORED_SYMBOLS = {"⏤", "◯", "⌭", "⌖", "∅", "⊥", "∠", "⌰", "⌙", "⌑", "|", "↕", "∓", "〈", "〉", "▽", "⊓", "⌴", "⌵", "⌃", "⌄", "M", "UN", "⌀"}
+        comparison_id = PDFService.comparison_id(session.upload1, session.upload2, tolerance)
+        response = Response(
+            stream_with_context(PDFService.report_records(session, comparison_id, stream_format)),
+            mimetype=PDFService.STREAM_FORMATS[stream_format],
+        )
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"  # let nginx pass records through unbuffered
+        return response, 200
 
-        summary_data = {}
+    @staticmethod
+    def report_records(session, comparison_id, stream_format):
+        """Encoded page records followed by a summary record; closes the session when done.
 
+        The finished comparison goes into the result cache, so the artifacts can be
+        downloaded by the ``comparison_id`` of the summary record.
+        """
         try:
-            num_pages = min(len(doc1), len(doc2))
+            for page1, page2, page_difference in session.iter_aligned_differences():
+                yield PDFService.encode_record(PDFService.page_record(page1, page_difference, page2), stream_format)
+
+            result = PDFService.build_result(session, comparison_id)
+            comparison_cache.put(result)
+            yield PDFService.encode_record({
+                "type": "summary",
+                "page_count": session.num_pages,
+                "comparison_id": comparison_id,
+                "summary_data": result.summary_data,
+                "pages": result.pages,
+            }, stream_format)
         except Exception as e:
-            return jsonify({"error": f"Failed to calculate number of pages: {str(e)}"}), 500
-
-        for page_num in range(num_pages):
-            try:
-                page1 = doc1.load_page(page_num)  # Load a page from doc1 (modifiable)
-                page2 = doc2[page_num]             # Load a page from doc2 (read-only)
-                print(f"Processing Page {page_num + 1}")
-            except Exception as e:
-                print(f"Error loading pages: {str(e)}")
-                continue  # Skip this page if there's an error
+            logger.opt(exception=True).error("Streaming comparison failed: {}", e)
+            yield PDFService.encode_record({"type": "error", "error": f"Failed to compare PDF files: {str(e)}"}, stream_format)
+        finally:
+            session.close()
 
-            try:
-                missing_values, extra_values = FindMissingOrExraValuesService.find_missing_or_extra_values(
-                    content1[page_num]['text_and_coordinates'],
-                    content2[page_num]['text_and_coordinates'],
-                    tolerance=5
-                )
-            except Exception as e:
-                print(f"Error finding missing or extra values on page {page_num + 1}: {str(e)}")
-                continue
+    @staticmethod
+    def page_record(page_num, page_difference, pdf2_page=None):
+        if page_difference is None:
+            missing_values, extra_values = [], []
+        else:
+            missing_values, extra_values = page_difference
+        return {
+            "type": "page",
+            "page": page_num,
+            "pdf2_page": page_num if pdf2_page is None else pdf2_page,
+            "missing": len(missing_values),
+            "extra": len(extra_values),
+            "unchanged": page_difference is None,
+            "missing_items": PDFService.word_items(missing_values),
+            "extra_items": PDFService.word_items(extra_values),
+        }
 
-            try:
-                missing_values_filtered, extra_values_filtered = FindMissingOrExraValuesService.compare_and_ignore_matching_text(
-                    missing_values,
-                    extra_values
-                )
-            except Exception as e:
-                print(f"Error comparing and ignoring matching text on page {page_num + 1}: {str(e)}")
-                continue
+    @staticmethod
+    def word_items(values):
+        return [{"text": item["text"], "bbox": [round(value, 2) for value in item["bbox"]]} for item in values]
 
-            try:
-                if missing_values_filtered:
-                    FindMissingOrExraValuesService.highlight_missing_values(
-                        page1,
-                        missing_values_filtered,
-                        color=(1, 1, 1)
-                    )
-                if extra_values_filtered:
-                    FindMissingOrExraValuesService.highlight_extra_values(
-                        page1,
-                        extra_values_filtered,
-                        color=(1, 1, 0)
-                    )
-            except Exception as e:
-                print(f"Error highlighting differences on page {page_num + 1}: {str(e)}")
-                continue
+    @staticmethod
+    def encode_record(record, stream_format):
+        data = json.dumps(record, separators=(",", ":"))
+        if stream_format == "sse":
+            return f"event: {record['type']}\ndata: {data}\n\n"
+        return data + "\n"
 
-            try:
-                summary_data[page_num] = {
-                    'missing': len(missing_values_filtered),
-                    'extra': len(extra_values_filtered)
-                }
-            except Exception as e:
-                print(f"Error updating summary data for page {page_num + 1}: {str(e)}")
+    @staticmethod
+    def summarize(session):
+        summary_data = {}
+        for page_num, page_difference in session.differences().items():
+            if page_difference is None:
+                summary_data[page_num] = {'missing': 0, 'extra': 0, 'unchanged': True}
                 continue
+            missing_values, extra_values = page_difference
+            summary_data[page_num] = {'missing': len(missing_values), 'extra': len(extra_values), 'unchanged': False}
+        return summary_data
 
-        try:
-            updated_doc = FindMissingOrExraValuesService.append_summary_table(doc1, summary_data)
-        except Exception as e:
-            return jsonify({"error": f"Failed to append summary table: {str(e)}"}), 500
-
-        pdf_output_stream = io.BytesIO()
+    @staticmethod
+    def changed_pages(session):
+        for page_num, page_difference in session.differences().items():
+            if page_difference is not None:
+                yield page_num, page_difference
 
-        try:
-            watermark_text = "CADSTER"
-            for page in updated_doc:
-                page_rect = page.rect
-                page.draw_rect(page_rect, color=(0.85, 0.85, 0.85), fill=(0.85, 0.85, 0.85), width=0, overlay=False)
-
-                max_font_size = page_rect.width * 0.1
-                watermark_width = max_font_size * len(watermark_text) * 0.4
-                watermark_height = max_font_size
-
-                center_x = page_rect.x0 + (page_rect.width - watermark_width) / 2
-                center_y = page_rect.y0 + (page_rect.height - watermark_height) / 2
-
-                page.insert_text(
-                    (center_x, center_y),
-                    watermark_text,
-                    fontsize=max_font_size,
-                    color=(0.7, 0.7, 0.7),
-                    rotate=0,
-                    overlay=True
+    @staticmethod
+    def highlight_missing(session):
+        """Red highlights of the missing words on PDF1 (applied once per session)."""
+        if "missing" in session.applied:
+            return
+        for page_num, (missing_values, _) in PDFService.changed_pages(session):
+            if missing_values:
+                FindMissingOrExraValuesService.highlight_missing_values(
+                    session.doc1.load_page(page_num), missing_values, color=(1, 0, 0), mode=Config.COMPARE_HIGHLIGHT_MODE
                 )
-        except Exception as e:
-            return jsonify({"error": f"Failed to add watermark: {str(e)}"}), 500
+        session.applied.add("missing")
 
-        try:
-            #updated_doc.save(pdf_output_stream)
-            # Optional: also save to file on disk
-           # pdf_output_stream.seek(0)  # rewind buffer
-           
-           
-            #downloadfile_path = os.path.join("./", "compared_output.pdf")
-           # with open(downloadfile_path, "wb") as f:
-             #   f.write(pdf_output_stream.read())
-            #pdf_output_stream.seek(0)
-        #except Exception as e:
-        #    return jsonify({"error": f"Failed to save updated PDF: {str(e)}"}), 500
-
-       # try:
-           return {
-            "summary_data": summary_data
-            }, 200
-        except Exception as e:
-            return jsonify({"error": f"Failed to prepare response: {str(e)}"}), 500
-        
     @staticmethod
-    def compare_pdfs_missing_download(pdf_file1, pdf_file2, use_timestamp=True):
-        """Compare two PDF files and return the modified file along with summary data in a ZIP."""
+    def highlight_extra(session):
+        """Blue highlights of the extra words on the PDF2 sheet each PDF1 page was compared with (applied once per session)."""
+        if "extra" in session.applied:
+            return
+        pairs = session.alignment().pairs
+        for page_num, (_, extra_values) in PDFService.changed_pages(session):
+            if extra_values:
+                FindMissingOrExraValuesService.highlight_extra_values(
+                    session.doc2.load_page(pairs[page_num]), extra_values, color=(0, 0, 1), mode=Config.COMPARE_HIGHLIGHT_MODE
+                )
+        session.applied.add("extra")
 
-        try:
-            content1 = ExtractTextAndCoordinatesService.extract_text_and_coordinates(pdf_file1)
-            content2 = ExtractTextAndCoordinatesService.extract_text_and_coordinates(pdf_file2)
-        except Exception as e:
-            return jsonify({"error": f"Failed to extract text and coordinates: {str(e)}"}), 500
+    @staticmethod
+    def insert_extra(session):
+        """Blue copies of the extra words written onto PDF1 (applied once per session)."""
+        if "extra_text" in session.applied:
+            return
+        for page_num, (_, extra_values) in PDFService.changed_pages(session):
+            if extra_values:
+                FindMissingOrExraValuesService.insert_extra(
+                    session.doc1.load_page(page_num), extra_values, color=(0, 0, 1)
+                )
+        session.applied.add("extra_text")
+
+    # name -> Document.save options
+    # fast: no garbage collection or recompression, the quickest full rewrite
+    # compact: drop unused and duplicate objects, compress streams and pack objects into object streams
+    # web-linearized: compact enough for the web, ordered so viewers can show page 1 before the download ends
+    SAVE_PROFILES = {
+        "fast": {},
+        "compact": {"garbage": 3, "deflate": True, "deflate_images": True, "deflate_fonts": True, "use_objstms": 1},
+        "web-linearized": {"garbage": 3, "deflate": True, "linear": True},
+    }
 
+    @staticmethod
+    @MetricsService.stage("save")
+    def save_to_bytes(doc, profile=None, incremental=False):
+        """Serialize ``doc`` with a save profile (default Config.COMPARE_SAVE_PROFILE).
+
+        With ``incremental`` and the fast profile, a document opened from a
+        file or bytes is written as its original bytes plus an appended update
+        section, which for a few annotations on a large drawing is much
+        cheaper than rewriting every object.
+        """
+        profile = profile or Config.COMPARE_SAVE_PROFILE
+        if profile not in PDFService.SAVE_PROFILES:
+            raise ValueError(f"Unknown save profile '{profile}', expected one of {tuple(PDFService.SAVE_PROFILES)}")
+
+        if incremental and profile == "fast" and doc.can_save_incrementally():
+            return PDFService.save_incremental(doc)
+
+        options = PDFService.SAVE_PROFILES[profile]
+        output = io.BytesIO()
         try:
-         doc1 = fitz.open("pdf", pdf_file1)  # PDF1 will be modified
-         doc2 = fitz.open("pdf", pdf_file2)  # PDF2 remains unchanged
-        except Exception as e:
-            return jsonify({"error": f"Failed to open PDF files: {str(e)}"}), 500
-        
-        try:
-        
-            for page_num in range(min(len(doc1), len(doc2))):
-                page1 = doc1.load_page(page_num)
-                page2 = doc2.load_page(page_num)
-
-                page1_data = content1[page_num]['text_and_coordinates']
-                page2_data = content2[page_num]['text_and_coordinates']
-
-                missing_in_pdf1, extra_in_pdf2 = FindMissingOrExraValuesService.find_missing_or_extra_values(page1_data, page2_data, tolerance=5)
-                missing_filtered_pdf1, extra_filtered_pdf2 = FindMissingOrExraValuesService.compare_and_ignore_matching_text(missing_in_pdf1, extra_in_pdf2)
-               
-                if missing_filtered_pdf1:
-                    FindMissingOrExraValuesService.highlight_missing_values(page1, missing_filtered_pdf1, color=(1, 0, 0))
-
-                if extra_filtered_pdf2:
-                    FindMissingOrExraValuesService.highlight_extra_values(page2, extra_filtered_pdf2, color=(0, 0, 1))
- 
-
-            #  timestamp = datetime.now().strftime("%Y%m%d_%H%M%S") if use_timestamp else ""
-            filename1 = f"missing_highlighted_in_pdf1.pdf"
-            filename2 = f"extra_highlighted_in_pdf2.pdf"
-            zip_filename = f"comparison_result.zip"
-
-            # Save PDFs to memory
-            pdf1_bytes = io.BytesIO()
-            doc1.save(pdf1_bytes)
-            pdf1_bytes.seek(0)
-
-            doc1.close()
-            doc2.close()
-
-            # pdf2_bytes = io.BytesIO()
-            # doc2.save(pdf2_bytes)
-            # pdf2_bytes.seek(0)
-
-            # # Create ZIP
-            # zip_bytes = io.BytesIO()
-            # with zipfile.ZipFile(zip_bytes, 'w') as zipf:
-            #     zipf.writestr(filename1, pdf1_bytes.getvalue())
-            #     zipf.writestr(filename2, pdf2_bytes.getvalue())
-            # zip_bytes.seek(0)
-
-            # Base64 for frontend preview
-            return send_file(
-                    pdf1_bytes,
-                    as_attachment=True,
-                    download_name="missing-pdf.pdf",
-                    mimetype="application/pdf"
-            )
+            doc.save(output, **options)
         except Exception as e:
-            logger.error(f"Opening PDF files failed: {e}", exc_info=True)
-            return jsonify({"error": f"Failed to open PDF files: {str(e)}"}), 500
+            if not options.get("linear"):
+                raise
+            # MuPDF 1.26 dropped linearization; keep the rest of the profile
+            logger.bind(event="save_fallback", profile=profile).warning("Saving without linearization: {}", e)
+            output = io.BytesIO()
+            doc.save(output, **{key: value for key, value in options.items() if key != "linear"})
+        return output.getvalue()
 
-        # IGNORED_SYMBOLS = {"⏤", "◯", "⌭", "⌖", "∅", "⊥", "∠", "⌰", "⌙", "⌑", "|", "↕", "∓", "〈", "〉", "▽", "⊓", "⌴", "⌵", "⌃", "⌄", "M", "UN", "⌀"}
-
-        # summary_data = {}
-
-        # try:
-        #     num_pages = min(len(doc1), len(doc2))
-        # except Exception as e:
-        #     return jsonify({"error": f"Failed to calculate number of pages: {str(e)}"}), 500
-
-        # for page_num in range(num_pages):
-        #     try:
-        #         page1 = doc1.load_page(page_num)  # Load a page from doc1 (modifiable)
-        #         page2 = doc2[page_num]             # Load a page from doc2 (read-only)
-        #         print(f"Processing Page {page_num + 1}")
-        #     except Exception as e:
-        #         print(f"Error loading pages: {str(e)}")
-        #         continue  # Skip this page if there's an error
-
-        #     try:
-        #         missing_values, extra_values = FindMissingOrExraValuesService.find_missing_or_extra_values(
-        #             content1[page_num]['text_and_coordinates'],
-        #             content2[page_num]['text_and_coordinates'],
-        #             tolerance=5
-        #         )
-        #     except Exception as e:
-        #         print(f"Error finding missing or extra values on page {page_num + 1}: {str(e)}")
-        #         continue
-
-        #     try:
-        #         missing_values_filtered, extra_values_filtered = FindMissingOrExraValuesService.compare_and_ignore_matching_text(
-        #             missing_values,
-        #             extra_values
-        #         )
-        #     except Exception as e:
-        #         print(f"Error comparing and ignoring matching text on page {page_num + 1}: {str(e)}")
-        #         continue
-
-        #     try:
-        #         if missing_values_filtered:
-        #             FindMissingOrExraValuesService.highlight_missing_values(
-        #                 page1,
-        #                 missing_values_filtered,
-        #                 color=(1, 1, 1)
-        #             )
-        #         if extra_values_filtered:
-        #             FindMissingOrExraValuesService.highlight_extra_values(
-        #                 page1,
-        #                 extra_values_filtered,
-        #                 color=(1, 1, 0)
-        #             )
-        #     except Exception as e:
-        #         print(f"Error highlighting differences on page {page_num + 1}: {str(e)}")
-        #         continue
-
-        #     try:
-        #         summary_data[page_num] = {
-        #             'missing': len(missing_values_filtered),
-        #             'extra': len(extra_values_filtered)
-        #         }
-        #     except Exception as e:
-        #         print(f"Error updating summary data for page {page_num + 1}: {str(e)}")
-        #         continue
-
-        # try:
-        #     updated_doc = FindMissingOrExraValuesService.append_summary_table(doc1, summary_data)
-        # except Exception as e:
-        #     return jsonify({"error": f"Failed to append summary table: {str(e)}"}), 500
-
-        # pdf_output_stream = io.BytesIO()
-
-        # try:
-        #     watermark_text = "CADSTER"
-        #     for page in updated_doc:
-        #         page_rect = page.rect
-        #         page.draw_rect(page_rect, color=(0.85, 0.85, 0.85), fill=(0.85, 0.85, 0.85), width=0, overlay=False)
-
-        #         max_font_size = page_rect.width * 0.1
-        #         watermark_width = max_font_size * len(watermark_text) * 0.4
-        #         watermark_height = max_font_size
-
-        #         center_x = page_rect.x0 + (page_rect.width - watermark_width) / 2
-        #         center_y = page_rect.y0 + (page_rect.height - watermark_height) / 2
-
-        #         page.insert_text(
-        #             (center_x, center_y),
-        #             watermark_text,
-        #             fontsize=max_font_size,
-        #             color=(0.7, 0.7, 0.7),
-        #             rotate=0,
-        #             overlay=True
-        #         )
-        # except Exception as e:
-        #     return jsonify({"error": f"Failed to add watermark: {str(e)}"}), 500
-
-        # try:
-        #     pdf_output_stream = io.BytesIO()
-        #     updated_doc.save(pdf_output_stream)
-        #     pdf_output_stream.seek(0)  # Rewind stream before sending
-
-        #     return send_file(
-        #         pdf_output_stream,
-        #         as_attachment=True,
-        #         download_name="compared_output.pdf",
-        #         mimetype="application/pdf"
-        #     )
-        # except Exception as e:
-        #     return jsonify({"error": f"Failed to prepare response: {str(e)}"}), 500
+    @staticmethod
+    def save_incremental(doc):
+        # Document.save only appends to the file the document was opened from; the
+        # low-level writer also takes an in-memory output and copies the original first
+        options = fitz.mupdf.PdfWriteOptions()
+        options.do_incremental = 1
+        buffer = fitz.mupdf.FzBuffer(0)
+        output = fitz.mupdf.FzOutput(buffer)
+        fitz.mupdf.pdf_write_document(fitz.mupdf.pdf_document_from_fz_document(doc.this), output, options)
+        output.fz_close_output()
+        return buffer.fz_buffer_extract()
 
+    @staticmethod
+    def render_missing(session):
+        PDFService.highlight_missing(session)
+        return PDFService.save_to_bytes(session.doc1, incremental=Config.COMPARE_SAVE_INCREMENTAL)
 
     @staticmethod
-    def compare_pdfs_extra_downlaod(pdf_file1, pdf_file2, use_timestamp=True):
-        """Compare two PDF files and return the modified file along with summary data in a ZIP."""
+    def render_extra(session):
+        PDFService.highlight_extra(session)
+        return PDFService.save_to_bytes(session.doc2, incremental=Config.COMPARE_SAVE_INCREMENTAL)
 
+    @staticmethod
+    def render_combined(session):
+        """Summary page followed by PDF1 with missing highlights and the extra text."""
+        PDFService.highlight_missing(session)
+        PDFService.insert_extra(session)
+
+        missing_by_page = {}
+        extra_by_page = {}
+        for page_num, (missing_values, extra_values) in PDFService.changed_pages(session):
+            if missing_values:
+                missing_by_page[page_num] = missing_values
+            if extra_values:
+                extra_by_page[page_num] = extra_values
+
+        summary_doc = ExtractTextAndCoordinatesService.generate_summary_page(
+            missing_by_page, extra_by_page, page_size=session.page_size
+        )
+        final_doc = fitz.open()
+        final_doc.insert_pdf(summary_doc)
+        final_doc.insert_pdf(session.doc1)
         try:
-            content1 = ExtractTextAndCoordinatesService.extract_text_and_coordinates(pdf_file1)
-            content2 = ExtractTextAndCoordinatesService.extract_text_and_coordinates(pdf_file2)
-        except Exception as e:
-            return jsonify({"error": f"Failed to extract text and coordinates: {str(e)}"}), 500
+            return PDFService.save_to_bytes(final_doc)
+        finally:
+            final_doc.close()
+            summary_doc.close()
+
+    # layer name -> shown when the file is opened
+    LAYERS = {"Missing values": True, "Extra values": True, "Extra text": False}
 
-        try:
-            doc1 = fitz.open("pdf", pdf_file1)  # PDF1 will be modified
-            doc2 = fitz.open("pdf", pdf_file2)  # PDF2 remains unchanged
-        except Exception as e:
-            return jsonify({"error": f"Failed to open PDF files: {str(e)}"}), 500
-        
-        try:
-        
-            for page_num in range(min(len(doc1), len(doc2))):
-                page1 = doc1.load_page(page_num)
-                page2 = doc2.load_page(page_num)
-
-                page1_data = content1[page_num]['text_and_coordinates']
-                page2_data = content2[page_num]['text_and_coordinates']
-
-                missing_in_pdf1, extra_in_pdf2 = FindMissingOrExraValuesService.find_missing_or_extra_values(page1_data, page2_data, tolerance=5)
-                missing_filtered_pdf1, extra_filtered_pdf2 = FindMissingOrExraValuesService.compare_and_ignore_matching_text(missing_in_pdf1, extra_in_pdf2)
-
-                if missing_filtered_pdf1:
-                    FindMissingOrExraValuesService.highlight_missing_values(page1, missing_filtered_pdf1, color=(1, 0, 0))
-                   
-                if extra_filtered_pdf2:
-                    FindMissingOrExraValuesService.highlight_extra_values(page2, extra_filtered_pdf2, color=(0, 0, 1))
-
-
-            #  timestamp = datetime.now().strftime("%Y%m%d_%H%M%S") if use_timestamp else ""
-            filename1 = f"missing_highlighted_in_pdf1.pdf"
-            filename2 = f"extra_highlighted_in_pdf2.pdf"
-            zip_filename = f"comparison_result.zip"
-
-            # Save PDFs to memory
-            # pdf1_bytes = io.BytesIO()
-            # doc1.save(pdf1_bytes)
-            # pdf1_bytes.seek(0)
-
-            pdf2_bytes = io.BytesIO()
-            doc2.save(pdf2_bytes)
-            doc2.close()
-            pdf2_bytes.seek(0)
-            doc1.close() 
-
-            #Base64 for frontend preview
-            return send_file(
-                pdf2_bytes,
-                as_attachment=True,
-                download_name="extra-pdf.pdf",
-                mimetype="application/pdf"
-            )
-        except Exception as e:
-            logger.error(f"Opening PDF files failed: {e}", exc_info=True)
-            return jsonify({"error": f"Failed to open PDF files: {str(e)}"}), 500
-        
     @staticmethod
-    def compare_zip_download(pdf_file1, pdf_file2, use_timestamp=True):
-        """Compare two PDF files and return the modified file along with summary data in a ZIP."""
+    def render_layers(session):
+        """PDF1 with the missing highlights, extra highlights and extra text on three layers.
+
+        Each group is its own optional content group, so one render and one save
+        serve the missing, extra and combined views; the viewer's layer panel
+        switches between them.
+        """
+        doc = session.doc1
+        missing_layer, extra_layer, extra_text_layer = (
+            doc.add_ocg(name, on=on) for name, on in PDFService.LAYERS.items()
+        )
+        for page_num, (missing_values, extra_values) in PDFService.changed_pages(session):
+            page1 = doc.load_page(page_num)
+            try:
+                if missing_values:
+                    FindMissingOrExraValuesService.highlight_missing_values(
+                        page1, missing_values, color=(1, 0, 0), mode=Config.COMPARE_HIGHLIGHT_MODE, oc=missing_layer
+                    )
+                if extra_values:
+                    FindMissingOrExraValuesService.highlight_extra_values(
+                        page1, extra_values, color=(0, 0, 1), mode=Config.COMPARE_HIGHLIGHT_MODE, oc=extra_layer
+                    )
+                    FindMissingOrExraValuesService.insert_extra(page1, extra_values, color=(0, 0, 1), oc=extra_text_layer)
+            except Exception as e:
+                logger.bind(event="page_error", stage="annotate", page=page_num + 1).warning(
+                    "Error adding comparison layers on page {}: {}", page_num + 1, e
+                )
+        return PDFService.save_to_bytes(doc)
 
-        try:
-            content1 = ExtractTextAndCoordinatesService.extract_text_and_coordinates(pdf_file1)
-            content2 = ExtractTextAndCoordinatesService.extract_text_and_coordinates(pdf_file2)
-            missing_by_page = {}
-            extra_by_page = {}
-        except Exception as e:
-            return jsonify({"error": f"Failed to extract text and coordinates: {str(e)}"}), 500
+    @staticmethod
+    def render_report(session):
+        """PDF1 with white/yellow highlights, the summary table appended and the CADSTER watermark."""
+        for page_num, (missing_values, extra_values) in PDFService.changed_pages(session):
+            page1 = session.doc1.load_page(page_num)
+            try:
+                if missing_values:
+                    FindMissingOrExraValuesService.highlight_missing_values(
+                        page1, missing_values, color=(1, 1, 1), mode=Config.COMPARE_HIGHLIGHT_MODE
+                    )
+                if extra_values:
+                    FindMissingOrExraValuesService.highlight_extra_values(
+                        page1, extra_values, color=(1, 1, 0), mode=Config.COMPARE_HIGHLIGHT_MODE
+                    )
+            except Exception as e:
+                logger.bind(event="page_error", stage="annotate", page=page_num + 1).warning(
+                    "Error highlighting differences on page {}: {}", page_num + 1, e
+                )
 
+        updated_doc = FindMissingOrExraValuesService.append_summary_table(session.doc1, PDFService.summarize(session))
         try:
-            doc1 = fitz.open("pdf", pdf_file1)  # PDF1 will be modified
-            doc2 = fitz.open("pdf", pdf_file2)  # PDF2 remains unchanged
-        except Exception as e:
-            return jsonify({"error": f"Failed to open PDF files: {str(e)}"}), 500
-        
-        try:
-        
-            for page_num in range(min(len(doc1), len(doc2))):
-                page1 = doc1.load_page(page_num)
-                page2 = doc2.load_page(page_num)
-
-                page1_data = content1[page_num]['text_and_coordinates']
-                page2_data = content2[page_num]['text_and_coordinates']
+            PDFService.stamp_watermark(updated_doc)
+            return PDFService.save_to_bytes(updated_doc)
+        finally:
+            if updated_doc is not session.doc1:
+                updated_doc.close()
 
-                missing_in_pdf1, extra_in_pdf2 = FindMissingOrExraValuesService.find_missing_or_extra_values(page1_data, page2_data, tolerance=5)
-                missing_filtered_pdf1, extra_filtered_pdf2 = FindMissingOrExraValuesService.compare_and_ignore_matching_text(missing_in_pdf1, extra_in_pdf2)
-
-                if missing_filtered_pdf1:
-                    FindMissingOrExraValuesService.highlight_missing_values(page1, missing_filtered_pdf1, color=(1, 0, 0))
-                    missing_by_page[page_num] = missing_filtered_pdf1
+    WATERMARK_FONT = "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
 
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def watermark_streams(width, height, watermark_text="CADSTER"):
+        """Content of the tint and the text Form XObject for one page size, cached across requests.
+
+        Same drawing as stamp_watermark_page, in the XObject's own PDF
+        coordinates (origin bottom left, ``width`` x ``height``).
+        """
+        max_font_size = width * 0.1
+        watermark_width = max_font_size * len(watermark_text) * 0.4
+        watermark_height = max_font_size
+        x = (width - watermark_width) / 2
+        y = height - (height - watermark_height) / 2
+
+        tint = f".85 .85 .85 rg 0 0 {width:.3f} {height:.3f} re f"
+        text = (
+            f"BT /Helv {max_font_size:.3f} Tf .7 .7 .7 rg 1 0 0 1 {x:.3f} {y:.3f} Tm"
+            f" <{watermark_text.encode('cp1252', 'replace').hex()}> Tj ET"
+        )
+        return tint.encode("ascii"), text.encode("ascii")
 
-                if extra_filtered_pdf2:
-                    FindMissingOrExraValuesService.insert_extra(page1, extra_filtered_pdf2, color=(0, 0, 1))
-                    extra_by_page[page_num] = extra_filtered_pdf2
-            
-            summary_doc = ExtractTextAndCoordinatesService.generate_summary_page(missing_by_page, extra_by_page, pdf_file1)   
-            
-            final_doc = fitz.open()
-            final_doc.insert_pdf(summary_doc)
-            final_doc.insert_pdf(doc1)    
+    @staticmethod
+    def new_stream_object(doc, obj, data):
+        xref = doc.get_new_xref()
+        doc.update_object(xref, obj)
+        doc.update_stream(xref, data)
+        return xref
 
+    @staticmethod
+    @MetricsService.stage("watermark")
+    def stamp_watermark(doc, watermark_text="CADSTER"):
+        """Tint every page and put the watermark text on top, sharing the drawing between pages.
+
+        Each page size gets one tint and one text Form XObject, and each page
+        layout one pair of content streams that paint them around the existing
+        content; a page only gains two entries in its /Contents array and two
+        XObject resources. Pages that inherit their resources are drawn
+        directly, as MuPDF would have to copy the inherited dictionary anyway.
+        """
+        font_xref = None
+        forms = {}     # page size -> (index, tint xref, text xref)
+        wrappers = {}  # (index, matrix) -> (before xref, after xref)
+        for page in doc:
+            if doc.xref_get_key(page.xref, "Resources")[0] == "null":
+                PDFService.stamp_watermark_page(page, watermark_text)
+                continue
 
-           
+            page_rect = page.rect
+            size = (round(page_rect.width, 3), round(page_rect.height, 3))
+            if size not in forms:
+                if font_xref is None:
+                    font_xref = doc.get_new_xref()
+                    doc.update_object(font_xref, PDFService.WATERMARK_FONT)
+                tint, text = PDFService.watermark_streams(*size, watermark_text)
+                bbox = f"/Type /XObject /Subtype /Form /BBox [0 0 {size[0]:.3f} {size[1]:.3f}]"
+                forms[size] = (
+                    len(forms),
+                    PDFService.new_stream_object(doc, f"<< {bbox} >>", tint),
+                    PDFService.new_stream_object(doc, f"<< {bbox} /Resources << /Font << /Helv {font_xref} 0 R >> >> >>", text),
+                )
+            index, tint_xref, text_xref = forms[size]
+
+            # XObject space -> this page's PDF space (accounts for rotation and the media box origin)
+            matrix = fitz.Matrix(1, 0, 0, -1, 0, page_rect.height) * ~page.transformation_matrix
+            key = (index, tuple(round(value, 3) for value in matrix))
+            if key not in wrappers:
+                cm = " ".join(f"{value:g}" for value in key[1])
+                wrappers[key] = (
+                    PDFService.new_stream_object(doc, "<< >>", f"q {cm} cm /CadsterWm{index} Do Q q\n".encode("ascii")),
+                    PDFService.new_stream_object(doc, "<< >>", f"\nQ q {cm} cm /CadsterWmText{index} Do Q".encode("ascii")),
+                )
+            before, after = wrappers[key]
 
-            pdf2_bytes = io.BytesIO()
-            final_doc.save(pdf2_bytes)
-            pdf2_bytes.seek(0)
+            xref, path = PDFService.xobject_resources(doc, page)
+            doc.xref_set_key(xref, f"{path}CadsterWm{index}", f"{tint_xref} 0 R")
+            doc.xref_set_key(xref, f"{path}CadsterWmText{index}", f"{text_xref} 0 R")
+            kind, contents = doc.xref_get_key(page.xref, "Contents")
+            existing = contents.strip("[]") if kind in ("array", "xref") else ""
+            doc.xref_set_key(page.xref, "Contents", f"[{before} 0 R {existing} {after} 0 R]")
 
-           
-            doc2.close()
-            doc1.close()
-            final_doc.close()
+    @staticmethod
+    def xobject_resources(doc, page):
+        """(xref, key prefix) under which to set keys of the page's /XObject resources.
+
+        xref_set_key cannot follow indirect objects inside a key path, so each
+        indirect dictionary on the way is addressed by its own xref.
+        """
+        xref, path = page.xref, "Resources/"
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind == "xref":
+            xref, path = int(value.split()[0]), ""
+        kind, value = doc.xref_get_key(xref, f"{path}XObject")
+        if kind == "xref":
+            return int(value.split()[0]), ""
+        return xref, f"{path}XObject/"
 
-            # Create ZIP
-           
-            #Base64 for frontend preview
-            return send_file(
-                pdf2_bytes,
-                as_attachment=True,
-                download_name="compain-missing-extra.pdf",
-                mimetype="application/pdf"
-            )
-        except Exception as e:
-            logger.error(f"Opening PDF files failed: {e}", exc_info=True)
-            return jsonify({"error": f"Failed to open PDF files: {str(e)}"}), 500    
\ No newline at end of file
+    @staticmethod
+    def stamp_watermark_page(page, watermark_text="CADSTER"):
+        page_rect = page.rect
+        page.draw_rect(page_rect, color=(0.85, 0.85, 0.85), fill=(0.85, 0.85, 0.85), width=0, overlay=False)
+
+        max_font_size = page_rect.width * 0.1
+        watermark_width = max_font_size * len(watermark_text) * 0.4
+        watermark_height = max_font_size
+
+        center_x = page_rect.x0 + (page_rect.width - watermark_width) / 2
+        center_y = page_rect.y0 + (page_rect.height - watermark_height) / 2
+
+        page.insert_text(
+            (center_x, center_y),
+            watermark_text,
+            fontsize=max_font_size,
+            color=(0.7, 0.7, 0.7),
+            rotate=0,
+            overlay=True
+        )
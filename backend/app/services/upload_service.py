@@ -0,0 +1,183 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import fitz
+from flask import Request
+from core.config import Config
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload passed the size limit while it was streamed."""
+
+    def __init__(self, filename, max_size):
+        super().__init__(f"{filename} exceeds the {max_size // (1024 * 1024)}MB limit")
+        self.filename = filename
+        self.max_size = max_size
+
+
+class UploadSpool:
+    """Write target for one multipart file part: counts, hashes and stores it in one pass.
+
+    Small parts stay in memory, larger ones go to a named temp file that MuPDF can
+    open by path, so the drawing is never copied into a Python bytes object. Once
+    the part passes ``max_size`` the stored data is dropped and the rest of the
+    part is discarded; ``too_large`` tells the reader to reject it.
+    """
+
+    MEMORY_LIMIT = 500 * 1024  # same threshold werkzeug uses for its own spooling
+
+    def __init__(self, max_size, in_memory):
+        self.max_size = max_size
+        self.size = 0
+        self.too_large = False
+        self.sha256 = hashlib.sha256()
+        if in_memory:
+            self.file = io.BytesIO()
+        else:
+            self.file = tempfile.NamedTemporaryFile(prefix="cadstera-upload-", suffix=".pdf")
+
+    @property
+    def path(self):
+        return getattr(self.file, "name", None)
+
+    def write(self, data):
+        self.size += len(data)
+        if self.too_large:
+            return len(data)
+        if self.size > self.max_size:
+            self.too_large = True
+            self.file.seek(0)
+            self.file.truncate()
+            return len(data)
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    def to_upload(self, filename):
+        if self.too_large:
+            raise UploadTooLargeError(filename, self.max_size)
+        if self.path is not None:
+            self.file.flush()
+            return PDFUpload(filename, path=self.path, sha256=self.sha256.hexdigest(), size=self.size)
+        return PDFUpload(filename, data=self.file.getvalue(), sha256=self.sha256.hexdigest())
+
+    def __getattr__(self, name):
+        # read/seek/tell/close etc. for werkzeug's FileStorage
+        return getattr(self.file, name)
+
+
+class UploadRequest(Request):
+    """Flask request class that streams file parts into UploadSpools.
+
+    Zip parts (batch comparisons) get the archive limit; readers still enforce
+    their own, smaller limit on anything spooled under a larger one.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        in_memory = total_content_length is not None and total_content_length <= UploadSpool.MEMORY_LIMIT
+        max_mb = Config.MAX_BATCH_UPLOAD_MB if (filename or "").lower().endswith(".zip") else Config.MAX_UPLOAD_MB
+        return UploadSpool(max_mb * 1024 * 1024, in_memory)
+
+
+class PDFUpload:
+    """One input PDF, held either as ``bytes`` or as a file on disk, plus its SHA-256.
+
+    ``bytes`` is the only in-memory type ``fitz.open`` wraps without copying
+    (bytearray and BytesIO are copied); a path lets MuPDF read the file lazily.
+    """
+
+    __slots__ = ("filename", "data", "path", "_sha256", "_size")
+
+    def __init__(self, filename=None, data=None, path=None, sha256=None, size=None):
+        self.filename = filename
+        self.data = data
+        self.path = path
+        self._sha256 = sha256
+        self._size = size
+
+    @staticmethod
+    def coerce(pdf_file):
+        """Wrap bytes, a BytesIO or any readable file as a PDFUpload (no-op for uploads)."""
+        if isinstance(pdf_file, PDFUpload):
+            return pdf_file
+        if isinstance(pdf_file, bytes):
+            data = pdf_file
+        elif isinstance(pdf_file, bytearray):
+            data = bytes(pdf_file)
+        elif hasattr(pdf_file, "getvalue"):
+            data = pdf_file.getvalue()
+        else:
+            data = pdf_file.read()
+        return PDFUpload(getattr(pdf_file, "filename", None), data=data)
+
+    @property
+    def size(self):
+        if self._size is None:
+            self._size = len(self.data) if self.data is not None else os.path.getsize(self.path)
+        return self._size
+
+    @property
+    def sha256(self):
+        if self._sha256 is None:
+            digest = hashlib.sha256()
+            if self.data is not None:
+                digest.update(self.data)
+            else:
+                with open(self.path, "rb") as handle:
+                    for chunk in iter(lambda: handle.read(UploadService.CHUNK_SIZE), b""):
+                        digest.update(chunk)
+            self._sha256 = digest.hexdigest()
+        return self._sha256
+
+    def detached(self, directory, name):
+        """This upload, usable past the request whose temp file holds it.
+
+        In-memory uploads are returned as they are. Spooled ones stay on disk:
+        the file is hard-linked (or copied, across file systems) to ``name`` in
+        ``directory``, which the caller owns.
+        """
+        if self.data is not None:
+            return self
+        path = os.path.join(directory, name)
+        try:
+            os.link(self.path, path)
+        except OSError:
+            shutil.copyfile(self.path, path)
+        return PDFUpload(self.filename, path=path, sha256=self._sha256, size=self._size)
+
+    def open(self):
+        if self.data is not None:
+            return fitz.open("pdf", self.data)
+        return fitz.open(self.path, filetype="pdf")
+
+
+class UploadService:
+    """Reads multipart uploads exactly once, enforcing the size limit while reading."""
+
+    CHUNK_SIZE = 1024 * 1024
+
+    @staticmethod
+    def read(file_storage, max_size):
+        """Return a PDFUpload for a werkzeug FileStorage, raising UploadTooLargeError past ``max_size``.
+
+        Parts spooled by UploadRequest were already counted and hashed while the
+        request body was parsed. Other streams are read once in chunks and
+        abandoned as soon as they cross the limit.
+        """
+        stream = file_storage.stream
+        if isinstance(stream, UploadSpool) and stream.max_size <= max_size:
+            return stream.to_upload(file_storage.filename)
+
+        chunks = []
+        total = 0
+        while True:
+            chunk = stream.read(UploadService.CHUNK_SIZE)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > max_size:
+                raise UploadTooLargeError(file_storage.filename, max_size)
+            chunks.append(chunk)
+        data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+        return PDFUpload(file_storage.filename, data=data)
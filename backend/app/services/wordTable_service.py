@@ -0,0 +1,149 @@
+import fitz
+import numpy as np
+
+
+class TextVocabulary:
+    """Interns word strings to integer ids shared by both documents of a comparison."""
+
+    def __init__(self):
+        self.texts = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def intern(self, text):
+        text_id = self.ids.get(text)
+        if text_id is None:
+            text_id = len(self.texts)
+            self.ids[text] = text_id
+            self.texts.append(text)
+        return text_id
+
+    def intern_many(self, texts):
+        return np.fromiter((self.intern(text) for text in texts), dtype=np.int32, count=len(texts))
+
+    def text(self, text_id):
+        return self.texts[text_id]
+
+
+class PageWordTable:
+    """Columnar word data for one page: interned text ids plus an N x 4 float32 bbox array.
+
+    Iterating a table yields the legacy ``{'text', 'bbox', 'font_size'}`` dicts, so the
+    highlighting and summary helpers accept it unchanged; the diff works on the arrays.
+    """
+
+    __slots__ = ("page", "text_ids", "bboxes", "vocabulary")
+
+    def __init__(self, page, text_ids, bboxes, vocabulary):
+        self.page = page
+        self.text_ids = text_ids
+        self.bboxes = bboxes
+        self.vocabulary = vocabulary
+
+    @classmethod
+    def from_words(cls, page, words, vocabulary):
+        """Build a table from ``page.get_text("words")`` tuples."""
+        if not words:
+            return cls.empty(page, vocabulary)
+        text_ids = vocabulary.intern_many([word[4].strip() for word in words])
+        bboxes = np.array([word[:4] for word in words], dtype=np.float32)
+        return cls(page, text_ids, bboxes, vocabulary)
+
+    @classmethod
+    def empty(cls, page, vocabulary):
+        return cls(page, np.empty(0, dtype=np.int32), np.empty((0, 4), dtype=np.float32), vocabulary)
+
+    def __len__(self):
+        return len(self.text_ids)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.item(index)
+
+    @property
+    def font_sizes(self):
+        return self.bboxes[:, 3] - self.bboxes[:, 1]
+
+    def text(self, index):
+        return self.vocabulary.text(int(self.text_ids[index]))
+
+    def rect(self, index):
+        return fitz.Rect(*self.bboxes[index].tolist())
+
+    def item(self, index):
+        rect = self.rect(index)
+        return {'text': self.text(index), 'bbox': rect, 'font_size': rect.y1 - rect.y0}
+
+    def take(self, selector):
+        """Return a new table holding the rows picked by a boolean mask or index array."""
+        return PageWordTable(self.page, self.text_ids[selector], self.bboxes[selector], self.vocabulary)
+
+    def nbytes(self):
+        return self.text_ids.nbytes + self.bboxes.nbytes
+
+
+class WordTableMatcher:
+    """Vectorized version of ``WordLocationIndex``: same text/grid-cell bucketing,
+    but candidate lookups and tolerance checks run on whole arrays at once."""
+
+    NEIGHBOUR_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+    # Cell coordinates are clipped into 18 bits each so (text id, x cell, y cell) packs
+    # into one int64 key. Clipping keeps neighbouring cells adjacent, so it only ever
+    # adds candidates; the exact tolerance check below still decides every match.
+    CELL_BITS = 18
+    CELL_LIMIT = 1 << (CELL_BITS - 1)
+
+    @staticmethod
+    def cells(bboxes, tolerance):
+        return np.floor(bboxes[:, :2].astype(np.float64) / tolerance).astype(np.int64)
+
+    @classmethod
+    def pack(cls, text_ids, cell_x, cell_y):
+        cell_x = np.clip(cell_x, -cls.CELL_LIMIT, cls.CELL_LIMIT - 1) + cls.CELL_LIMIT
+        cell_y = np.clip(cell_y, -cls.CELL_LIMIT, cls.CELL_LIMIT - 1) + cls.CELL_LIMIT
+        return (text_ids.astype(np.int64) << (2 * cls.CELL_BITS)) | (cell_x << cls.CELL_BITS) | cell_y
+
+    @classmethod
+    def match_mask(cls, probe, target, tolerance):
+        """Boolean mask of ``probe`` rows that have a same-text, same-location row in ``target``."""
+        if probe.vocabulary is not target.vocabulary:
+            raise ValueError("Word tables must share one TextVocabulary to be compared")
+
+        matched = np.zeros(len(probe), dtype=bool)
+        if len(probe) == 0 or len(target) == 0 or tolerance <= 0:
+            return matched
+
+        target_cells = cls.cells(target.bboxes, tolerance)
+        target_keys = cls.pack(target.text_ids, target_cells[:, 0], target_cells[:, 1])
+        order = np.argsort(target_keys, kind="stable")
+        sorted_keys = target_keys[order]
+
+        # Visit probe rows in key order: shifting every cell by the same offset keeps the
+        # queries sorted, which makes searchsorted far more cache friendly.
+        probe_cells = cls.cells(probe.bboxes, tolerance)
+        probe_order = np.argsort(cls.pack(probe.text_ids, probe_cells[:, 0], probe_cells[:, 1]), kind="stable")
+        probe_cells = probe_cells[probe_order]
+        probe_text_ids = probe.text_ids[probe_order]
+        probe_boxes = probe.bboxes[probe_order].astype(np.float64)
+        target_boxes = target.bboxes.astype(np.float64)
+
+        for dx, dy in cls.NEIGHBOUR_OFFSETS:
+            keys = cls.pack(probe_text_ids, probe_cells[:, 0] + dx, probe_cells[:, 1] + dy)
+            starts = np.searchsorted(sorted_keys, keys, side="left")
+            counts = np.searchsorted(sorted_keys, keys, side="right") - starts
+            total = int(counts.sum())
+            if total == 0:
+                continue
+
+            # Expand every (probe row, candidate row) pair of this neighbour cell
+            probe_rows = np.repeat(np.arange(len(probe)), counts)
+            first_pair = np.repeat(np.cumsum(counts) - counts, counts)
+            candidate_rows = order[np.repeat(starts, counts) + np.arange(total) - first_pair]
+
+            close = np.all(np.abs(probe_boxes[probe_rows] - target_boxes[candidate_rows]) < tolerance, axis=1)
+            matched[probe_order[probe_rows[close]]] = True
+
+        return matched
@@ -1,42 +1,196 @@
 import os
 import sys
+import json
+import queue
+import threading
 import time
 import logging
+import traceback
+import zipfile
 from functools import wraps
 from flask import request, jsonify
 from loguru import logger
+from core.config import Config
 
 # Define log directory one level outside the project folder
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 PARENT_DIR = os.path.dirname(PROJECT_ROOT)                 # one level up
-log_dir = os.path.join(PARENT_DIR, "logs")                 # logs folder outside
+log_dir = os.getenv("LOG_DIR", os.path.join(PARENT_DIR, "logs"))  # logs folder outside
 
 os.makedirs(log_dir, exist_ok=True)
 
-# Define log file with daily rotation
-log_file = os.path.join(log_dir, "app_{time:YYYY-MM-DD}.log")
+TEXT_FORMAT = "{time} | {level} | {message}"
+RETENTION_DAYS = 7
+
+
+def json_line(record):
+    """One JSON object: time, level, message, module and the fields bound to the record."""
+    entry = {
+        "time": record["time"].strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+        "level": record["level"].name,
+        "message": record["message"],
+        "module": record["name"],
+    }
+    entry.update((key, value) for key, value in record["extra"].items() if key != "json")
+    if record["exception"] is not None:
+        entry["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def json_format(record):
+    record["extra"]["json"] = json_line(record)
+    return "{extra[json]}\n"
+
+
+def text_line(record):
+    line = f"{record['time'].isoformat()} | {record['level'].name} | {record['message']}"
+    if record["exception"] is not None:
+        line += "\n" + "".join(traceback.format_exception(*record["exception"])).rstrip("\n")
+    return line
+
+
+class QueuedLogWriter:
+    """loguru sink that only queues the record; a writer thread formats it and appends it to the day's file.
+
+    loguru's own ``enqueue`` pickles every record through a multiprocessing
+    pipe, which costs the calling thread more than writing the line itself.
+    Here a request pays for building the record and a queue put. Each process
+    writes its own file (``app_YYYY-MM-DD.<pid>.log``), so uwsgi workers never
+    interleave lines or rotate a file another process still has open. When the
+    day changes the process zips its previous file; files of exited processes
+    are zipped once they sit untouched for a day, and zips older than the
+    retention are deleted. When the disk cannot keep up, records past
+    ``max_queue`` are dropped and counted rather than blocking requests.
+    """
+
+    # A file untouched this long has no writer left (its process exited)
+    IDLE_SECONDS = 86400
+
+    def __init__(self, directory, log_format="json", retention_days=RETENTION_DAYS, max_queue=100000):
+        self.directory = directory
+        self.format_line = json_line if log_format == "json" else text_line
+        self.retention_days = retention_days
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+        self.day = None
+        self.path = None
+        self.file = None
+        self.thread = threading.Thread(target=self.run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, message):
+        try:
+            self.queue.put_nowait(message.record)
+        except queue.Full:
+            with self.dropped_lock:
+                self.dropped += 1
+
+    def run(self):
+        while True:
+            record = self.queue.get()
+            try:
+                if record is None:
+                    break
+                self.write_record(record)
+                # Lines are buffered while records keep coming and flushed once the queue runs dry
+                if self.queue.empty():
+                    self.file.flush()
+            except Exception as e:
+                sys.stderr.write(f"Log writer failed: {e}\n")
+            finally:
+                self.queue.task_done()
+        if self.file is not None:
+            self.file.close()
+
+    def write_record(self, record):
+        day = record["time"].strftime("%Y-%m-%d")
+        if day != self.day:
+            self.rotate(day)
+        if self.dropped:
+            with self.dropped_lock:
+                dropped, self.dropped = self.dropped, 0
+            self.file.write(f"{json.dumps({'level': 'WARNING', 'event': 'log_dropped', 'records': dropped})}\n")
+        self.file.write(self.format_line(record) + "\n")
+
+    def rotate(self, day):
+        previous = self.path
+        if self.file is not None:
+            self.file.close()
+        self.day = day
+        self.path = os.path.join(self.directory, f"app_{day}.{os.getpid()}.log")
+        self.file = open(self.path, "a", encoding="utf-8")
+        if previous is not None:
+            self.compress(previous)
+
+    def compress(self, path):
+        """Zip this process's finished day, then the idle files of exited processes, and delete old zips."""
+        self.zip_file(path)
+        now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except OSError as e:
+            sys.stderr.write(f"Log rotation in {self.directory} failed: {e}\n")
+            return
+        for name in names:
+            if not name.startswith("app_"):
+                continue
+            other = os.path.join(self.directory, name)
+            try:
+                if name.endswith(".log.zip") and os.path.getmtime(other) < now - self.retention_days * 86400:
+                    os.unlink(other)
+                elif name.endswith(".log") and other != self.path and os.path.getmtime(other) < now - self.IDLE_SECONDS:
+                    self.zip_file(other)
+            except OSError:
+                pass  # Already rotated by another process
+
+    @staticmethod
+    def zip_file(path):
+        """Replace ``path`` by ``path.zip``; built under a per-process name first, as other processes may race."""
+        if os.path.exists(path + ".zip"):
+            return
+        partial = f"{path}.zip.{os.getpid()}"
+        try:
+            with zipfile.ZipFile(partial, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                archive.write(path, os.path.basename(path))
+            os.replace(partial, path + ".zip")
+            os.unlink(path)
+        except OSError as e:
+            try:
+                os.unlink(partial)
+            except OSError:
+                pass
+            if not isinstance(e, FileNotFoundError):
+                sys.stderr.write(f"Log rotation of {path} failed: {e}\n")
+
+    def stop(self):
+        """Write out what is queued and stop the thread (loguru calls this on logger.remove and at exit)."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout=5)
+
+
+def add_log_sink(directory, level=Config.LOG_LEVEL, log_format=Config.LOG_FORMAT, queued=Config.LOG_ASYNC):
+    """Register the daily log file in ``directory`` as the only sink; returns the loguru handler id.
+
+    Queued, the file is written by a QueuedLogWriter thread; otherwise loguru
+    writes it on the calling thread.
+    """
+    if queued:
+        return logger.add(QueuedLogWriter(directory, log_format), level=level, format="{message}")
+    return logger.add(
+        os.path.join(directory, "app_{time:YYYY-MM-DD}.log"),
+        rotation="00:00",
+        retention=f"{RETENTION_DAYS} days",
+        compression="zip",
+        level=level,
+        format=json_format if log_format == "json" else TEXT_FORMAT,
+    )
+
 
 # Remove default Loguru handlers
 logger.remove()
-
-# Log level based on environment
-LOG_LEVEL = "DEBUG" if os.getenv("FLASK_ENV") == "development" else "INFO"
-
-# Console logging
-logger.add(log_file, 
-           rotation="1 day", 
-           format="{time} | {level} | {message}",  # 🛠 FIXED: no quotes around time
-           level="INFO")
-
-# File logging (JSON format for better monitoring)
-logger.add(
-    log_file,
-    rotation="00:00",
-    retention="7 days",
-    compression="zip",
-    level=LOG_LEVEL,
-    format='{{"time": "{time:YYYY-MM-DD HH:mm:ss}", "level": "{level}", "message": "{message}"}}'
-)
+add_log_sink(log_dir)
 
 # Flask log interception
 class InterceptHandler(logging.Handler):
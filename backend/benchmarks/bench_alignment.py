@@ -0,0 +1,101 @@
+"""Time page alignment against scoring every page pair, on synthetic drawing sets with moved, inserted and deleted sheets.
+
+Usage (from the backend folder):
+    python benchmarks/bench_alignment.py --pages 50 200 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+
+from services.pageAlignment_service import PageAlignmentService  # noqa: E402
+from services.wordTable_service import PageWordTable, TextVocabulary  # noqa: E402
+
+
+def drawing_set(page_count, words_per_page=800, seed=7):
+    """Word tables of a drawing set sharing a boilerplate vocabulary, and a revision of it.
+
+    The revision moves every tenth sheet, deletes every 25th, inserts a new sheet every 30th
+    and edits 5% of the words of the rest. Returns both lists and the expected pairs.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = TextVocabulary()
+    vocabulary.intern_many([f"W{index}" for index in range(50000)])
+    boilerplate = rng.integers(0, 500, size=words_per_page // 4)
+
+    def table(page_num, text_ids):
+        bboxes = np.zeros((len(text_ids), 4), dtype=np.float32)
+        bboxes[:, 0] = rng.uniform(0, 3000, len(text_ids))
+        bboxes[:, 1] = rng.uniform(0, 2000, len(text_ids))
+        bboxes[:, 2:] = bboxes[:, :2] + 20
+        return PageWordTable(page_num, text_ids.astype(np.int32), bboxes, vocabulary)
+
+    sheets = [
+        np.concatenate([boilerplate, rng.integers(500, 50000, size=words_per_page - len(boilerplate))])
+        for _ in range(page_count)
+    ]
+    order = [page for page in range(page_count) if page % 25 != 24]
+    for page in range(0, len(order) - 1, 10):
+        order[page], order[page + 1] = order[page + 1], order[page]
+
+    tables1 = [table(page, words) for page, words in enumerate(sheets)]
+    tables2, expected = [], {}
+    for position, page in enumerate(order):
+        if position % 30 == 29:
+            new_sheet = np.concatenate([boilerplate, rng.integers(500, 50000, size=words_per_page - len(boilerplate))])
+            tables2.append(table(len(tables2), new_sheet))
+        words = sheets[page].copy()
+        edited = rng.random(len(words)) < 0.05
+        words[edited] = rng.integers(500, 50000, size=int(edited.sum()))
+        expected[page] = len(tables2)
+        tables2.append(table(len(tables2), words))
+    return tables1, tables2, expected
+
+
+def all_pairs(tables1, tables2):
+    """Reference: exact similarity of every page pair, matched greedily."""
+    words1 = [PageAlignmentService.word_set(table) for table in tables1]
+    words2 = [PageAlignmentService.word_set(table) for table in tables2]
+    scored = sorted(
+        (-PageAlignmentService.similarity(first, second), page1, page2)
+        for page1, first in enumerate(words1) for page2, second in enumerate(words2)
+    )
+    pairs, taken = {}, set()
+    for score, page1, page2 in scored:
+        if -score >= PageAlignmentService.MATCH_MIN and page1 not in pairs and page2 not in taken:
+            pairs[page1] = page2
+            taken.add(page2)
+    return pairs
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--all-pairs-max", type=int, default=300, help="skip the all-pairs reference above this page count")
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'align ms':>9} {'correct':>8} {'added':>6} {'removed':>8} {'all-pairs ms':>13}")
+    for page_count in args.pages:
+        tables1, tables2, expected = drawing_set(page_count)
+        alignment, align_time = timed(PageAlignmentService.align, tables1, tables2)
+        correct = sum(1 for page1, page2 in expected.items() if alignment.pairs.get(page1) == page2)
+        reference = "-"
+        if page_count <= args.all_pairs_max:
+            _, reference_time = timed(all_pairs, tables1, tables2)
+            reference = f"{reference_time * 1000:.1f}"
+        print(f"{page_count:6d} {align_time * 1000:9.1f} {correct / len(expected):8.1%} "
+              f"{len(alignment.added):6d} {len(alignment.removed):8d} {reference:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare N drawing pairs one at a time vs as one batch on the process pool.
+
+Usage (from the backend folder):
+    python benchmarks/bench_batch.py --pairs 8 --pages 4
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+# Both runs must extract every drawing
+os.environ["EXTRACTION_CACHE_ENABLED"] = "false"
+
+from services.pdf_service import PDFService  # noqa: E402
+from services.batchCompare_service import BatchCompareService, BatchPair  # noqa: E402
+from services.compareResult_service import comparison_cache  # noqa: E402
+
+
+def drawing(path, pages, seed):
+    """A drawing of ``pages`` sheets with a grid of labels; ``seed`` shifts some of them."""
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page(width=1684, height=1191)
+        shape = page.new_shape()
+        for row in range(40, 1150, 18):
+            for column in range(40, 1600, 90):
+                label = f"P{page_num}-{row}-{column}"
+                if (row + column + seed) % 29 == 0:
+                    label += "X"
+                shape.insert_text((column, row), label, fontsize=7)
+        shape.commit()
+    doc.save(path)
+    doc.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=4)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-batch-")
+    try:
+        pairs = []
+        for index in range(args.pairs):
+            path1 = os.path.join(directory, f"{index}-old.pdf")
+            path2 = os.path.join(directory, f"{index}-new.pdf")
+            drawing(path1, args.pages, 0)
+            drawing(path2, args.pages, index + 1)
+            pairs.append(BatchPair(f"sheet-{index}", path1, path2, path1, path2))
+
+        start = time.perf_counter()
+        for pair in pairs:
+            with open(pair.path1, "rb") as handle1, open(pair.path2, "rb") as handle2:
+                result, _ = PDFService.cached_comparison(handle1.read(), handle2.read())
+            result.artifact("layers")
+            comparison_cache.clear()
+        sequential = time.perf_counter() - start
+
+        work = os.path.join(directory, "batch")
+        os.makedirs(work)
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk in BatchCompareService.stream(pairs, work, ["layers"]))
+        batch = time.perf_counter() - start
+
+        print(f"{args.pairs} pairs x {args.pages} pages, {BatchCompareService.worker_count()} pool worker(s)")
+        print(f"one at a time  {sequential * 1000:9.0f} ms")
+        print(f"batch          {batch * 1000:9.0f} ms  ({size / 1024:.0f} KB zip)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
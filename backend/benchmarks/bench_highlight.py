@@ -0,0 +1,70 @@
+"""Compare the highlight modes on a diff-heavy sheet: annotate time, save time, output size, render time.
+
+Usage (from the backend folder):
+    python benchmarks/bench_highlight.py --words 500 2000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+
+from services.findMissingOrExtraValues_service import FindMissingOrExraValuesService  # noqa: E402
+
+
+def text_sheet(word_count, width=3370, height=2384):
+    """An A0 sheet filled with rows of short words, returned as PDF bytes and its word list."""
+    doc = fitz.open()
+    page = doc.new_page(width=width, height=height)
+    writer = fitz.TextWriter(page.rect)
+    x, y = 20, 30
+    for index in range(word_count):
+        writer.append((x, y), f"W{index % 97}", fontsize=8)
+        x += 40
+        if x > width - 60:
+            x, y = 20, y + 12
+    writer.write_text(page)
+    data = doc.tobytes()
+    words = [{"text": word[4], "bbox": fitz.Rect(word[:4])} for word in page.get_text("words")]
+    doc.close()
+    return data, words
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run(data, words, mode):
+    doc = fitz.open("pdf", data)
+    _, annotate = timed(FindMissingOrExraValuesService.highlight_values, doc[0], words, (1, 0, 0), mode)
+    output = io.BytesIO()
+    _, save = timed(doc.save, output)
+    doc.close()
+
+    rendered = fitz.open("pdf", output.getvalue())
+    _, render = timed(rendered[0].get_pixmap, dpi=72)
+    rendered.close()
+    return annotate, save, len(output.getvalue()), render
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, nargs="+", default=[500, 2000])
+    args = parser.parse_args()
+
+    print(f"{'words':>6} {'mode':>8} {'annotate ms':>12} {'save ms':>8} {'output KB':>10} {'render ms':>10}")
+    for word_count in args.words:
+        data, words = text_sheet(word_count)
+        for mode in FindMissingOrExraValuesService.HIGHLIGHT_MODES:
+            annotate, save, size, render = run(data, words, mode)
+            print(f"{word_count:6d} {mode:>8} {annotate * 1000:12.1f} {save * 1000:8.1f} {size / 1024:10.1f} {render * 1000:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Time block_suspicious_input against the previous seven-regex scan of the stringified request.
+
+Request bodies are built once and replayed through test request contexts: a
+raw PDF body of each ``--mb`` size, a multipart upload of the same PDF with a
+text field, and a JSON body.
+
+Usage (from the backend folder):
+    python benchmarks/bench_inspection.py --mb 1 10
+"""
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import time
+
+from flask import Flask, request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+
+from middleware.secure_middleware import block_suspicious_input  # noqa: E402
+
+PREVIOUS_PATTERNS = [
+    r"(?i)(\b(select|union|drop|insert|update|delete|exec|alter|create|truncate)\b)",
+    r"(?i)(<script.*?>.*?</script>)",
+    r"(?i)(\bjavascript:)",
+    r"(?i)(onerror=|onload=|onmouseover=)",
+    r"(?i)(--|/\*|\*/|@@|char\(|nchar\()",
+    r"(?i)(base64_decode\(|eval\()",
+    r"(document\.cookie|document\.location)",
+]
+
+
+def previous_block_suspicious_input():
+    """Previous implementation: every pattern over the repr of args, form, JSON and the raw body."""
+    combined = " ".join([
+        str(request.args), str(request.form), str(request.get_json(silent=True) or ''), str(request.data),
+    ])
+    for pattern in PREVIOUS_PATTERNS:
+        if re.search(pattern, combined):
+            return 403
+    return None
+
+
+def pdf_bytes(size):
+    """PDF-like binary of ``size`` bytes that contains none of the patterns."""
+    chunk = bytes(range(256)).replace(b"-", b"_").replace(b"@", b"_").replace(b"*", b"_") * 64
+    return (b"%PDF-1.7\n" + chunk * (size // len(chunk) + 1))[:size]
+
+
+def requests_for(size):
+    data = pdf_bytes(size)
+    return {
+        "raw pdf": lambda: {"data": data, "content_type": "application/pdf"},
+        "multipart": lambda: {
+            "data": {"file1": (io.BytesIO(data), "a.pdf"), "tolerance": "5"}, "content_type": "multipart/form-data",
+        },
+        "json": lambda: {"data": json.dumps({"name": "Drawing", "pages": [{"note": "REV B"}] * 200}),
+                         "content_type": "application/json"},
+    }
+
+
+def timed(app, check, kwargs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        with app.test_request_context("/api/compare/report?tolerance=5", method="POST", **kwargs()):
+            request.form, request.get_json(silent=True)  # parse outside the timing, as the upload path does
+            start = time.perf_counter()
+            result = check()
+            best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 10])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    app = Flask(__name__)
+
+    print(f"{'MB':>5} {'request':>10} {'previous ms':>12} {'now ms':>8} {'blocked before/now':>19}")
+    for mb in args.mb:
+        for name, kwargs in requests_for(int(mb * 1024 * 1024)).items():
+            before, blocked_before = timed(app, previous_block_suspicious_input, kwargs, args.repeat)
+            after, blocked_now = timed(app, block_suspicious_input, kwargs, args.repeat)
+            print(f"{mb:5g} {name:>10} {before * 1000:12.2f} {after * 1000:8.3f} "
+                  f"{str(blocked_before is not None):>9}/{str(blocked_now is not None)}")
+
+
+if __name__ == "__main__":
+    main()
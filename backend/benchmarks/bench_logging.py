@@ -0,0 +1,84 @@
+"""Cost of a log call on the request thread: the old two synchronous sinks, one JSON sink, loguru's enqueue and the QueuedLogWriter.
+
+Each mode logs ``--records`` access-log-sized records from ``--threads`` threads into
+a temp directory. "call us" is the mean time a thread spends inside logger.info,
+which is what a request pays; "drain s" is how long the writer then takes to
+finish the file.
+
+Usage (from the backend folder):
+    python benchmarks/bench_logging.py --threads 1 8 --records 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+
+from loguru import logger  # noqa: E402
+from utils.logger import add_log_sink, json_format  # noqa: E402
+
+logger.remove()  # drop the application's own log file
+
+MODES = ("two sinks", "json", "loguru enqueue", "json queued")
+
+
+def configure(mode, directory):
+    logger.remove()
+    path = os.path.join(directory, "app_{time:YYYY-MM-DD}.log")
+    if mode == "two sinks":
+        # Previous setup: a text and a JSON-ish sink on the same file, both written on the calling thread
+        logger.add(path, level="INFO", format="{time} | {level} | {message}")
+        logger.add(path, level="INFO", format='{{"time": "{time}", "level": "{level}", "message": "{message}"}}')
+    elif mode == "loguru enqueue":
+        logger.add(path, level="INFO", format=json_format, enqueue=True)
+    else:
+        add_log_sink(directory, level="INFO", log_format="json", queued=mode == "json queued")
+
+
+def run(mode, directory, threads, records):
+    directory = os.path.join(directory, f"{mode.replace(' ', '-')}-{threads}")
+    os.makedirs(directory)
+    configure(mode, directory)
+    per_thread = records // threads
+    spent = [0.0] * threads
+
+    def work(index):
+        access = logger.bind(event="access", method="POST", path="/api/compare/report", status=200)
+        start = time.perf_counter()
+        for number in range(per_thread):
+            access.info("10.0.0.1 POST /api/compare/report Status: 200 | Agent: bench | Length: {} bytes", number)
+        spent[index] = time.perf_counter() - start
+
+    workers = [threading.Thread(target=work, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    logged = time.perf_counter()
+    logger.remove()  # waits for queued records to be written
+    drained = time.perf_counter()
+
+    call_us = sum(spent) / (per_thread * threads) * 1e6
+    return call_us, logged - start, drained - logged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--records", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'threads':>7} {'mode':>14} {'call us':>8} {'log s':>7} {'drain s':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for threads in args.threads:
+            for mode in MODES:
+                call_us, log_seconds, drain_seconds = run(mode, directory, threads, args.records)
+                print(f"{threads:7d} {mode:>14} {call_us:8.1f} {log_seconds:7.2f} {drain_seconds:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark the indexed word matcher against the nested-loop reference.
+
+Usage (from the backend folder):
+    python benchmarks/bench_matcher.py --words 5000 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+
+from services import PageWordTable, TextVocabulary  # noqa: E402
+from services.findMissingOrExtraValues_service import FindMissingOrExraValuesService  # noqa: E402
+from reference import find_missing_or_extra_values_bruteforce  # noqa: E402
+
+VOCABULARY = ["M10", "R5", "Ø12", "A", "B", "SEC", "DETAIL", "120.5", "45°", "TOL", "0.1", "REV", "SCALE"]
+
+
+def dense_sheet(word_count, seed, width=3370, height=2384):
+    """Random words spread over an A0 sheet, roughly like a dense drawing."""
+    rnd = random.Random(seed)
+    words = []
+    for _ in range(word_count):
+        x0, y0 = rnd.uniform(0, width - 40), rnd.uniform(0, height - 10)
+        text = rnd.choice(VOCABULARY) + str(rnd.randint(0, 50))
+        bbox = fitz.Rect(x0, y0, x0 + 6 * len(text), y0 + 8)
+        words.append({"text": text, "bbox": bbox, "font_size": bbox.height})
+    return words
+
+
+def revise(words, diff_rate, seed):
+    """Copy a sheet, moving or renaming a fraction of its words."""
+    rnd = random.Random(seed)
+    revised = []
+    for item in words:
+        text, bbox = item["text"], fitz.Rect(item["bbox"])
+        roll = rnd.random()
+        if roll < diff_rate / 2:
+            text += "X"
+        elif roll < diff_rate:
+            bbox = bbox + (12, 0, 12, 0)
+        else:
+            bbox = bbox + (rnd.uniform(-1, 1), rnd.uniform(-1, 1)) * 2
+        revised.append({"text": text, "bbox": bbox, "font_size": bbox.height})
+    return revised
+
+
+def as_table(words, vocabulary):
+    return PageWordTable.from_words(0, [tuple(item["bbox"]) + (item["text"],) for item in words], vocabulary)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--diff-rate", type=float, default=0.05)
+    parser.add_argument("--tolerance", type=float, default=5)
+    parser.add_argument("--skip-bruteforce", action="store_true", help="only time the indexed matcher")
+    args = parser.parse_args()
+
+    print(f"{'words':>8} {'columnar (s)':>13} {'indexed (s)':>12} {'bruteforce (s)':>15} {'speed-up':>9}")
+    for count in args.words:
+        page1 = dense_sheet(count, seed=count)
+        page2 = revise(page1, args.diff_rate, seed=count + 1)
+
+        vocabulary = TextVocabulary()
+        table1, table2 = as_table(page1, vocabulary), as_table(page2, vocabulary)
+        columnar, columnar_time = timed(
+            FindMissingOrExraValuesService.find_missing_or_extra_values, table1, table2, tolerance=args.tolerance
+        )
+
+        indexed, indexed_time = timed(
+            FindMissingOrExraValuesService.find_missing_or_extra_values, page1, page2, tolerance=args.tolerance
+        )
+        if args.skip_bruteforce:
+            print(f"{count:>8} {columnar_time:>13.4f} {indexed_time:>12.4f} {'-':>15} {'-':>9}")
+            continue
+
+        reference, reference_time = timed(
+            find_missing_or_extra_values_bruteforce, page1, page2, tolerance=args.tolerance
+        )
+        if indexed != reference:
+            sys.exit(f"Indexed matcher disagrees with the reference scan for {count} words")
+        print(f"{count:>8} {columnar_time:>13.4f} {indexed_time:>12.4f} {reference_time:>15.4f} "
+              f"{reference_time / indexed_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
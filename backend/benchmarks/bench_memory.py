@@ -0,0 +1,80 @@
+"""Peak memory of one comparison with materialized versus streamed page extraction.
+
+Every run is a fresh interpreter, so ru_maxrss is the peak of that comparison alone.
+
+Usage (from the backend folder):
+    python benchmarks/bench_memory.py --pages 100 500 --words 2000
+"""
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+
+MODES = ("materialized", "streamed")
+
+
+def drawing_set(path, page_count, word_count, revised=False):
+    """A set of A1 sheets of ``word_count`` words each; the revision edits every fifth sheet."""
+    doc = fitz.open()
+    for number in range(page_count):
+        rng = random.Random(number)
+        words = [f"{rng.choice(['DUCT', 'PIPE', 'VALVE', 'BEAM', 'COL'])}-{rng.randint(1, 999)}" for _ in range(word_count)]
+        if revised and number % 5 == 0:
+            words[::50] = [f"REV-{index}" for index in range(0, word_count, 50)]
+        lines = [" ".join(words[start:start + 30]) for start in range(0, len(words), 30)]
+        doc.new_page(width=2384, height=1684).insert_text((30, 40), lines, fontsize=7, lineheight=2.5)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def run(mode, path1, path2):
+    """Compare in this process and print seconds and peak RSS."""
+    os.environ["EXTRACTION_CACHE_ENABLED"] = "false"
+    from services.compareSession_service import CompareSession
+    from services.upload_service import PDFUpload
+
+    start = time.perf_counter()
+    with CompareSession(PDFUpload("1.pdf", path=path1), PDFUpload("2.pdf", path=path2), workers=1) as session:
+        if mode == "materialized":
+            session.content()  # every page of both documents extracted up front
+        session.differences()
+    seconds = time.perf_counter() - start
+    print(f"{seconds:.3f} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--words", type=int, default=2000, help="words per sheet")
+    parser.add_argument("--run", nargs=3, metavar=("MODE", "PDF1", "PDF2"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run(*args.run)
+        return
+
+    print(f"{'pages':>6} {'mode':>13} {'seconds':>8} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for page_count in args.pages:
+            path1 = os.path.join(directory, f"{page_count}-1.pdf")
+            path2 = os.path.join(directory, f"{page_count}-2.pdf")
+            drawing_set(path1, page_count, args.words)
+            drawing_set(path2, page_count, args.words, revised=True)
+            for mode in MODES:
+                output = subprocess.run(
+                    [sys.executable, __file__, "--run", mode, path1, path2],
+                    check=True, capture_output=True, text=True,
+                ).stdout.split()
+                seconds, peak = output[-2:]
+                print(f"{page_count:6d} {mode:>13} {float(seconds):8.2f} {int(peak):12d}")
+
+
+if __name__ == "__main__":
+    main()
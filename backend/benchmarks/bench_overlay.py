@@ -0,0 +1,62 @@
+"""Time writing the extra words onto a page: one insert_text per word vs one batched Shape commit.
+
+Usage (from the backend folder):
+    python benchmarks/bench_overlay.py --words 500 2000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+
+from services.findMissingOrExtraValues_service import FindMissingOrExraValuesService  # noqa: E402
+from reference import insert_extra_per_word  # noqa: E402
+
+
+def extra_items(word_count, width=3370):
+    """Extra word items laid out in rows across an A0 sheet."""
+    items = []
+    x, y = 20, 30
+    for index in range(word_count):
+        items.append({"text": f"W{index % 97}", "bbox": fitz.Rect(x, y - 8, x + 30, y + 2)})
+        x += 40
+        if x > width - 60:
+            x, y = 20, y + 12
+    return items
+
+
+def run(items, insert):
+    doc = fitz.open()
+    page = doc.new_page(width=3370, height=2384)
+    start = time.perf_counter()
+    insert(page, items, color=(0, 0, 1))
+    overlay = time.perf_counter() - start
+    output = io.BytesIO()
+    doc.save(output)
+    doc.close()
+    return overlay, len(output.getvalue())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, nargs="+", default=[500, 2000])
+    args = parser.parse_args()
+
+    variants = [
+        ("per-word", insert_extra_per_word),
+        ("batched", FindMissingOrExraValuesService.insert_extra),
+    ]
+    print(f"{'words':>6} {'variant':>9} {'overlay ms':>11} {'us/word':>8} {'output KB':>10}")
+    for word_count in args.words:
+        items = extra_items(word_count)
+        for name, insert in variants:
+            overlay, size = run(items, insert)
+            print(f"{word_count:6d} {name:>9} {overlay * 1000:11.1f} {overlay * 1e6 / word_count:8.1f} {size / 1024:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Save time and output size of an annotated drawing set for each save profile and for incremental saves.
+
+Usage (from the backend folder):
+    python benchmarks/bench_save.py --pages 5 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+
+from services.pdf_service import PDFService  # noqa: E402
+
+
+def drawing_set(page_count, width=3370, height=2384):
+    """PDF bytes of A0 sheets with a grid of line work and labels, written uncompressed like many CAD exports."""
+    doc = fitz.open()
+    for index in range(page_count):
+        page = doc.new_page(width=width, height=height)
+        shape = page.new_shape()
+        for x in range(40, width - 40, 4):
+            shape.draw_line((x, 40), (x, height - 40))
+        for y in range(40, height - 40, 4):
+            shape.draw_line((40, y), (width - 40, y))
+        shape.finish(color=(0, 0, 0), width=0.3)
+        for row in range(60, height - 60, 20):
+            for column in range(60, width - 200, 100):
+                shape.insert_text((column, row), f"S{index}-{row}-{column}", fontsize=9)
+        shape.commit()
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def annotate(doc, per_page=20):
+    for page in doc:
+        for index in range(per_page):
+            page.add_highlight_annot(fitz.Rect(60 + index * 40, 50, 95 + index * 40, 62))
+
+
+def timed_save(doc, profile, incremental):
+    start = time.perf_counter()
+    data = PDFService.save_to_bytes(doc, profile=profile, incremental=incremental)
+    return time.perf_counter() - start, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 20])
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'input KB':>9} {'variant':>22} {'save ms':>9} {'output KB':>10}")
+    for page_count in args.pages:
+        data = drawing_set(page_count)
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as handle:
+            handle.write(data)
+            handle.flush()
+            variants = [(profile, profile, False, "pdf", data) for profile in PDFService.SAVE_PROFILES]
+            variants.append(("fast + incremental", "fast", True, "pdf", data))
+            variants.append(("incremental (by path)", "fast", True, None, handle.name))
+            for name, profile, incremental, filetype, source in variants:
+                doc = fitz.open(filetype, source) if filetype else fitz.open(source)
+                annotate(doc)
+                save, size = timed_save(doc, profile, incremental)
+                doc.close()
+                print(f"{page_count:6d} {len(data) / 1024:9.0f} {name:>22} {save * 1000:9.1f} {size / 1024:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
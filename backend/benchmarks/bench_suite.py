@@ -0,0 +1,255 @@
+"""Time every stage of the comparison pipeline on synthetic drawing sets and check for regressions.
+
+Scenarios are the product of the page sizes, densities, sheet counts and diff
+rates given; each runs ``--repeat`` times and the median per stage is kept.
+Stages follow the report download: extraction, matching
+(find_missing_or_extra_values), filtering (compare_and_ignore_matching_text),
+highlighting, summary, watermark and save.
+
+Usage (from the backend folder):
+    python benchmarks/bench_suite.py --output benchmarks/results/baseline.json
+    python benchmarks/bench_suite.py --baseline benchmarks/results/baseline.json --output current.json
+    python benchmarks/bench_suite.py --results current.json --baseline benchmarks/results/baseline.json
+
+With ``--baseline`` the exit status is 1 when a stage got slower than the threshold allows.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+
+from core.config import Config  # noqa: E402
+from services.extractTextCoordinate_service import ExtractTextAndCoordinatesService  # noqa: E402
+from services.findMissingOrExtraValues_service import FindMissingOrExraValuesService  # noqa: E402
+from services.pageFingerprint_service import PageFingerprintService  # noqa: E402
+from services.pdf_service import PDFService  # noqa: E402
+from services.wordTable_service import TextVocabulary  # noqa: E402
+from drawing_generator import PAGE_SIZES, DrawingSpec, revision_pair  # noqa: E402
+
+STAGES = ("extraction", "matching", "filtering", "highlighting", "summary", "watermark", "save")
+RESULTS_FORMAT = 1
+
+
+class StageTimer:
+    """Adds up wall time per stage; ``with timer.stage(name):`` may be entered many times."""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+
+def run_pipeline(pdf1, pdf2, tolerance=5, mode=None):
+    """One report comparison of two PDFs, timed per stage. Returns the timings and the result counts."""
+    mode = mode or Config.COMPARE_HIGHLIGHT_MODE
+    timer = StageTimer()
+    doc1 = fitz.open("pdf", pdf1)
+    doc2 = fitz.open("pdf", pdf2)
+    try:
+        vocabulary = TextVocabulary()
+        with timer.stage("extraction"):
+            tables1 = [page['text_and_coordinates'] for page in ExtractTextAndCoordinatesService.iter_word_tables(doc1, vocabulary)]
+            tables2 = [page['text_and_coordinates'] for page in ExtractTextAndCoordinatesService.iter_word_tables(doc2, vocabulary)]
+
+        differences = {}
+        for page_num, (table1, table2) in enumerate(zip(tables1, tables2)):
+            with timer.stage("matching"):
+                unchanged = PageFingerprintService.is_unchanged(table1, table2)
+                if not unchanged:
+                    missing_values, extra_values = FindMissingOrExraValuesService.find_missing_or_extra_values(
+                        table1, table2, tolerance
+                    )
+            if unchanged:
+                differences[page_num] = None
+                continue
+            with timer.stage("filtering"):
+                differences[page_num] = FindMissingOrExraValuesService.compare_and_ignore_matching_text(
+                    missing_values, extra_values
+                )
+
+        with timer.stage("highlighting"):
+            for page_num, page_difference in differences.items():
+                if page_difference is None:
+                    continue
+                missing_values, extra_values = page_difference
+                page1 = doc1.load_page(page_num)
+                if missing_values:
+                    FindMissingOrExraValuesService.highlight_missing_values(page1, missing_values, color=(1, 1, 1), mode=mode)
+                if extra_values:
+                    FindMissingOrExraValuesService.highlight_extra_values(page1, extra_values, color=(1, 1, 0), mode=mode)
+
+        summary_data = {
+            page_num: {
+                'missing': len(page_difference[0]) if page_difference else 0,
+                'extra': len(page_difference[1]) if page_difference else 0,
+                'unchanged': page_difference is None,
+            }
+            for page_num, page_difference in differences.items()
+        }
+        with timer.stage("summary"):
+            FindMissingOrExraValuesService.append_summary_table(doc1, summary_data)
+        with timer.stage("watermark"):
+            PDFService.stamp_watermark(doc1)
+        with timer.stage("save"):
+            output = PDFService.save_to_bytes(doc1)
+    finally:
+        doc1.close()
+        doc2.close()
+
+    counts = {
+        "words": sum(len(table) for table in tables1) + sum(len(table) for table in tables2),
+        "missing": sum(counts['missing'] for counts in summary_data.values()),
+        "extra": sum(counts['extra'] for counts in summary_data.values()),
+        "output_bytes": len(output),
+    }
+    return timer.seconds, counts
+
+
+def run_scenario(spec, repeat, tolerance):
+    pdf1, pdf2 = revision_pair(spec)
+    runs = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        # The services print per-page notes; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds, counts = run_pipeline(pdf1, pdf2, tolerance)
+        for stage in STAGES:
+            runs[stage].append(round(seconds[stage], 6))
+
+    stages = {stage: round(statistics.median(values), 6) for stage, values in runs.items()}
+    return {
+        "spec": spec.to_json(),
+        **counts,
+        "stages": stages,
+        "total": round(sum(stages.values()), 6),
+        "runs": runs,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Rows ``(scenario, stage, baseline seconds, seconds, ratio, regressed)`` for stages present in both."""
+    rows = []
+    for name, scenario in results["scenarios"].items():
+        reference = baseline["scenarios"].get(name)
+        if reference is None:
+            continue
+        for stage in (*STAGES, "total"):
+            before = reference["stages"].get(stage) if stage != "total" else reference["total"]
+            after = scenario["stages"].get(stage) if stage != "total" else scenario["total"]
+            if before is None or after is None:
+                continue
+            ratio = after / before if before else float("inf") if after else 1.0
+            # Tiny stages are all noise; a regression must cost real time as well as a real share
+            regressed = ratio > 1 + threshold and after - before > min_delta
+            rows.append((name, stage, before, after, ratio, regressed))
+    return rows
+
+
+def print_results(results):
+    print(f"{'scenario':<24} {'words':>7} " + " ".join(f"{stage[:10]:>10}" for stage in STAGES) + f" {'total':>8}")
+    for name, scenario in results["scenarios"].items():
+        stages = " ".join(f"{scenario['stages'][stage] * 1000:10.1f}" for stage in STAGES)
+        print(f"{name:<24} {scenario['words']:7d} {stages} {scenario['total'] * 1000:8.1f}")
+    print("(milliseconds, median of each stage)")
+
+
+def print_comparison(rows, results, baseline):
+    for key in ("pymupdf", "cpus", "python"):
+        if results["environment"].get(key) != baseline["environment"].get(key):
+            print(f"warning: baseline {key} {baseline['environment'].get(key)} != {results['environment'].get(key)}")
+    missing = sorted(set(results["scenarios"]) - set(baseline["scenarios"]))
+    if missing:
+        print(f"warning: no baseline for {', '.join(missing)}")
+
+    print(f"{'scenario':<24} {'stage':<13} {'baseline ms':>12} {'now ms':>9} {'change':>8}")
+    for name, stage, before, after, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<24} {stage:<13} {before * 1000:12.1f} {after * 1000:9.1f} {(ratio - 1) * 100:+7.0f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(PAGE_SIZES), default=["A4", "A2", "A0"])
+    parser.add_argument("--densities", type=int, nargs="+", default=[100], help="labels per A4-sized area")
+    parser.add_argument("--sheets", type=int, nargs="+", default=[4])
+    parser.add_argument("--diff-rates", type=float, nargs="+", default=[0.05])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=5)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--results", help="compare these stored results instead of running the suite")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown per stage (0.2 = 20%%)")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="ignore slowdowns under this many seconds")
+    args = parser.parse_args()
+    fitz.set_messages(stream=open(os.devnull, "w"))  # PyMuPDF warns on every highlight
+
+    if args.results:
+        with open(args.results) as handle:
+            results = json.load(handle)
+    else:
+        results = {
+            "format": RESULTS_FORMAT,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "environment": environment(),
+            "settings": {"repeat": args.repeat, "tolerance": args.tolerance, "highlight_mode": Config.COMPARE_HIGHLIGHT_MODE},
+            "scenarios": {},
+        }
+        for size, density, sheets, diff_rate in itertools.product(args.sizes, args.densities, args.sheets, args.diff_rates):
+            spec = DrawingSpec(size, density, sheets, diff_rate, args.seed)
+            results["scenarios"][spec.name] = run_scenario(spec, args.repeat, args.tolerance)
+        print_results(results)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        rows = compare(results, baseline, args.threshold, args.min_delta)
+        print_comparison(rows, results, baseline)
+        regressions = [row for row in rows if row[-1]]
+        if regressions:
+            print(f"{len(regressions)} stage(s) slower than the baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Compare peak memory of the old upload intake against UploadService.
+
+The old path read each spooled upload to check its size, seeked back and read it
+again into a BytesIO for ``fitz.open``. UploadSpool counts and hashes the part
+while werkzeug writes it, and MuPDF opens the spooled file by path.
+
+Usage (from the backend folder):
+    python benchmarks/bench_upload.py --mb 10
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import fitz
+from werkzeug.datastructures import FileStorage
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+
+from services.upload_service import UploadService, UploadSpool  # noqa: E402
+
+
+def sample_pdf(size_mb):
+    """A valid PDF padded with an embedded file to roughly ``size_mb`` megabytes."""
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "CADSTER upload benchmark")
+    doc.embfile_add("padding.bin", os.urandom(size_mb * 1024 * 1024))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def werkzeug_upload(data):
+    """A FileStorage backed by a temp file, the way werkzeug spools large parts."""
+    stream = tempfile.TemporaryFile()
+    stream.write(data)
+    stream.seek(0)
+    return FileStorage(stream=stream, filename="drawing.pdf")
+
+
+def spool_upload(data, max_size):
+    """A FileStorage backed by an UploadSpool, written in chunks like the multipart parser does."""
+    spool = UploadSpool(max_size, in_memory=False)
+    for start in range(0, len(data), 64 * 1024):
+        spool.write(data[start:start + 64 * 1024])
+    spool.seek(0)
+    return FileStorage(stream=spool, filename="drawing.pdf")
+
+
+def legacy_intake(data, max_size):
+    upload = werkzeug_upload(data)
+    if len(upload.read()) > max_size:
+        raise ValueError("too large")
+    upload.seek(0)
+    stream = io.BytesIO(upload.read())
+    return upload, fitz.open("pdf", stream)
+
+
+def streamed_intake(data, max_size):
+    upload = spool_upload(data, max_size)
+    return upload, UploadService.read(upload, max_size).open()
+
+
+def peak_bytes(intake, data, max_size):
+    tracemalloc.start()
+    upload, doc = intake(data, max_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    doc.close()
+    upload.close()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, nargs="+", default=[2, 10])
+    args = parser.parse_args()
+
+    print(f"{'size MB':>8} {'legacy peak MB':>15} {'spooled peak MB':>16}")
+    for size_mb in args.mb:
+        data = sample_pdf(size_mb)
+        max_size = len(data) + 1
+        legacy = peak_bytes(legacy_intake, data, max_size) / 2 ** 20
+        streamed = peak_bytes(streamed_intake, data, max_size) / 2 ** 20
+        print(f"{len(data) / 2 ** 20:8.1f} {legacy:15.1f} {streamed:16.1f}")
+
+
+if __name__ == "__main__":
+    main()
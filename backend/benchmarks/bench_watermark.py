@@ -0,0 +1,60 @@
+"""Time stamping the report watermark: per-page drawing vs shared Form XObjects.
+
+Usage (from the backend folder):
+    python benchmarks/bench_watermark.py --pages 10 100 500
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+
+from services.pdf_service import PDFService  # noqa: E402
+from reference import stamp_watermark_per_page  # noqa: E402
+
+
+def drawing_set(page_count, width=3370, height=2384):
+    """PDF bytes of ``page_count`` A0 sheets with a little text each."""
+    doc = fitz.open()
+    for index in range(page_count):
+        page = doc.new_page(width=width, height=height)
+        page.insert_text((100, 100), f"Sheet {index + 1}", fontsize=24)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def run(data, stamp):
+    doc = fitz.open("pdf", data)
+    start = time.perf_counter()
+    stamp(doc)
+    stamping = time.perf_counter() - start
+    output = io.BytesIO()
+    doc.save(output)
+    doc.close()
+    return stamping, len(output.getvalue())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    variants = [
+        ("per-page", stamp_watermark_per_page),
+        ("xobject", PDFService.stamp_watermark),
+    ]
+    print(f"{'pages':>6} {'variant':>9} {'stamp ms':>9} {'ms/page':>8} {'output KB':>10}")
+    for page_count in args.pages:
+        data = drawing_set(page_count)
+        for name, stamp in variants:
+            stamping, size = run(data, stamp)
+            print(f"{page_count:6d} {name:>9} {stamping * 1000:9.1f} {stamping * 1000 / page_count:8.2f} {size / 1024:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
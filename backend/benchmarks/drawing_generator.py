@@ -0,0 +1,183 @@
+"""Synthetic engineering drawings and their revisions, for the benchmarks.
+
+A sheet has a border, a reference grid, some vector geometry, dimension and tag
+labels scattered over the drawing area, a notes block and a title block in the
+lower right corner. A revision of a set renames, moves, deletes and adds a
+share of the labels (the diff rate) and leaves everything else in place.
+
+Usage (from the backend folder), writing a pair to compare by hand:
+    python benchmarks/drawing_generator.py --size A1 --density 150 --sheets 5 --diff-rate 0.05 --output /tmp/pair
+"""
+import argparse
+import os
+import random
+
+import fitz
+
+# ISO 216 landscape sheet sizes in points
+PAGE_SIZES = {
+    "A4": (842, 595),
+    "A3": (1191, 842),
+    "A2": (1684, 1191),
+    "A1": (2384, 1684),
+    "A0": (3370, 2384),
+}
+
+TAG_PREFIXES = ["P", "V", "FT", "PT", "TT", "HV", "LS", "E", "C", "B"]
+NOTE_WORDS = ["ALL", "DIMENSIONS", "IN", "MM", "UNLESS", "OTHERWISE", "STATED", "REFER", "TO", "DETAIL",
+              "SECTION", "GRID", "LEVEL", "FINISH", "GALVANISED", "STEEL", "CONCRETE", "GRADE", "TYP"]
+
+
+class DrawingSpec:
+    """Parameters of one synthetic drawing set.
+
+    ``density`` is labels per A4-sized area, so the same density gives an A0
+    sheet sixteen times the words of an A4 one. ``diff_rate`` is the share of
+    labels the revision changes.
+    """
+
+    __slots__ = ("size", "density", "sheets", "diff_rate", "seed")
+
+    def __init__(self, size="A1", density=100, sheets=4, diff_rate=0.05, seed=1):
+        if size not in PAGE_SIZES:
+            raise ValueError(f"size must be one of {', '.join(PAGE_SIZES)}")
+        self.size = size
+        self.density = density
+        self.sheets = sheets
+        self.diff_rate = diff_rate
+        self.seed = seed
+
+    @property
+    def name(self):
+        return f"{self.size}-d{self.density}-s{self.sheets}-r{self.diff_rate:g}"
+
+    @property
+    def words_per_sheet(self):
+        width, height = PAGE_SIZES[self.size]
+        return max(1, round(self.density * width * height / (842 * 595)))
+
+    def to_json(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+def label(rng):
+    roll = rng.random()
+    if roll < 0.4:
+        return f"{rng.randint(5, 9999) / 10:g}"
+    if roll < 0.55:
+        return f"Ø{rng.randint(6, 400)}"
+    if roll < 0.85:
+        return f"{rng.choice(TAG_PREFIXES)}-{rng.randint(100, 999)}"
+    return rng.choice(NOTE_WORDS)
+
+
+def sheet_labels(spec, number):
+    """``[(x, y, text)]`` of the labels on one sheet of the original set."""
+    rng = random.Random(spec.seed * 100003 + number)
+    width, height = PAGE_SIZES[spec.size]
+    margin = 20
+    labels = []
+    for _ in range(spec.words_per_sheet):
+        x = rng.uniform(margin + 5, width * 0.95 - 60)
+        y = rng.uniform(margin + 12, height * 0.85)
+        labels.append((round(x, 1), round(y, 1), label(rng)))
+    return labels
+
+
+def revise_labels(labels, diff_rate, seed):
+    """Rename, move and delete a share of the labels and add as many new ones; the rest stay put."""
+    rng = random.Random(seed)
+    revised = []
+    share = diff_rate / 4
+    for x, y, text in labels:
+        roll = rng.random()
+        if roll < share:
+            text = label(rng)
+        elif roll < 2 * share:
+            x, y = x + rng.choice([-1, 1]) * rng.uniform(15, 40), y + rng.uniform(-10, 10)
+        elif roll < 3 * share:
+            continue
+        revised.append((x, y, text))
+
+    xs = [x for x, _, _ in labels] or [100]
+    ys = [y for _, y, _ in labels] or [100]
+    for _ in range(round(len(labels) * share)):
+        revised.append((round(rng.uniform(min(xs), max(xs)), 1), round(rng.uniform(min(ys), max(ys)), 1), label(rng)))
+    return revised
+
+
+def draw_sheet(doc, spec, number, labels, revision):
+    width, height = PAGE_SIZES[spec.size]
+    page = doc.new_page(width=width, height=height)
+    rng = random.Random(spec.seed * 7919 + number)
+    shape = page.new_shape()
+
+    # Border, reference grid and some geometry
+    shape.draw_rect(fitz.Rect(20, 20, width - 20, height - 20))
+    for x in range(120, int(width) - 20, 200):
+        shape.draw_line((x, 20), (x, height - 20))
+    for y in range(120, int(height) - 20, 200):
+        shape.draw_line((20, y), (width - 20, y))
+    shape.finish(color=(0.7, 0.7, 0.7), width=0.3)
+    for _ in range(int(width * height / 20000)):
+        x, y = rng.uniform(40, width - 80), rng.uniform(40, height - 80)
+        shape.draw_rect(fitz.Rect(x, y, x + rng.uniform(10, 60), y + rng.uniform(10, 60)))
+    shape.finish(color=(0, 0, 0), width=0.5)
+
+    for x, y, text in labels:
+        shape.insert_text((x, y), text, fontsize=6)
+
+    # Title block
+    block = fitz.Rect(width - 300, height - 110, width - 20, height - 20)
+    shape.draw_rect(block)
+    shape.finish(color=(0, 0, 0), width=1)
+    title = [
+        "PROJECT SYNTHETIC PLANT",
+        f"DRAWING {spec.size}-{number + 1:03d}",
+        f"SHEET {number + 1} OF {spec.sheets}",
+        f"REV {chr(ord('A') + revision)}",
+        "SCALE 1:50",
+    ]
+    shape.insert_text((block.x0 + 8, block.y0 + 16), title, fontsize=8, lineheight=1.6)
+    shape.commit()
+
+
+def drawing_set(spec, revision=False):
+    """PDF bytes of the original set, or of its revision with ``revision=True``."""
+    doc = fitz.open()
+    for number in range(spec.sheets):
+        labels = sheet_labels(spec, number)
+        if revision:
+            labels = revise_labels(labels, spec.diff_rate, spec.seed * 31 + number)
+        draw_sheet(doc, spec, number, labels, int(revision))
+    try:
+        return doc.tobytes(garbage=1, deflate=True)
+    finally:
+        doc.close()
+
+
+def revision_pair(spec):
+    """``(original, revision)`` PDF bytes of one drawing set."""
+    return drawing_set(spec), drawing_set(spec, revision=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic drawing set and its revision as two PDFs")
+    parser.add_argument("--size", choices=list(PAGE_SIZES), default="A1")
+    parser.add_argument("--density", type=int, default=100, help="labels per A4-sized area")
+    parser.add_argument("--sheets", type=int, default=4)
+    parser.add_argument("--diff-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=".", help="directory for original.pdf and revision.pdf")
+    args = parser.parse_args()
+
+    spec = DrawingSpec(args.size, args.density, args.sheets, args.diff_rate, args.seed)
+    os.makedirs(args.output, exist_ok=True)
+    for name, data in zip(("original.pdf", "revision.pdf"), revision_pair(spec)):
+        with open(os.path.join(args.output, name), "wb") as handle:
+            handle.write(data)
+    print(f"{spec.name}: {spec.words_per_sheet} labels per sheet written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Previous implementations of optimized service code, kept as benchmark baselines.
+
+Each function is the version a service method replaced; the benchmarks time
+the two side by side and the tests check they still agree.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
+
+from services.findMissingOrExtraValues_service import FindMissingOrExraValuesService  # noqa: E402
+from services.pdf_service import PDFService  # noqa: E402
+
+
+def find_missing_or_extra_values_bruteforce(page1_data, page2_data, tolerance=5):
+    """O(n*m) scan that FindMissingOrExraValuesService.find_missing_or_extra_values replaced."""
+    missing_in_pdf1 = []
+    extra_in_pdf2 = []
+
+    for item1 in page1_data:
+        found_match = False
+        for item2 in page2_data:
+            if item1['text'] == item2['text'] and FindMissingOrExraValuesService.is_same_location(item1['bbox'], item2['bbox'], tolerance):
+                found_match = True
+                break
+        if not found_match:
+            missing_in_pdf1.append(item1)
+
+    for item2 in page2_data:
+        found_match = False
+        for item1 in page1_data:
+            if item2['text'] == item1['text'] and FindMissingOrExraValuesService.is_same_location(item2['bbox'], item1['bbox'], tolerance):
+                found_match = True
+                break
+        if not found_match:
+            extra_in_pdf2.append(item2)
+
+    return missing_in_pdf1, extra_in_pdf2
+
+
+def insert_extra_per_word(page, items, color=(0, 0, 1)):
+    """One insert_text call per word, as before FindMissingOrExraValuesService.insert_extra."""
+    for item in items:
+        rect = item['bbox']
+        height = rect.height
+        fontsize = max(int(height * 0.7), 4)
+        page.insert_text(rect.tl, item['text'], fontsize=fontsize, fontname="Helvetica-Bold", color=color)
+
+
+def stamp_watermark_per_page(doc, watermark_text="CADSTER"):
+    """The watermark drawn onto every page, as before PDFService.stamp_watermark."""
+    for page in doc:
+        PDFService.stamp_watermark_page(page, watermark_text)
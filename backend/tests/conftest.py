@@ -0,0 +1,47 @@
+"""Shared fixtures: the app's import layout, throw-away cache/job directories and small drawing PDFs."""
+import os
+import sys
+import tempfile
+
+import fitz
+import pytest
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# The app imports its packages top-level (``from services import ...``), as when run from app/
+sys.path.insert(0, os.path.join(BACKEND_DIR, "app"))
+sys.path.insert(0, BACKEND_DIR)
+
+# Config is read once at import; keep the caches, the job queue and the log files out of the shared dirs
+_STATE_DIR = tempfile.mkdtemp(prefix="cadstera-tests-")
+os.environ.setdefault("EXTRACTION_CACHE_DIR", os.path.join(_STATE_DIR, "extraction-cache"))
+os.environ.setdefault("COMPARE_JOBS_DIR", os.path.join(_STATE_DIR, "jobs"))
+os.environ.setdefault("LOG_DIR", os.path.join(_STATE_DIR, "logs"))
+
+
+def make_pdf(pages, size=(842, 595)):
+    """PDF bytes with one page per entry of ``pages``, each a list of ``(x, y, text)`` labels."""
+    doc = fitz.open()
+    for labels in pages:
+        page = doc.new_page(width=size[0], height=size[1])
+        for x, y, text in labels:
+            page.insert_text((x, y), text, fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def sheet(tag, count=12):
+    """Labels of one sheet, distinct per ``tag`` so sheets can be told apart."""
+    return [(40 + 60 * (index % 10), 60 + 40 * (index // 10), f"{tag}-{index}") for index in range(count)]
+
+
+@pytest.fixture(scope="session")
+def app():
+    import main
+    main.app.config["TESTING"] = True
+    return main.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
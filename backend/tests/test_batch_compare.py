@@ -0,0 +1,109 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from conftest import make_pdf, sheet
+from core.config import Config
+from services.batchCompare_service import BatchCompareService, BatchPair, compare_pair
+from services.parallelCompare_service import ParallelCompareService
+from test_parallel_compare import BrokenExecutor
+
+
+def test_manifest_form_field_runs_through_the_app(client):
+    old = make_pdf([sheet("A")])
+    new = make_pdf([sheet("A")[:-1] + [(500, 300, "ADDED")]])
+    manifest = json.dumps([{"file1": "old", "file2": "new", "name": "sheet"}])
+
+    response = client.post("/api/compare/batch", data={
+        "manifest": manifest,
+        "old": (io.BytesIO(old), "old.pdf"),
+        "new": (io.BytesIO(new), "new.pdf"),
+    }, content_type="multipart/form-data")
+
+    assert response.status_code == 200, response.get_data(as_text=True)
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        index = json.loads(archive.read("index.json"))
+        assert index["done"] == 1 and index["failed"] == 0
+        assert index["pairs"][0]["name"] == "sheet"
+        assert any(name.startswith("sheet/") for name in archive.namelist())
+
+
+def test_manifest_form_field_strings_are_still_sanitized(client):
+    manifest = json.dumps([{"file1": "a'; drop", "file2": "b"}])
+    response = client.post("/api/compare/batch", data={"manifest": manifest}, content_type="multipart/form-data")
+    assert response.status_code == 400
+    assert "Invalid characters" in response.get_json()["error"]
+
+
+def test_member_without_a_usable_name_gets_a_generated_one(tmp_path):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("..", make_pdf([sheet("A")]))
+    with zipfile.ZipFile(buffer) as archive:
+        path = BatchCompareService.extract_member(archive, archive.getinfo(".."), str(tmp_path / "1"))
+    assert path == str(tmp_path / "1" / "input.pdf")
+    assert BatchCompareService.pair_name("../") == "pair"
+
+
+def test_compare_pair_diffs_inline_without_touching_config(tmp_path):
+    workers = Config.COMPARE_WORKERS
+    for name in ("1.pdf", "2.pdf"):
+        (tmp_path / name).write_bytes(make_pdf([sheet("A"), sheet("B")]))
+
+    result = compare_pair("pair", str(tmp_path / "1.pdf"), str(tmp_path / "2.pdf"), 5, ["layers"], str(tmp_path / "out"))
+
+    assert Config.COMPARE_WORKERS == workers
+    assert result["files"]["layers"].startswith(str(tmp_path / "out"))
+    assert not ParallelCompareService.should_parallelize(100, workers=1)
+
+
+def test_batches_have_their_own_pool():
+    assert BatchCompareService.executor() is BatchCompareService.executor()
+    assert BatchCompareService.executor() is not ParallelCompareService.executor()
+
+
+def batch_index(tmp_path, pairs=3):
+    directory = tmp_path / "batch"
+    batch = []
+    for index in range(pairs):
+        paths = []
+        for side, pages in enumerate(([sheet("A")], [sheet("A")[:-1] + [(500, 300, f"NEW{index}")]])):
+            path = directory / "inputs" / str(index) / f"{side + 1}.pdf"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(make_pdf(pages))
+            paths.append(str(path))
+        batch.append(BatchPair(f"pair{index}", paths[0], paths[1], "old.pdf", "new.pdf"))
+
+    data = b"".join(BatchCompareService.stream(batch, str(directory), ["layers"]))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return json.loads(archive.read("index.json"))
+
+
+@pytest.mark.parametrize("executor", [BrokenExecutor(healthy=1), BrokenExecutor(refuse_submit=True)])
+def test_broken_batch_pool_is_replaced_and_the_pairs_compared_inline(tmp_path, monkeypatch, executor):
+    monkeypatch.setattr(BatchCompareService, "_executor", executor)
+
+    index = batch_index(tmp_path)
+
+    assert index["done"] == 3 and index["failed"] == 0
+    assert executor.shut_down
+    assert BatchCompareService._executor is None
+
+
+def test_failed_pair_is_recorded_in_the_index(tmp_path, monkeypatch):
+    class FailingExecutor(BrokenExecutor):
+        def submit(self, fn, *args):
+            future = super().submit(fn, *args)
+            if args[0] == "pair1":
+                future = type(future)()
+                future.set_exception(ValueError("bad drawing"))
+            return future
+
+    monkeypatch.setattr(BatchCompareService, "_executor", FailingExecutor(healthy=3))
+
+    index = batch_index(tmp_path)
+
+    assert index["done"] == 2 and index["failed"] == 1
+    assert [entry["error"] for entry in index["pairs"] if entry["status"] == "failed"] == ["bad drawing"]
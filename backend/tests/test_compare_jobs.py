@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from conftest import make_pdf, sheet
+from services.compareJob_service import CompareJobRunner, CompareJobStore
+from services.pdf_service import PDFService
+from services.upload_service import PDFUpload
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CompareJobStore(str(tmp_path / "jobs"), lease_seconds=0, max_attempts=3)
+
+
+def submit(store):
+    old = make_pdf([sheet("A")])
+    new = make_pdf([sheet("A")[:-1] + [(500, 300, "NEW")]])
+    return store.submit(PDFUpload("old.pdf", data=old), PDFUpload("new.pdf", data=new))
+
+
+def test_expired_lease_is_requeued_and_claimed_as_a_new_attempt(store):
+    job_id = submit(store)
+    first = store.claim()
+    assert first["id"] == job_id and first["attempts"] == 1
+
+    store.requeue_stale()
+    assert store.get(job_id)["status"] == store.QUEUED
+
+    second = store.claim()
+    assert second["attempts"] == 2
+    assert store.get(job_id)["status"] == store.RUNNING
+
+
+def test_only_the_attempt_holding_the_job_completes_it(store):
+    job_id = submit(store)
+    first = store.claim()
+    store.requeue_stale()
+    second = store.claim()
+    result = PDFService.run_comparison(
+        PDFUpload("old.pdf", path=store.input_path(job_id, 1)),
+        PDFUpload("new.pdf", path=store.input_path(job_id, 2)),
+    )
+
+    assert store.complete(second, result)
+    assert not store.complete(first, result)
+    assert not store.fail(first, "late failure")
+
+    job = store.get(job_id)
+    assert job["status"] == store.DONE and job["attempts"] == 2
+    assert os.path.exists(store.artifact_path(job, "layers"))
+    assert not os.path.exists(store.attempt_dir(job_id, 1))
+
+
+def test_failure_with_braces_in_the_message_is_recorded(store, monkeypatch):
+    job_id = submit(store)
+
+    def broken(*args, **kwargs):
+        raise ValueError("no page {page} in {'a': 1}")
+
+    monkeypatch.setattr(PDFService, "run_comparison", staticmethod(broken))
+    CompareJobRunner(store).run(store.claim())
+
+    job = store.get(job_id)
+    assert job["status"] == store.FAILED
+    assert job["error"] == "no page {page} in {'a': 1}"
+
+
+def test_runner_completes_a_job(store):
+    job_id = submit(store)
+    CompareJobRunner(store).run(store.claim())
+
+    job = store.get(job_id)
+    assert job["status"] == store.DONE and job["progress"] == 1
+    assert store.to_json(job)["summary_data"]
+
+
+def test_job_and_synchronous_comparison_share_the_comparison_id(store):
+    job_id = submit(store)
+    CompareJobRunner(store).run(store.claim())
+    job = store.get(job_id)
+
+    synchronous, status = PDFService.cached_comparison(
+        PDFUpload("old.pdf", path=store.input_path(job_id, 1)),
+        PDFUpload("new.pdf", path=store.input_path(job_id, 2)),
+        tolerance=5,
+    )
+    assert status == 200
+    assert job["comparison_id"] == synchronous.comparison_id
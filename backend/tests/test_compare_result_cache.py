@@ -0,0 +1,61 @@
+import time
+
+from conftest import make_pdf, sheet
+from services.compareResult_service import ComparisonResult, ComparisonResultCache, comparison_cache
+from services.pdf_service import PDFService
+
+
+def result(comparison_id, retained_bytes=0):
+    return ComparisonResult(comparison_id, {}, lambda artifact: artifact.encode() * 10, retained_bytes=retained_bytes)
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = ComparisonResultCache(max_entries=2, ttl_seconds=0)
+    cache.put(result("a"))
+    cache.put(result("b"))
+    assert cache.get("a") is not None
+    cache.put(result("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_rendered_artifacts_count_against_the_byte_cap():
+    cache = ComparisonResultCache(max_entries=10, ttl_seconds=0, max_bytes=100)
+    first = result("a", retained_bytes=40)
+    cache.put(first)
+    cache.put(result("b", retained_bytes=40))
+
+    first.artifact("layers")  # 60 more bytes
+    cache.put(first)
+
+    assert cache.get("b") is None and cache.get("a") is first
+
+
+def test_expired_entry_is_a_miss():
+    cache = ComparisonResultCache(ttl_seconds=60)
+    stale = result("a")
+    stale.created_at = time.time() - 120
+    cache.put(stale)
+    assert cache.get("a") is None
+    assert cache.misses == 1
+
+
+def test_same_inputs_reuse_one_comparison(app):
+    comparison_cache.clear()
+    old = make_pdf([sheet("A"), sheet("B")])
+    new = make_pdf([sheet("A"), sheet("B")[:-1]])
+
+    first, status = PDFService.cached_comparison(old, new)
+    second, _ = PDFService.cached_comparison(old, new)
+
+    assert status == 200 and second is first
+    assert first.summary_data == PDFService.run_comparison(old, new).summary_data
+    assert first.artifacts == {}  # nothing rendered until downloaded
+
+
+def test_failure_becomes_a_json_error(app):
+    with app.app_context():
+        response, status = PDFService.cached_comparison(b"not a pdf", make_pdf([sheet("A")]))
+    assert status == 500
+    assert response.get_json()["error"].startswith("Failed to compare PDF files")
@@ -0,0 +1,88 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from services.extractionCache_service import ExtractionCache
+from services.wordTable_service import PageWordTable, TextVocabulary
+
+
+def pages(vocabulary, words_per_page):
+    content = []
+    for page_num, words in enumerate(words_per_page):
+        bboxes = np.array([[10 * index, 20, 10 * index + 8, 28] for index in range(len(words))], dtype=np.float32)
+        table = PageWordTable(page_num, vocabulary.intern_many(words), bboxes.reshape(-1, 4), vocabulary)
+        content.append({'page': page_num, 'text_and_coordinates': table})
+    return content
+
+
+def rows(pages_content):
+    return [
+        [(item['text'], tuple(item['bbox'])) for item in page['text_and_coordinates']]
+        for page in pages_content
+    ]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExtractionCache(str(tmp_path), max_bytes=1024 * 1024)
+
+
+def test_round_trip_into_a_vocabulary_that_already_has_words(cache):
+    stored = pages(TextVocabulary(), [["M10", "R5", "M10"], [], ["Ø12", "45°"]])
+    cache.store("doc", stored)
+
+    vocabulary = TextVocabulary()
+    vocabulary.intern_many(["45°", "other"])
+    loaded = cache.load("doc", vocabulary)
+
+    assert rows(loaded) == rows(stored)
+    assert all(page['text_and_coordinates'].vocabulary is vocabulary for page in loaded)
+    assert cache.stats()["hits"] == 1
+
+
+def test_miss_and_unreadable_entry(cache):
+    assert cache.load("absent", TextVocabulary()) is None
+    with open(cache.path("broken"), "wb") as handle:
+        handle.write(b"not an entry" * 10)
+    assert cache.load("broken", TextVocabulary()) is None
+    assert not os.path.exists(cache.path("broken"))
+    assert cache.stats()["misses"] == 2
+
+
+def test_entry_evicted_while_loading_is_still_a_hit(cache, monkeypatch):
+    cache.store("doc", pages(TextVocabulary(), [["A", "B"]]))
+
+    def evicted(path, *args):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "utime", evicted)
+    assert rows(cache.load("doc", TextVocabulary())) == [[("A", (0.0, 20.0, 8.0, 28.0)), ("B", (10.0, 20.0, 18.0, 28.0))]]
+
+
+def test_eviction_drops_least_recently_used_entries(cache):
+    content = pages(TextVocabulary(), [["WORD"] * 200])
+    for index, digest in enumerate(("old", "used", "new")):
+        cache.store(digest, content)
+        os.utime(cache.path(digest), (1000 + index, 1000 + index))
+    cache.load("old", TextVocabulary())  # touched: now the most recent
+
+    cache.max_bytes = 2 * os.path.getsize(cache.path("new"))
+    cache.evict()
+
+    assert [digest for digest in ("old", "used", "new") if cache.contains(digest)] == ["old", "new"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_removes_stale_temp_files_only(cache, tmp_path):
+    stale, fresh = tmp_path / "stale.tmp", tmp_path / "fresh.tmp"
+    stale.write_bytes(b"x" * 100)
+    fresh.write_bytes(b"x" * 100)
+    old = time.time() - cache.STALE_TEMP_SECONDS - 60
+    os.utime(stale, (old, old))
+
+    cache.evict()
+
+    assert not stale.exists()
+    assert fresh.exists()
@@ -0,0 +1,53 @@
+"""Per-page fingerprints and the unchanged sheets they let a comparison skip."""
+import io
+
+from conftest import make_pdf, sheet
+from services import PageWordTable, TextVocabulary
+from services.compareSession_service import CompareSession
+from services.pageFingerprint_service import PageFingerprintService
+
+
+def table(labels, vocabulary):
+    return PageWordTable.from_words(0, [(x, y - 8, x + 40, y, text) for x, y, text in labels], vocabulary)
+
+
+def test_word_fingerprint_ignores_word_order_but_not_position_or_text():
+    vocabulary = TextVocabulary()
+    labels = sheet("A")
+    original = table(labels, vocabulary)
+
+    assert PageFingerprintService.is_unchanged(original, table(labels[::-1], vocabulary))
+    moved = [(x + 1, y, text) for x, y, text in labels[:1]] + labels[1:]
+    assert not PageFingerprintService.is_unchanged(original, table(moved, vocabulary))
+    renamed = [(x, y, text + "X") for x, y, text in labels[:1]] + labels[1:]
+    assert not PageFingerprintService.is_unchanged(original, table(renamed, vocabulary))
+    assert not PageFingerprintService.is_unchanged(original, table(labels[1:], vocabulary))
+
+
+def test_fingerprints_endpoint_reports_changed_pages(client):
+    old = make_pdf([sheet("A"), sheet("B"), sheet("C")])
+    new = make_pdf([sheet("A"), sheet("B")[:-1], sheet("C"), sheet("D")])
+
+    for mode in PageFingerprintService.MODES:
+        response = client.post(f"/api/compare/fingerprints?mode={mode}", data={
+            "file1": (io.BytesIO(old), "old.pdf"),
+            "file2": (io.BytesIO(new), "new.pdf"),
+        }, content_type="multipart/form-data")
+        assert response.status_code == 200, response.get_data(as_text=True)
+        body = response.get_json()
+        assert body["mode"] == mode
+        assert body["page_count"] == {"pdf1": 3, "pdf2": 4}
+        assert body["changed_pages"] == [1, 3]
+
+
+def test_unchanged_sheets_are_not_diffed():
+    old = make_pdf([sheet("A"), sheet("B")])
+    new = make_pdf([sheet("A"), sheet("B")[:-1] + [(500, 300, "ADDED")]])
+
+    with CompareSession(old, new, workers=1) as session:
+        differences = session.differences()
+
+    assert differences[0] is None
+    missing, extra = differences[1]
+    assert [item["text"] for item in missing] == ["B-11"]
+    assert [item["text"] for item in extra] == ["ADDED"]
@@ -0,0 +1,56 @@
+"""The layered artifact: one optional content group per difference kind, each drawing bound to its group."""
+import re
+
+import fitz
+import pytest
+
+from conftest import make_pdf, sheet
+from core.config import Config
+from services.compareSession_service import CompareSession
+from services.pdf_service import PDFService
+
+
+def layered(monkeypatch, mode):
+    monkeypatch.setattr(Config, "COMPARE_HIGHLIGHT_MODE", mode)
+    old = make_pdf([sheet("A"), sheet("B")])
+    new = make_pdf([sheet("A"), sheet("B")[:-1] + [(500, 300, "ADDED")]])
+    with CompareSession(old, new, workers=1) as session:
+        return fitz.open("pdf", PDFService.render_layers(session))
+
+
+def marked_content_groups(doc, page):
+    """OCG xrefs the page's content stream opens with ``/OC /<name> BDC``."""
+    contents = b"".join(doc.xref_stream(xref) for xref in page.get_contents()).decode("latin-1")
+    kind, resources = doc.xref_get_key(page.xref, "Resources")
+    xref, path = (int(resources.split()[0]), "") if kind == "xref" else (page.xref, "Resources/")
+    groups = []
+    for name in re.findall(r"/OC\s*/(\w+)\s*BDC", contents):
+        kind, value = doc.xref_get_key(xref, f"{path}Properties/{name}")
+        groups.append(int(value.split()[0]))
+    return groups
+
+
+@pytest.mark.parametrize("mode", ["word", "line"])
+def test_each_annotation_and_insert_is_bound_to_its_layer(monkeypatch, mode):
+    doc = layered(monkeypatch, mode)
+
+    layers = {ocg["name"]: xref for xref, ocg in doc.get_ocgs().items()}
+    assert {ocg["name"]: ocg["on"] for ocg in doc.get_ocgs().values()} == PDFService.LAYERS
+    assert not list(doc[0].annots()) and marked_content_groups(doc, doc[0]) == []
+
+    page = doc[1]
+    bound = [doc.xref_get_key(annot.xref, "OC") for annot in page.annots()]
+    assert sorted(bound) == sorted([
+        ("xref", f"{layers['Missing values']} 0 R"),
+        ("xref", f"{layers['Extra values']} 0 R"),
+    ])
+    assert marked_content_groups(doc, page) == [layers["Extra text"]]
+
+
+def test_flattened_highlights_are_bound_to_their_layers(monkeypatch):
+    doc = layered(monkeypatch, "flatten")
+
+    layers = {ocg["name"]: xref for xref, ocg in doc.get_ocgs().items()}
+    page = doc[1]
+    assert not list(page.annots())
+    assert sorted(marked_content_groups(doc, page)) == sorted(layers.values())
@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from utils.logger import QueuedLogWriter
+
+
+def message(text, when=None, **extra):
+    """Stand-in for the loguru message handed to a sink (only ``.record`` is read)."""
+    return SimpleNamespace(record={
+        "time": when or datetime.now(timezone.utc),
+        "level": SimpleNamespace(name="INFO"),
+        "message": text,
+        "name": "tests",
+        "extra": extra,
+        "exception": None,
+    })
+
+
+def drain(writer):
+    writer.queue.join()
+    writer.file.flush()
+
+
+def test_threads_append_whole_lines_to_the_process_file(tmp_path):
+    writer = QueuedLogWriter(str(tmp_path))
+
+    def work(index):
+        for number in range(200):
+            writer.write(message(f"record {number}", thread=index))
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    drain(writer)
+    writer.stop()
+
+    assert os.path.basename(writer.path).endswith(f".{os.getpid()}.log")
+    with open(writer.path, encoding="utf-8") as handle:
+        lines = [json.loads(line) for line in handle]
+    assert len(lines) == 800
+
+
+def test_day_change_zips_own_and_idle_files_and_drops_old_zips(tmp_path):
+    idle = tmp_path / "app_2020-01-01.12345.log"
+    idle.write_text("{}\n")
+    expired = tmp_path / "app_2019-12-01.12345.log.zip"
+    expired.write_bytes(b"")
+    old = time.time() - 30 * 86400
+    for path in (idle, expired):
+        os.utime(path, (old, old))
+
+    writer = QueuedLogWriter(str(tmp_path))
+    writer.write(message("yesterday", datetime.now(timezone.utc) - timedelta(days=1)))
+    drain(writer)
+    first = writer.path
+    writer.write(message("today"))
+    drain(writer)
+    writer.stop()
+
+    assert not os.path.exists(first) and os.path.exists(first + ".zip")
+    assert not idle.exists() and (tmp_path / "app_2020-01-01.12345.log.zip").exists()
+    assert not expired.exists()
+    assert writer.path != first and os.path.exists(writer.path)
+
+
+def test_dropped_records_are_counted_and_reported(tmp_path):
+    writer = QueuedLogWriter(str(tmp_path), max_queue=1)
+    writer.stop()  # nothing drains the queue from here on
+    writer.queue.put_nowait(message("queued").record)
+    for _ in range(3):
+        writer.write(message("dropped"))
+    assert writer.dropped == 3
+
+    writer.write_record(message("after").record)
+    writer.file.close()
+    with open(writer.path, encoding="utf-8") as handle:
+        first = json.loads(handle.readline())
+    assert first["event"] == "log_dropped" and first["records"] == 3
+    assert writer.dropped == 0
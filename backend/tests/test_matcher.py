@@ -0,0 +1,88 @@
+"""The indexed and columnar word matchers against the nested-loop reference scan."""
+import random
+
+import fitz
+import pytest
+
+from benchmarks.reference import find_missing_or_extra_values_bruteforce
+from services import PageWordTable, TextVocabulary
+from services.findMissingOrExtraValues_service import FindMissingOrExraValuesService
+
+
+def words(seed, count=400, width=842, height=595):
+    """Random labels from a small vocabulary, so the same text shows up many times per sheet."""
+    rnd = random.Random(seed)
+    items = []
+    for _ in range(count):
+        x0, y0 = rnd.uniform(0, width - 40), rnd.uniform(0, height - 10)
+        text = rnd.choice(["M10", "R5", "A", "B", "TOL"]) + str(rnd.randint(0, 5))
+        items.append({"text": text, "bbox": fitz.Rect(x0, y0, x0 + 6 * len(text), y0 + 8)})
+    return items
+
+
+def revise(items, seed):
+    """Rename, move by about the tolerance, or jitter each word."""
+    rnd = random.Random(seed)
+    revised = []
+    for item in items:
+        text, bbox = item["text"], fitz.Rect(item["bbox"])
+        roll = rnd.random()
+        if roll < 0.1:
+            text += "X"
+        elif roll < 0.3:
+            bbox = bbox + (rnd.uniform(3, 7), rnd.uniform(-7, 7)) * 2
+        else:
+            bbox = bbox + (rnd.uniform(-1, 1), rnd.uniform(-1, 1)) * 2
+        revised.append({"text": text, "bbox": bbox})
+    return revised
+
+
+def as_table(items, vocabulary):
+    return PageWordTable.from_words(0, [tuple(item["bbox"]) + (item["text"],) for item in items], vocabulary)
+
+
+def keys(items):
+    return [(item["text"], tuple(item["bbox"])) for item in items]
+
+
+@pytest.mark.parametrize("tolerance", [0, 1, 5, 12.5])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_indexed_matcher_agrees_with_bruteforce(seed, tolerance):
+    page1 = words(seed)
+    page2 = revise(page1, seed + 100) + words(seed + 200, count=40)
+
+    indexed = FindMissingOrExraValuesService.find_missing_or_extra_values(page1, page2, tolerance)
+    reference = find_missing_or_extra_values_bruteforce(page1, page2, tolerance)
+
+    assert indexed == reference
+
+
+@pytest.mark.parametrize("tolerance", [0, 1, 5, 12.5])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_columnar_matcher_agrees_with_bruteforce(seed, tolerance):
+    vocabulary = TextVocabulary()
+    table1 = as_table(words(seed), vocabulary)
+    table2 = as_table(revise(words(seed), seed + 100) + words(seed + 200, count=40), vocabulary)
+
+    missing, extra = FindMissingOrExraValuesService.find_missing_or_extra_values(table1, table2, tolerance)
+    # The reference runs on the table's own float32 boxes, so both sides see the same coordinates
+    reference_missing, reference_extra = find_missing_or_extra_values_bruteforce(list(table1), list(table2), tolerance)
+
+    assert isinstance(missing, PageWordTable)
+    assert keys(missing) == keys(reference_missing)
+    assert keys(extra) == keys(reference_extra)
+
+
+def test_matchers_on_boundaries_and_empty_pages():
+    page1 = [{"text": "A", "bbox": fitz.Rect(10, 10, 20, 18)}, {"text": "A", "bbox": fitz.Rect(100, 10, 110, 18)}]
+    page2 = [
+        {"text": "A", "bbox": fitz.Rect(15, 10, 25, 18)},  # exactly the tolerance away: not the same location
+        {"text": "A", "bbox": fitz.Rect(104, 10, 114, 18)},
+    ]
+    for left, right in [(page1, page2), (page1, []), ([], page2), ([], [])]:
+        assert (FindMissingOrExraValuesService.find_missing_or_extra_values(left, right, 5)
+                == find_missing_or_extra_values_bruteforce(left, right, 5))
+
+    missing, extra = FindMissingOrExraValuesService.find_missing_or_extra_values(page1, page2, 5)
+    assert keys(missing) == [("A", (10, 10, 20, 18))]
+    assert keys(extra) == [("A", (15, 10, 25, 18))]
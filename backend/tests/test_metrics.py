@@ -0,0 +1,48 @@
+"""Server-Timing headers on comparison responses and the Prometheus /metrics endpoint."""
+import io
+import re
+
+from conftest import make_pdf, sheet
+
+DOCUMENTED_STAGES = {"extract", "diff", "filter", "annotate", "summary", "watermark", "save"}
+
+
+def test_compare_response_carries_server_timing(client):
+    old = make_pdf([sheet("T")])
+    new = make_pdf([sheet("T")[:-1] + [(500, 300, "TIMED")]])
+
+    response = client.post("/api/compare/report", data={
+        "file1": (io.BytesIO(old), "old.pdf"),
+        "file2": (io.BytesIO(new), "new.pdf"),
+    }, content_type="multipart/form-data")
+
+    assert response.status_code == 200
+    entries = dict(re.findall(r"(\w+);dur=([\d.]+)", response.headers["Server-Timing"]))
+    assert {"extract", "diff", "filter", "total"} <= set(entries)
+    assert set(entries) - {"total", "inspect"} <= DOCUMENTED_STAGES
+    assert float(entries["total"]) >= float(entries["diff"])
+
+
+def test_metrics_serves_prometheus_text(client):
+    client.post("/api/compare/report", data={
+        "file1": (io.BytesIO(make_pdf([sheet("M")])), "old.pdf"),
+        "file2": (io.BytesIO(make_pdf([sheet("M")])), "new.pdf"),
+    }, content_type="multipart/form-data")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    for name in ("cadstera_compare_stage_seconds", "cadstera_compare_pages", "cadstera_http_request_seconds"):
+        assert f"# TYPE {name} histogram" in text
+    assert re.search(r'^cadstera_compare_stage_seconds_bucket\{stage="diff",le="\+Inf"\} [1-9]', text, re.M)
+    for counter in ("cadstera_comparison_cache_hits_total", "cadstera_comparison_cache_misses_total",
+                    "cadstera_extraction_cache_hits_total", "cadstera_extraction_cache_misses_total"):
+        assert re.search(rf"^{counter} \d+$", text, re.M)
+
+
+def test_metrics_is_refused_to_other_addresses(client):
+    response = client.get("/metrics", environ_base={"REMOTE_ADDR": "203.0.113.7"})
+    assert response.status_code == 403
+    assert "cadstera_" not in response.get_data(as_text=True)
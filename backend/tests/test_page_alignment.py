@@ -0,0 +1,78 @@
+"""Sheet alignment when a revision inserts, removes or reorders sheets."""
+import numpy as np
+
+from conftest import make_pdf, sheet
+from services import PageWordTable, TextVocabulary
+from services.compareSession_service import CompareSession
+from services.pageAlignment_service import PageAlignment, PageAlignmentService
+
+
+def tables(tags, vocabulary):
+    """One word table per sheet tag, laid out like conftest.sheet."""
+    return [
+        PageWordTable.from_words(page, [(x, y - 8, x + 40, y, text) for x, y, text in sheet(tag, count=40)], vocabulary)
+        for page, tag in enumerate(tags)
+    ]
+
+
+def align(tags1, tags2):
+    vocabulary = TextVocabulary()
+    return PageAlignmentService.align(tables(tags1, vocabulary), tables(tags2, vocabulary))
+
+
+def test_inserted_sheet_is_added_and_the_rest_shift():
+    alignment = align("ABCD", "ABXCD")
+    assert alignment.pairs == {0: 0, 1: 1, 2: 3, 3: 4}
+    assert alignment.added == [2]
+    assert alignment.removed == []
+    assert alignment.moved == [(2, 3), (3, 4)]
+
+
+def test_removed_sheet_is_removed_and_the_rest_shift():
+    alignment = align("ABCD", "ACD")
+    assert alignment.pairs == {0: 0, 2: 1, 3: 2}
+    assert alignment.removed == [1]
+    assert alignment.added == []
+
+
+def test_reordered_sheets_pair_by_content():
+    alignment = align("ABCD", "DCBA")
+    assert alignment.pairs == {0: 3, 1: 2, 2: 1, 3: 0}
+    assert alignment.to_json() == {
+        "removed": [],
+        "added": [],
+        "moved": [{"pdf1": 0, "pdf2": 3}, {"pdf1": 1, "pdf2": 2}, {"pdf1": 2, "pdf2": 1}, {"pdf1": 3, "pdf2": 0}],
+    }
+
+
+def test_sheet_replaced_in_place_is_paired_by_position():
+    alignment = align("ABCD", "AXCD")
+    assert alignment.pairs == {0: 0, 1: 1, 2: 2, 3: 3}
+    assert alignment.added == alignment.removed == []
+
+
+def test_only_the_given_pages_are_aligned():
+    vocabulary = TextVocabulary()
+    alignment = PageAlignmentService.align(tables("ABCD", vocabulary), tables("ABXCD", vocabulary), [2, 3], [2, 3, 4])
+    assert alignment.pairs == {2: 3, 3: 4}
+    assert alignment.added == [2]
+
+
+def test_empty_pages_count_as_the_same_sheet():
+    empty = PageWordTable.empty(0, TextVocabulary())
+    assert PageAlignmentService.similarity(np.unique(empty.text_ids), np.unique(empty.text_ids)) == 1.0
+    assert PageAlignment.positional(3, 2).to_json() == {"removed": [2], "added": [], "moved": []}
+
+
+def test_session_diffs_each_sheet_against_its_aligned_sheet():
+    old = make_pdf([sheet("A", 40), sheet("B", 40), sheet("C", 40)])
+    new = make_pdf([sheet("A", 40), sheet("X", 40), sheet("B", 40), sheet("C", 40)])
+
+    with CompareSession(old, new, workers=1) as session:
+        differences = session.differences()
+        alignment = session.alignment()
+
+    assert alignment.pairs == {0: 0, 1: 2, 2: 3}
+    assert alignment.added == [1]
+    # Shifted but unchanged sheets are not reported as rewritten
+    assert differences == {0: None, 1: None, 2: None}
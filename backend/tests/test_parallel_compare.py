@@ -0,0 +1,93 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from conftest import make_pdf, sheet
+from core.config import Config
+from services.compareSession_service import CompareSession
+from services.parallelCompare_service import ParallelCompareService
+
+
+class BrokenExecutor:
+    """Executor whose pool died: futures after the first ``healthy`` fail, later submits raise."""
+
+    def __init__(self, healthy=0, refuse_submit=False):
+        self.healthy = healthy
+        self.refuse_submit = refuse_submit
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        if self.refuse_submit:
+            raise BrokenProcessPool("pool is broken")
+        future = Future()
+        if self.healthy:
+            self.healthy -= 1
+            future.set_result(fn(*args))
+        else:
+            future.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def documents():
+    old = make_pdf([sheet(tag) for tag in "ABCDEF"])
+    new = make_pdf([sheet(tag) for tag in "ABC"] + [sheet("D")[:-1] + [(500, 400, "NEW")]] + [sheet(tag) for tag in "EF"])
+    return old, new
+
+
+def diff_with(monkeypatch, executor):
+    monkeypatch.setattr(ParallelCompareService, "_executor", executor)
+    monkeypatch.setattr(ParallelCompareService, "worker_count", staticmethod(lambda: 2))
+    old, new = documents()
+    differences = ParallelCompareService.diff_pages(old, new, range(6))
+    return differences
+
+
+def assert_only_page_3_changed(differences):
+    assert sorted(differences) == list(range(6))
+    assert [page for page, difference in differences.items() if difference is not None] == [3]
+    missing, extra = differences[3]
+    assert [extra.text(index) for index in range(len(extra))] == ["NEW"]
+
+
+def test_broken_pool_is_replaced_and_the_rest_diffed_inline(monkeypatch):
+    executor = BrokenExecutor(healthy=1)
+    differences = diff_with(monkeypatch, executor)
+
+    assert_only_page_3_changed(differences)
+    assert executor.shut_down
+    assert ParallelCompareService._executor is None
+
+
+def test_pool_broken_before_submit_is_diffed_inline(monkeypatch):
+    executor = BrokenExecutor(refuse_submit=True)
+    differences = diff_with(monkeypatch, executor)
+
+    assert_only_page_3_changed(differences)
+    assert ParallelCompareService._executor is None
+
+
+def test_pooled_session_aligns_and_caches_from_streamed_pages(monkeypatch):
+    executor = BrokenExecutor(healthy=100)
+    monkeypatch.setattr(ParallelCompareService, "_executor", executor)
+    monkeypatch.setattr(ParallelCompareService, "worker_count", staticmethod(lambda: 2))
+    monkeypatch.setattr(Config, "COMPARE_PARALLEL_MIN_PAGES", 2)
+    old = make_pdf([sheet(f"pool{tag}", 40) for tag in "ABCD"])
+    new = make_pdf([sheet(f"pool{tag}", 40) for tag in "ABXCD"])
+
+    with CompareSession(old, new, workers=2) as session:
+        assert not session.is_extraction_cached()
+        differences = session.differences()
+        alignment = session.alignment()
+        assert session.is_extraction_cached()
+
+    assert executor.healthy < 100  # diffed through the pool
+    assert alignment.pairs == {0: 0, 1: 1, 2: 3, 3: 4}
+    assert alignment.added == [2]
+    assert differences == {0: None, 1: None, 2: None, 3: None}
+
+    # The cached tables give the same comparison without the pool
+    with CompareSession(old, new, workers=1) as session:
+        assert session.differences() == differences
+        assert session.alignment().pairs == alignment.pairs
@@ -0,0 +1,60 @@
+"""/report streamed as NDJSON or server-sent events."""
+import io
+import json
+
+from conftest import make_pdf, sheet
+
+
+def post_report(client, old, new, **kwargs):
+    return client.post("/api/compare/report", data={
+        "file1": (io.BytesIO(old), "old.pdf"),
+        "file2": (io.BytesIO(new), "new.pdf"),
+    }, content_type="multipart/form-data", **kwargs)
+
+
+def test_ndjson_stream_has_a_record_per_page_then_the_summary(client):
+    old = make_pdf([sheet("A"), sheet("B")])
+    new = make_pdf([sheet("A"), sheet("B")[:-1] + [(500, 300, "ADDED")]])
+
+    response = post_report(client, old, new, query_string={"stream": "ndjson"})
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [record["type"] for record in records] == ["page", "page", "summary"]
+    assert records[0]["unchanged"] and records[0]["missing"] == records[0]["extra"] == 0
+    assert records[1]["missing"] == 1 and records[1]["extra"] == 1
+    assert records[1]["extra_items"][0]["text"] == "ADDED"
+    summary = records[-1]
+    assert summary["page_count"] == 2
+    # The streamed comparison is cached, so its artifacts download by id
+    artifact = client.get(f"/api/compare/results/{summary['comparison_id']}/missing")
+    assert artifact.status_code == 200
+
+
+def test_sse_stream_is_chosen_by_the_accept_header(client):
+    pdf = make_pdf([sheet("A")])
+
+    response = post_report(client, pdf, pdf, headers={"Accept": "text/event-stream"})
+
+    assert response.mimetype == "text/event-stream"
+    events = response.get_data(as_text=True).strip().split("\n\n")
+    assert [event.splitlines()[0] for event in events] == ["event: page", "event: summary"]
+    assert json.loads(events[0].splitlines()[1][len("data: "):])["unchanged"] is True
+
+
+def test_plain_report_is_not_streamed(client):
+    pdf = make_pdf([sheet("A")])
+    response = post_report(client, pdf, pdf)
+    assert response.mimetype == "application/json"
+    assert "comparison_id" in response.get_json()
+
+
+def test_unknown_comparison_id_points_to_the_jobs_api(client):
+    for path in ("/api/compare/results/unknown", "/api/compare/results/unknown/missing"):
+        response = client.get(path)
+
+        assert response.status_code == 404
+        body = response.get_json()
+        assert body["error"] == "Comparison not found or expired"
+        assert "per server process" in body["details"] and "/api/compare/jobs" in body["details"]
@@ -0,0 +1,61 @@
+"""Save profiles and the incremental save of annotated outputs."""
+import fitz
+import pytest
+
+from conftest import make_pdf, sheet
+from core.config import Config
+from services.compareSession_service import CompareSession
+from services.pdf_service import PDFService
+
+
+def annotated(data):
+    doc = fitz.open("pdf", data)
+    doc[0].add_highlight_annot(fitz.Rect(40, 50, 100, 62))
+    return doc
+
+
+def reopened(data):
+    doc = fitz.open("pdf", data)
+    return len(doc), [len(list(page.annots())) for page in doc], doc[0].get_text("words")[0][4]
+
+
+def test_incremental_save_appends_to_the_original_bytes():
+    original = make_pdf([sheet("A"), sheet("B")])
+
+    data = PDFService.save_to_bytes(annotated(original), "fast", incremental=True)
+
+    assert data.startswith(original) and len(data) > len(original)
+    assert reopened(data) == (2, [1, 0], "A-0")
+
+
+def test_missing_download_is_saved_incrementally(monkeypatch):
+    monkeypatch.setattr(Config, "COMPARE_SAVE_INCREMENTAL", True)
+    monkeypatch.setattr(Config, "COMPARE_SAVE_PROFILE", "fast")
+    old = make_pdf([sheet("A")])
+    new = make_pdf([sheet("A")[:-1]])
+
+    with CompareSession(old, new, workers=1) as session:
+        data = PDFService.render_missing(session)
+
+    assert data.startswith(old)
+    assert reopened(data)[1] == [1]
+
+
+@pytest.mark.parametrize("profile", sorted(PDFService.SAVE_PROFILES))
+def test_every_profile_writes_a_full_document_that_reopens(profile):
+    original = make_pdf([sheet("A"), sheet("B")])
+
+    data = PDFService.save_to_bytes(annotated(original), profile, incremental=profile != "fast")
+
+    assert not data.startswith(original)
+    assert reopened(data) == (2, [1, 0], "A-0")
+    if profile == "compact":
+        assert b"/ObjStm" in data
+    if profile == "web-linearized" and fitz.pymupdf_version_tuple < (1, 26):
+        # Later MuPDF versions cannot linearize; the profile then saves compacted only
+        assert b"/Linearized" in data[:1024]
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError, match="Unknown save profile"):
+        PDFService.save_to_bytes(annotated(make_pdf([sheet("A")])), "tiny")
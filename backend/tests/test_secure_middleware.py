@@ -0,0 +1,63 @@
+"""The suspicious-input check over query args, text bodies and JSON, whatever their size or framing."""
+import io
+
+import pytest
+
+from core.config import Config
+
+PAYLOAD = "1 union select password from users"
+
+
+@pytest.fixture
+def max_chars(monkeypatch):
+    monkeypatch.setattr(Config, "INPUT_INSPECT_MAX_CHARS", 1000)
+    return 1000
+
+
+def test_payload_past_the_limit_is_refused_not_cut(client, max_chars):
+    padding = "a" * max_chars
+    response = client.post("/api/compare/fingerprints", data=padding + PAYLOAD, content_type="text/plain")
+    assert response.status_code == 413
+    assert response.get_json() == {"error": "Input too large to inspect", "limit": max_chars}
+
+    response = client.get("/api/compare/jobs/x", query_string={"q": padding + PAYLOAD})
+    assert response.status_code == 413
+
+
+def test_text_bodies_are_scanned_whatever_their_length(client, max_chars):
+    response = client.post("/api/compare/fingerprints", data="a" * 500 + PAYLOAD, content_type="text/plain")
+    assert response.status_code == 403
+    assert response.get_json()["error"] == "Suspicious input blocked"
+
+
+def test_chunked_text_body_is_scanned(client, max_chars):
+    body = ("a" * 200 + PAYLOAD).encode()
+    response = client.post(
+        "/api/compare/fingerprints",
+        input_stream=io.BytesIO(body),
+        content_type="text/plain",
+        headers={"Transfer-Encoding": "chunked"},
+        environ_overrides={"wsgi.input_terminated": True},
+    )
+    assert response.status_code == 403
+
+
+def test_json_body_that_does_not_parse_is_scanned_as_text(client, max_chars):
+    response = client.post("/api/compare/fingerprints", data='{"a": "' + PAYLOAD, content_type="application/json")
+    assert response.status_code == 403
+
+
+def test_clean_text_within_the_limit_passes(client, max_chars):
+    response = client.get("/api/compare/jobs/missing", query_string={"q": "a" * max_chars})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("content_type", [None, "application/xml", "application/x-yaml"])
+def test_bodies_of_other_or_no_type_are_scanned(client, max_chars, content_type):
+    response = client.post("/api/compare/fingerprints", data=PAYLOAD, content_type=content_type)
+    assert response.status_code == 403
+
+
+def test_binary_bodies_are_not_scanned(client, max_chars):
+    response = client.post("/api/compare/fingerprints", data=PAYLOAD, content_type="application/pdf")
+    assert response.status_code == 400
@@ -0,0 +1,71 @@
+"""The per-route body limit: declared and chunked bodies over it, and the WSGI contract of the wrapper."""
+import io
+
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from conftest import make_pdf, sheet
+from middleware import upload_limit_middleware
+from middleware.upload_limit_middleware import UploadLimitMiddleware
+
+
+@pytest.fixture
+def small_limit(monkeypatch):
+    monkeypatch.setattr(upload_limit_middleware, "UPLOAD_LIMITS", [("/api/compare", 2048)])
+    return 2048
+
+
+def test_declared_length_over_the_limit_is_answered_413(client, small_limit):
+    pdf = make_pdf([sheet("A")])
+    assert len(pdf) > small_limit
+    response = client.post("/api/compare/report", data={
+        "file1": (io.BytesIO(pdf), "a.pdf"),
+        "file2": (io.BytesIO(pdf), "b.pdf"),
+    }, content_type="multipart/form-data")
+    assert response.status_code == 413
+    assert response.get_json() == {"error": "Payload too large", "limit": "0.00195312MB"}
+
+
+@pytest.mark.parametrize("content_type", ["multipart/form-data; boundary=x", "text/plain"])
+def test_chunked_body_over_the_limit_is_cut_off_and_answered_413(client, small_limit, content_type):
+    stream = io.BytesIO(b"--x\r\n" + b"a" * (small_limit * 4))
+    response = client.post(
+        "/api/compare/report",
+        input_stream=stream,
+        content_type=content_type,
+        headers={"Transfer-Encoding": "chunked"},
+        environ_overrides={"wsgi.input_terminated": True},
+    )
+    assert response.status_code == 413
+    assert response.get_json()["error"] == "Payload too large"
+    # No more than one byte past the limit was taken off the socket
+    assert stream.tell() <= small_limit + 1
+
+
+def wsgi_app(read_body, use_write):
+    def app(environ, start_response):
+        if read_body:
+            try:
+                environ["wsgi.input"].read()
+            except RequestEntityTooLarge:
+                pass  # a route that swallows the error
+        write = start_response("200 OK", [("Content-Type", "text/plain")])
+        if use_write:
+            write(b"written ")
+        return [b"done"]
+    return app
+
+
+def test_swallowed_overflow_is_replaced_by_413(small_limit):
+    client = Client(UploadLimitMiddleware(wsgi_app(read_body=True, use_write=False)), Response)
+    response = client.post("/api/compare/report", data=b"a" * (small_limit + 10))
+    assert response.status_code == 413
+
+
+def test_start_response_returns_a_write_callable(small_limit):
+    client = Client(UploadLimitMiddleware(wsgi_app(read_body=False, use_write=True)), Response)
+    response = client.post("/api/compare/report", data=b"a" * 10)
+    assert response.status_code == 200
+    assert response.get_data() == b"written done"
@@ -0,0 +1,46 @@
+import gc
+import os
+import tempfile
+
+from conftest import make_pdf, sheet
+from services.compareSession_service import CompareSession
+from services.pdf_service import PDFService
+from services.upload_service import PDFUpload
+
+
+def test_spooled_inputs_stay_on_disk_for_the_life_of_the_result(tmp_path, monkeypatch):
+    created = []
+    mkdtemp = tempfile.mkdtemp
+    monkeypatch.setattr(tempfile, "mkdtemp", lambda **kwargs: created.append(mkdtemp(**kwargs)) or created[-1])
+
+    paths = []
+    for name, pages in (("old.pdf", [sheet("A")]), ("new.pdf", [sheet("A")[:-1]])):
+        path = tmp_path / name
+        path.write_bytes(make_pdf(pages))
+        paths.append(str(path))
+    uploads = [PDFUpload(os.path.basename(path), path=path) for path in paths]
+
+    with CompareSession(*uploads) as session:
+        result = PDFService.build_result(session, "spooled")
+    smallest = min(upload.size for upload in uploads)
+    for path in paths:
+        os.unlink(path)  # the request's spool files go away when it ends
+
+    assert result.retained_bytes < smallest
+    assert sorted(os.listdir(created[0])) == ["input1.pdf", "input2.pdf"]
+    assert result.artifact("missing").startswith(b"%PDF")
+
+    del result
+    gc.collect()
+    assert not os.path.exists(created[0])
+
+
+def test_in_memory_inputs_need_no_directory(monkeypatch):
+    monkeypatch.setattr(tempfile, "mkdtemp", lambda **kwargs: (_ for _ in ()).throw(AssertionError("no directory")))
+    old, new = make_pdf([sheet("A")]), make_pdf([sheet("B")])
+
+    with CompareSession(old, new) as session:
+        result = PDFService.build_result(session, "memory")
+
+    assert result.retained_bytes >= len(old) + len(new)
+    assert result.artifact("extra").startswith(b"%PDF")
@@ -0,0 +1,60 @@
+"""The report watermark drawn through shared Form XObjects, against the per-page reference drawing."""
+import fitz
+import pytest
+
+from benchmarks.reference import stamp_watermark_per_page
+from services.pdf_service import PDFService
+
+
+def drawing_set(rotations, size=(842, 595)):
+    doc = fitz.open()
+    for index, rotation in enumerate(rotations):
+        page = doc.new_page(width=size[0], height=size[1])
+        page.insert_text((50, 50), f"Sheet-{index}", fontsize=12)
+        page.set_rotation(rotation)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def stamped(data, stamp):
+    doc = fitz.open("pdf", data)
+    stamp(doc)
+    return fitz.open("pdf", doc.tobytes())
+
+
+def watermark_boxes(page):
+    return [fitz.Rect(word[:4]) for word in page.get_text("words") if word[4] == "CADSTER"]
+
+
+def test_pages_of_one_size_share_one_pair_of_xobjects():
+    doc = stamped(drawing_set([0] * 5), PDFService.stamp_watermark)
+
+    xobjects = set()
+    for page in doc:
+        xrefs = {name: xref for xref, name, *_ in page.get_xobjects()}
+        assert set(xrefs) == {"CadsterWm0", "CadsterWmText0"}
+        xobjects.add((xrefs["CadsterWm0"], xrefs["CadsterWmText0"]))
+        assert [word[4] for word in page.get_text("words") if word[4].startswith("Sheet-")] == [f"Sheet-{page.number}"]
+    assert len(xobjects) == 1
+
+
+def test_pages_of_another_size_get_their_own_xobjects():
+    doc = fitz.open("pdf", drawing_set([0, 0]))
+    doc.insert_pdf(fitz.open("pdf", drawing_set([0], size=(1191, 842))))
+    doc = stamped(doc.tobytes(), PDFService.stamp_watermark)
+
+    names = [sorted(name for _, name, *_ in page.get_xobjects()) for page in doc]
+    assert names == [["CadsterWm0", "CadsterWmText0"]] * 2 + [["CadsterWm1", "CadsterWmText1"]]
+
+
+@pytest.mark.parametrize("rotation", [0, 90, 180, 270])
+def test_rotated_pages_get_the_stamp_where_the_per_page_drawing_puts_it(rotation):
+    data = drawing_set([rotation])
+    shared = stamped(data, PDFService.stamp_watermark)[0]
+    reference = stamped(data, stamp_watermark_per_page)[0]
+
+    boxes, expected = watermark_boxes(shared), watermark_boxes(reference)
+    assert len(boxes) == len(expected) == 1
+    assert all(abs(a - b) < 0.5 for a, b in zip(boxes[0], expected[0]))
+    assert shared.get_pixmap(dpi=20).samples == reference.get_pixmap(dpi=20).samples